@@ -1,8 +1,11 @@
-from typing import Dict, Any
+from typing import Dict, Any, List
 import pandas as pd
 from pathlib import Path
 from crewai import Agent
 from pydantic import BaseModel
+from utils.instrumentation import span, frame_bytes
+from utils.fact_table import compact_sales_frame
+from utils.catalog import get_catalog
 
 class DataSource(BaseModel):
     """Model for data source configuration."""
@@ -47,7 +50,7 @@ class DataIngestionAgent(Agent):
             df[col] = pd.to_datetime(df[col])
             
         # Handle missing values
-        df = df.fillna(method='ffill')
+        df = df.ffill()
         
         # Ensure numeric columns are properly typed
         numeric_columns = df.select_dtypes(include=['object']).columns[df.select_dtypes(include=['object']).apply(lambda x: x.str.replace('.', '').str.isnumeric().all())]
@@ -56,22 +59,34 @@ class DataIngestionAgent(Agent):
             
         return df
     
+    def load_source(self, source_config: Dict[str, Any]) -> pd.DataFrame:
+        """Load and process a single configured data source."""
+        source = DataSource(**source_config)
+        with span("load", source_type=source.type) as record:
+            df = self.load_data(source)
+            record.set(rows=len(df))
+        with span("process_data", rows=len(df)):
+            return self.process_data(df)
+    
+    def combine(self, dfs: List[pd.DataFrame]) -> pd.DataFrame:
+        """Combine processed sources into the compact sales fact table."""
+        df = pd.concat(dfs, ignore_index=True)
+        # Compact once, after concatenation, so every source shares the same categories
+        with span("compact", rows=len(df), bytes_before=frame_bytes(df)) as record:
+            df = compact_sales_frame(df, get_catalog(self.data_dir).product_ids())
+            record.set(bytes_after=frame_bytes(df))
+        return df
+    
     def execute(self, task_input: Dict[str, Any]) -> Dict[str, Any]:
         """Execute the data ingestion task."""
         try:
             # Load data from all configured sources
             data_sources = task_input.get("data_sources", [])
-            dfs = []
-            
-            for source_config in data_sources:
-                source = DataSource(**source_config)
-                df = self.load_data(source)
-                df = self.process_data(df)
-                dfs.append(df)
+            dfs = [self.load_source(source_config) for source_config in data_sources]
             
             # Combine all dataframes
             if dfs:
-                combined_df = pd.concat(dfs, ignore_index=True)
+                combined_df = self.combine(dfs)
                 return {"status": "success", "data": combined_df}
             else:
                 return {"status": "error", "message": "No data sources configured"}
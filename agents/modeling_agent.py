@@ -1,13 +1,17 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from pathlib import Path
+import hashlib
+import json
 import pandas as pd
-import numpy as np
-from prophet import Prophet
-import xgboost as xgb
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import mean_squared_error
 from crewai import Agent
 from models.sales_forecasting import SalesForecastingModel
 from models.product_recommendation import ProductRecommendationModel
+from models.anomaly_detection import AnomalyDetector, metric_values, segment_totals, state_scope
+from models.kpis import summarize_sales
+from utils.instrumentation import span
+from utils.catalog import get_catalog
+from utils.feature_store import FeatureStore
+from utils.recommendation_table import publish_table
 
 class ModelingAgent(Agent):
     def __init__(self):
@@ -17,11 +21,20 @@ class ModelingAgent(Agent):
             backstory="""Você é um cientista de dados especializado em previsão de vendas 
             e sistemas de recomendação, com experiência em múltiplos algoritmos."""
         )
-        self.forecasting_model = SalesForecastingModel()
-        self.recommendation_model = ProductRecommendationModel()
+        self.state_dir = Path("data") / "state"
+        self.forecasting_model = SalesForecastingModel(FeatureStore(self.state_dir / "features"))
+        self.recommendation_model = ProductRecommendationModel({})
+        self.catalog = get_catalog(Path("data"))
         
     def prepare_forecasting_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """Prepare data for forecasting."""
+        # Derive daily sales from raw transactions when no 'sales' column is present
+        if 'sales' not in df.columns and {'date', 'price', 'quantity'}.issubset(df.columns):
+            # metric_values sums in float64, the fact table stores price as float32
+            df = (metric_values(df, 'receita').rename('sales')
+                  .groupby(pd.to_datetime(df['date']).dt.normalize()).sum()
+                  .rename_axis('date').reset_index())
+            
         # Ensure we have the required columns
         required_columns = ['date', 'sales']
         if not all(col in df.columns for col in required_columns):
@@ -39,7 +52,123 @@ class ModelingAgent(Agent):
         if not all(col in df.columns for col in required_columns):
             raise ValueError("DataFrame must contain 'user_id', 'product_id', and 'rating' columns")
             
-        return df[required_columns]
+        # Keep the columns the recommendation filters rely on
+        context_columns = [col for col in ['date', 'price', 'quantity', 'category', 'transaction_id'] if col in df.columns]
+        return df[required_columns + context_columns]
+    
+    def detect_anomalies(self, df: pd.DataFrame, task_input: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Detect anomalies on the newest day for every configured segment."""
+        config = {
+            "alertas": task_input.get("alertas", {}),
+            "preferencias_analise": task_input.get("preferencias_analise", {})
+        }
+        if not config["alertas"].get("anomalias"):
+            return []
+            
+        with span("anomalies", rows=len(df)):
+            detector = AnomalyDetector(config, self.state_dir, scope=state_scope(task_input))
+            return self.catalog.enrich_alerts(detector.detect(df))
+    
+    def backtest_methods(self, df: pd.DataFrame, task_input: Dict[str, Any]) -> Optional[Dict[str, str]]:
+        """Best forecasting method per segment from a rolling-origin backtest, run at most once per user and day.
+
+        The selection is stored under `state/backtests`, keyed by the last data
+        date and the forecasting settings; later runs on the same data reuse
+        it. Returns None when `previsao_vendas.backtest` is not configured or
+        the backtest fails (the volume routing is used instead).
+        """
+        config = task_input.get("preferencias_analise", {}).get("previsao_vendas", {})
+        if not config.get("backtest") or not task_input.get("usuario_id") or 'date' not in df.columns:
+            return None
+        backtest_dir = self.state_dir / "backtests"
+        path = backtest_dir / f"selecao_{task_input['usuario_id']}.json"
+        settings = {key: config.get(key) for key in ("backtest", "segmentos", "horizonte", "metodo", "hierarquia")}
+        key = hashlib.sha1(json.dumps([str(pd.to_datetime(df['date']).max().date()), settings],
+                                      sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("chave") == key:
+                return cached["metodos"]
+        except (OSError, ValueError):
+            pass
+
+        from models.backtesting import Backtester
+        try:
+            with span("backtest_select", rows=len(df)):
+                metric = config.get("hierarquia", {}).get("metrica", "receita")
+                series = segment_totals(df, config.get("segmentos", ["geral"]), metric)
+                selection = Backtester(config, backtest_dir, config["backtest"].get("processos")).run(series)
+        except Exception as e:
+            print(f"Error in forecast backtest: {str(e)}")
+            return None
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"chave": key, "metodos": selection["metodos"], "resumo": selection["resumo"],
+                       "escolhas": selection["escolhas"]}, f, ensure_ascii=False)
+        tmp_path.replace(path)
+        return selection["metodos"]
+    
+    def run_forecasts(self, df: pd.DataFrame, task_input: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Generate Prophet and XGBoost forecasts for the total and reconciled per-segment forecasts."""
+        with span("prepare", rows=len(df)):
+            forecasting_data = self.prepare_forecasting_data(df)
+        task_input = task_input or {}
+        config = task_input.get("preferencias_analise", {}).get("previsao_vendas", {})
+        # Daily revenue features are kept per user so each run only computes the new days
+        series_key = f"{task_input['usuario_id']}/geral:receita" if task_input.get("usuario_id") else None
+        forecasts = {
+            "prophet": self.forecasting_model.predict_with_prophet(forecasting_data, config),
+            "xgboost": self.forecasting_model.predict_with_xgboost(forecasting_data, series_key)
+        }
+        # Segments are fitted once at the bottom of the hierarchy and reconciled upwards
+        if any(segment != "geral" for segment in config.get("segmentos", [])) and {'date', 'price', 'quantity'}.issubset(df.columns):
+            # The backtest picks each segment's method; the expensive models only run where they win
+            methods = self.backtest_methods(df, task_input)
+            with span("segments", rows=len(df)):
+                forecasts["segmentos"] = self.forecasting_model.predict_hierarchical(df, config, methods)
+        return forecasts
+    
+    def compute_kpis(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """Summarize revenue, volume and top products for reports and on-demand queries."""
+        with span("kpis", rows=len(df)):
+            kpis = summarize_sales(df)
+            if kpis.get("top_produtos"):
+                self.catalog.enrich_records(kpis["top_produtos"])
+            return kpis
+    
+    def run_recommendations(self, df: pd.DataFrame, task_input: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Generate product recommendations."""
+        with span("recommend", rows=len(df)):
+            recommendation_data = self.prepare_recommendation_data(df)
+            recommendations = self.recommendation_model.generate_recommendations(
+                recommendation_data,
+                task_input.get("preferencias_analise", {}),
+                owner=task_input.get("usuario_id"),
+                persona=task_input.get("persona")
+            )
+            # Attach catalog attributes (name, category, brand) for the report sections
+            return self.catalog.enrich_records(recommendations)
+    
+    def publish_recommendation_table(self, df: pd.DataFrame, task_input: Dict[str, Any], table_dir: Path,
+                                     top_n: Optional[int] = None, keep_versions: int = 2) -> Dict[str, Any]:
+        """Precompute top-N (cosine or ALS, per the persona method) for every customer and publish it as a serving table."""
+        preferences = task_input.get("preferencias_analise", {})
+        with span("recommend_table", rows=len(df)):
+            users, products, indices, scores = self.recommendation_model.batch_recommendations(
+                self.prepare_recommendation_data(df), preferences, top_n=top_n,
+                owner=task_input.get("usuario_id"), persona=task_input.get("persona")
+            )
+            names = self.catalog.enrich_products(pd.DataFrame({"product_id": products}), fields=("product_name",))
+            names = names["catalog_product_name"].fillna("").tolist()
+            version_dir = publish_table(
+                table_dir, users, products, indices, scores,
+                product_names=names,
+                metadata={"usuario_id": task_input.get("usuario_id"),
+                          "metodo": preferences.get("recomendacao_produtos", {}).get("metodo")},
+                keep_versions=keep_versions
+            )
+        return {"versao": version_dir.name, "clientes": len(users), "produtos": len(products)}
     
     def execute(self, task_input: Dict[str, Any]) -> Dict[str, Any]:
         """Execute the modeling task."""
@@ -48,24 +177,19 @@ class ModelingAgent(Agent):
             if not isinstance(data, pd.DataFrame):
                 raise ValueError("Input data must be a pandas DataFrame")
                 
-            # Prepare data
-            forecasting_data = self.prepare_forecasting_data(data)
-            recommendation_data = self.prepare_recommendation_data(data)
-            
-            # Generate forecasts
-            prophet_forecast = self.forecasting_model.predict_with_prophet(forecasting_data)
-            xgboost_forecast = self.forecasting_model.predict_with_xgboost(forecasting_data)
+            # Detect anomalies before modeling, they only depend on the raw data
+            anomalies = self.detect_anomalies(data, task_input)
             
-            # Generate recommendations
-            recommendations = self.recommendation_model.generate_recommendations(recommendation_data)
+            # Generate forecasts and recommendations
+            forecasts = self.run_forecasts(data, task_input)
+            recommendations = self.run_recommendations(data, task_input)
             
             return {
                 "status": "success",
-                "forecasts": {
-                    "prophet": prophet_forecast,
-                    "xgboost": xgboost_forecast
-                },
-                "recommendations": recommendations
+                "kpis": self.compute_kpis(data),
+                "forecasts": forecasts,
+                "recommendations": recommendations,
+                "anomalies": anomalies
             }
             
         except Exception as e:
@@ -1,5 +1,4 @@
 from typing import Dict, Any
-import google.generativeai as genai
 from pathlib import Path
 from crewai import Agent
 import json
@@ -14,8 +13,16 @@ class NLPGenerationAgent(Agent):
         )
         self.templates_dir = Path("templates")
         self.api_key = self._load_api_key()
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-pro')
+        # The Gemini client is created on the first generation request
+        self.model = None
+        
+    def get_model(self):
+        """Configure Gemini and build the generative model on first use."""
+        if self.model is None:
+            import google.generativeai as genai
+            genai.configure(api_key=self.api_key)
+            self.model = genai.GenerativeModel('gemini-pro')
+        return self.model
         
     def _load_api_key(self) -> str:
         """Load the Gemini API key from environment variables."""
@@ -56,7 +63,7 @@ class NLPGenerationAgent(Agent):
         """
         
         try:
-            response = self.model.generate_content(prompt)
+            response = self.get_model().generate_content(prompt)
             return response.text
         except Exception as e:
             print(f"Error generating insights: {str(e)}")
@@ -1,13 +1,11 @@
-from typing import Dict, Any
+from typing import Dict, Any, List
 from crewai import Agent
-from telegram import Bot
-from telegram.error import TelegramError
 import asyncio
 from pathlib import Path
 import json
 
 class TelegramDispatchAgent(Agent):
-    def __init__(self, telegram_api):
+    def __init__(self, telegram_api, config_registry=None):
         super().__init__(
             role="Telegram Dispatcher",
             goal="Enviar insights via Telegram de acordo com as preferências do usuário",
@@ -15,10 +13,13 @@ class TelegramDispatchAgent(Agent):
             responsável por entregar insights de forma clara e eficiente."""
         )
         self.telegram_api = telegram_api
+        self.config_registry = config_registry
         self.config_dir = Path("config")
         
     def load_user_config(self, user_id: str) -> Dict[str, Any]:
-        """Load user configuration from JSON file."""
+        """Load user configuration, from the in-memory registry when available."""
+        if self.config_registry is not None:
+            return self.config_registry.get(user_id) or {}
         config_path = self.config_dir / "user_configs" / f"user_{user_id}.json"
         try:
             with open(config_path, 'r', encoding='utf-8') as f:
@@ -39,8 +40,61 @@ class TelegramDispatchAgent(Agent):
             # Default format
             return insights
             
+    def format_alerts(self, alerts: List[Dict[str, Any]]) -> str:
+        """Format real-time alerts as a compact message."""
+        lines = ["🚨 *Alertas de Vendas*", ""]
+        for alert in alerts:
+            segment = alert.get("segmento")
+            name = alert.get("nome") or alert.get("valor")
+            label = f"{segment} {name}" if segment and segment != "geral" else "geral"
+            if alert["regra"] == "anomalias":
+                lines.append(
+                    f"• Anomalia ({alert['tipo']}) em {label}: {alert['observado']:.2f} "
+                    f"vs esperado {alert['esperado']:.2f} ({alert['desvio']:+.1%})"
+                )
+            elif alert["regra"] == "tendencias":
+                lines.append(f"• Tendência de {alert['tipo']} em {label}: {alert['variacao']:+.1%}")
+            elif alert["regra"] == "metas":
+                status = "atingida" if alert["tipo"] == "atingida" else "não atingida"
+                lines.append(f"• Meta diária {status}: {alert['observado']:.2f} / {alert['meta']:.2f}")
+        return "\n".join(lines)
+        
+    def dispatch_alerts(self, user_id: str, alerts: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Send real-time alerts, bypassing the insight generation pipeline."""
+        try:
+            if not alerts:
+                return {"status": "success", "message": "Nenhum alerta para enviar"}
+                
+            success = asyncio.run(self.send_message(user_id, self.format_alerts(alerts)))
+            
+            if success:
+                return {"status": "success", "message": f"{len(alerts)} alertas enviados para {user_id}"}
+            else:
+                return {"status": "error", "message": f"Falha ao enviar alertas para {user_id}"}
+                
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+            
+    async def send_report(self, user_id: str, message: str, attachments: List[Dict[str, str]]) -> bool:
+        """Send the report text followed by its charts and spreadsheets as documents."""
+        if not await self.send_message(user_id, message):
+            return False
+        for attachment in attachments:
+            # Attachments come from a shared cache and may have been evicted since they were built
+            if not Path(attachment["arquivo"]).exists():
+                continue
+            await self.telegram_api.send_document(
+                user_id,
+                attachment["arquivo"],
+                caption=attachment.get("legenda"),
+                filename=attachment.get("nome")
+            )
+        return True
+        
     async def send_message(self, user_id: str, message: str) -> bool:
         """Send message via Telegram."""
+        from telegram.error import TelegramError
+        
         try:
             await self.telegram_api.send_message(
                 chat_id=user_id,
@@ -61,16 +115,16 @@ class TelegramDispatchAgent(Agent):
             if not user_id or not insights:
                 return {"status": "error", "message": "ID do usuário e insights são obrigatórios"}
                 
-            # Load user configuration
-            user_config = self.load_user_config(user_id)
+            # Use the configuration passed by the pipeline, falling back to a lookup
+            user_config = task_input.get("user_config") or self.load_user_config(user_id)
             if not user_config:
                 return {"status": "error", "message": f"Configuração não encontrada para o usuário {user_id}"}
                 
             # Format message according to user preferences
             formatted_message = self.format_message(insights, user_config)
             
-            # Send message
-            success = asyncio.run(self.send_message(user_id, formatted_message))
+            # Send message and attachments
+            success = asyncio.run(self.send_report(user_id, formatted_message, task_input.get("attachments") or []))
             
             if success:
                 return {"status": "success", "message": f"Mensagem enviada com sucesso para {user_id}"}
@@ -0,0 +1,96 @@
+"""Mede a renderização de gráficos dos relatórios com e sem o cache compartilhado.
+
+Uso:
+    python -m benchmarks.bench_charts --usuarios 200 --conjuntos 5 --processos 4
+
+Simula `--usuarios` destinatários cujos relatórios vêm de `--conjuntos`
+fontes de dados distintas (como vários usuários de uma persona lendo os
+mesmos arquivos). O cenário "sem_cache" desenha um gráfico por usuário; os
+demais usam o `ChartRenderer`, que desenha cada gráfico distinto uma vez.
+"""
+from typing import Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from utils.chart_renderer import ChartRenderer, chart_requests, render_chart
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+USER_CONFIG = {"tipo_conteudo": ["previsoes", "top_produtos"]}
+
+def make_report(dataset: int, horizon: int = 30, products: int = 10) -> Dict[str, Any]:
+    """Dados de relatório sintéticos: previsão e produtos mais vendidos do conjunto `dataset`."""
+    forecast = []
+    for day in range(horizon):
+        yhat = 1000 + 50 * dataset + 10 * day
+        forecast.append({"ds": str(date(2026, 11, 1) + timedelta(days=day)), "yhat": yhat, "yhat_lower": yhat * 0.9, "yhat_upper": yhat * 1.1})
+    return {
+        "previsoes": {"prophet": {"forecast": forecast}},
+        "kpis": {"top_produtos": [
+            {"product_id": p, "product_name": f"Produto {dataset}-{p}", "receita": 10000 - 500 * p + dataset}
+            for p in range(products)
+        ]}
+    }
+
+def run_uncached(reports: List[Dict[str, Any]], work_dir: Path) -> None:
+    for user, report in enumerate(reports):
+        for chart_type, data in chart_requests(report, USER_CONFIG):
+            render_chart(str(work_dir / f"{user}_{chart_type}.png"), chart_type, data)
+
+def run_cached(reports: List[Dict[str, Any]], renderer: ChartRenderer, threads: int) -> None:
+    # Cada thread faz o papel da etapa de gráficos do pipeline de um usuário
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(lambda report: renderer.render_many(chart_requests(report, USER_CONFIG)), reports))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=200)
+    parser.add_argument("--conjuntos", type=int, default=5)
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--output", default=str(RESULTS_DIR / "charts.json"))
+    args = parser.parse_args()
+
+    reports = [make_report(user % args.conjuntos) for user in range(args.usuarios)]
+    scenarios = {}
+
+    start = time.perf_counter()
+    run_uncached(reports, Path(tempfile.mkdtemp()))
+    scenarios["sem_cache"] = time.perf_counter() - start
+
+    renderer = ChartRenderer(Path(tempfile.mkdtemp()), max_workers=args.processos)
+    start = time.perf_counter()
+    run_cached(reports, renderer, args.threads)
+    scenarios["cache_frio"] = time.perf_counter() - start
+    start = time.perf_counter()
+    run_cached(reports, renderer, args.threads)
+    scenarios["cache_quente"] = time.perf_counter() - start
+    rendered = len(list(renderer.cache_dir.glob("*.png")))
+    renderer.shutdown()
+
+    for name, seconds in scenarios.items():
+        print(f"{name:>13}: {seconds:8.3f}s")
+    print(f"{rendered} gráficos distintos para {args.usuarios} usuários")
+
+    report = {
+        "benchmark": "charts",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "cpu_count": os.cpu_count(),
+        "parametros": vars(args),
+        "graficos_distintos": rendered,
+        "segundos": {name: round(seconds, 3) for name, seconds in scenarios.items()}
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    print(f"Resultados salvos em {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Mede a exportação das tabelas detalhadas dos relatórios em planilhas.
+
+Uso:
+    python -m benchmarks.bench_export --usuarios 100 --conjuntos 5 --segmentos 2000
+
+Compara, para um relatório com `--segmentos` séries de previsão:
+- openpyxl no modo normal (todas as células em memória) contra o modo
+  write-only e o CSV.gz;
+- a geração para `--usuarios` destinatários que compartilham `--conjuntos`
+  fatias de dados, com o `ReportExporter` (uma planilha por conteúdo
+  distinto, em um pool de processos).
+"""
+from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from utils.report_export import ReportExporter, export_tables, write_xlsx, write_csv_gz
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+USER_CONFIG = {"persona": "analista_de_vendas"}
+
+def make_report(dataset: int, segments: int, horizon: int = 60) -> Dict[str, Any]:
+    """Dados de relatório sintéticos com previsões por segmento e recomendações."""
+    days = [str(date(2026, 11, 1) + timedelta(days=day)) for day in range(horizon)]
+    def records(level: float):
+        return [{"ds": ds, "yhat": level + day, "yhat_lower": level * 0.9 + day, "yhat_upper": level * 1.1 + day}
+                for day, ds in enumerate(days)]
+    return {
+        "previsoes": {
+            "prophet": {"forecast": records(1000 + dataset)},
+            "segmentos": {"previsoes": {f"produto={i}": records(i + dataset) for i in range(segments)}}
+        },
+        "kpis": {"receita_por_categoria": {f"Categoria {i}": 1000.0 * i + dataset for i in range(20)}},
+        "recomendacoes": [{"product_id": i, "score": 1 / (i + 1), "product_name": f"Produto {i}"} for i in range(50)],
+        "anomalias": []
+    }
+
+def write_xlsx_normal(path: str, tables) -> None:
+    """Referência: openpyxl no modo normal, com toda a planilha em memória."""
+    from openpyxl import Workbook
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    for name, (columns, rows) in tables.items():
+        sheet = workbook.create_sheet(title=name[:31])
+        sheet.append(columns)
+        for row in rows:
+            sheet.append(row)
+    workbook.save(path)
+
+def timed(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=100)
+    parser.add_argument("--conjuntos", type=int, default=5)
+    parser.add_argument("--segmentos", type=int, default=2000)
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--output", default=str(RESULTS_DIR / "export.json"))
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp())
+    tables = export_tables(make_report(0, args.segmentos))
+    rows = sum(len(table[1]) for table in tables.values())
+    writers = {"xlsx_normal": (write_xlsx_normal, "xlsx"), "xlsx_write_only": (write_xlsx, "xlsx"),
+               "csv_gz": (write_csv_gz, "csv.gz")}
+    single = {}
+    for name, (writer, extension) in writers.items():
+        path = work_dir / f"{name}.{extension}"
+        single[name] = {"segundos": round(timed(writer, str(path), tables), 3), "bytes": path.stat().st_size}
+        print(f"{name:>16}: {single[name]['segundos']:7.3f}s {single[name]['bytes'] / 1e6:6.2f} MB ({rows} linhas)")
+
+    reports = [make_report(user % args.conjuntos, args.segmentos) for user in range(args.usuarios)]
+    batch = {}
+    for file_format in ("xlsx", "csv.gz"):
+        exporter = ReportExporter(work_dir / file_format, file_format=file_format, max_workers=args.processos)
+        with ThreadPoolExecutor(args.threads) as executor:
+            start = time.perf_counter()
+            list(executor.map(lambda report: exporter.export(report, USER_CONFIG), reports))
+            batch[file_format] = round(time.perf_counter() - start, 3)
+        exporter.shutdown()
+        print(f"{args.usuarios} usuários em {file_format}: {batch[file_format]:.3f}s "
+              f"({len(list(exporter.cache_dir.iterdir()))} arquivos distintos)")
+
+    report = {
+        "benchmark": "export",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "cpu_count": os.cpu_count(),
+        "parametros": vars(args),
+        "linhas_por_relatorio": rows,
+        "arquivo_unico": single,
+        "lote_segundos": batch
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    print(f"Resultados salvos em {output}")
+
+if __name__ == "__main__":
+    main()
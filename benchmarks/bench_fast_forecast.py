@@ -0,0 +1,118 @@
+"""Compara precisão e latência dos previsores rápidos com Prophet e XGBoost.
+
+Uso:
+    python -m benchmarks.bench_fast_forecast --escala medio --horizonte 28
+    python -m benchmarks.bench_fast_forecast --escala producao --series-pesadas 5
+
+As séries diárias de receita por produto vêm de `benchmarks.synthetic_data`.
+Os últimos `--horizonte` dias de cada série ficam de fora do ajuste e
+servem para medir o erro (WAPE: soma dos erros absolutos sobre a soma do
+realizado). Os modelos rápidos prevêem todas as séries em uma chamada; o
+Prophet e o XGBoost, quando instalados, rodam série a série apenas nas
+`--series-pesadas` de maior receita, e o tempo por série é extrapolado
+para o catálogo inteiro.
+"""
+from typing import Dict, Any, List, Optional
+from pathlib import Path
+import argparse
+import json
+import time
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic_data import PRESETS, generate_sales_data
+from models.anomaly_detection import segment_totals
+from models.fast_forecast import FAST_FORECASTERS, fast_forecast
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+def wape(actual: np.ndarray, forecast: np.ndarray) -> float:
+    return float(np.abs(actual - forecast).sum() / max(np.abs(actual).sum(), 1e-9))
+
+def product_matrix(sales: pd.DataFrame) -> pd.DataFrame:
+    series = segment_totals(sales, ['produto'])
+    matrix = series.pivot_table(index='key', columns='date', values='value', aggfunc='sum', fill_value=0)
+    calendar = pd.date_range(matrix.columns.min(), matrix.columns.max(), freq='D')
+    return matrix.reindex(columns=calendar, fill_value=0)
+
+def bench_heavy(method: str, matrix: pd.DataFrame, horizon: int, n_series: int) -> Optional[Dict[str, Any]]:
+    from models.sales_forecast import SalesForecastModel
+    persona_config = {"previsao_vendas": {"metodo": method, "horizonte": horizon,
+                                          "nivel_detalhe": "alto", "metricas": []}}
+    model = SalesForecastModel(persona_config)
+    top = matrix.sum(axis=1).nlargest(n_series).index
+    train, test = matrix.loc[top].iloc[:, :-horizon], matrix.loc[top].iloc[:, -horizon:]
+    forecasts = []
+    start = time.perf_counter()
+    try:
+        for key in top:
+            forecasts.append(model._generate_heavy_forecast(train.loc[key], persona_config)['yhat'].to_numpy())
+    except ImportError as e:
+        print(f"{method:>24}: ignorado ({str(e)})")
+        return None
+    elapsed = time.perf_counter() - start
+    return {
+        "metodo": method,
+        "series": len(top),
+        "segundos": round(elapsed, 4),
+        "segundos_catalogo_estimado": round(elapsed / len(top) * len(matrix), 2),
+        "wape_series_pesadas": round(wape(test.to_numpy(), np.vstack(forecasts)), 4)
+    }
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    sales = generate_sales_data(PRESETS[args.escala])
+    matrix = product_matrix(sales)
+    train, test = matrix.iloc[:, :-args.horizonte].to_numpy(), matrix.iloc[:, -args.horizonte:].to_numpy()
+    heavy = matrix.sum(axis=1).to_numpy().argsort()[::-1][:args.series_pesadas]
+    print(f"{len(matrix)} séries × {train.shape[1]} dias de treino, horizonte {args.horizonte}")
+
+    methods = []
+    for method in FAST_FORECASTERS:
+        timings = []
+        for _ in range(args.repeticoes):
+            start = time.perf_counter()
+            forecast, _ = fast_forecast(train, args.horizonte, method)
+            timings.append(time.perf_counter() - start)
+        methods.append({
+            "metodo": method,
+            "series": len(matrix),
+            "segundos": round(min(timings), 4),
+            "wape": round(wape(test, forecast), 4),
+            "wape_series_pesadas": round(wape(test[heavy], forecast[heavy]), 4)
+        })
+        print(f"{method:>24}: {methods[-1]['segundos']:>8.3f}s  WAPE {methods[-1]['wape']:.3f} "
+              f"(pesadas {methods[-1]['wape_series_pesadas']:.3f})")
+
+    for method in ("prophet", "xgb"):
+        result = bench_heavy(method, matrix, args.horizonte, args.series_pesadas)
+        if result:
+            methods.append(result)
+            print(f"{method:>24}: {result['segundos']:>8.3f}s em {result['series']} séries "
+                  f"(~{result['segundos_catalogo_estimado']}s no catálogo)  WAPE pesadas {result['wape_series_pesadas']:.3f}")
+
+    return {
+        "benchmark": "fast_forecast",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "escala": args.escala,
+        "horizonte": args.horizonte,
+        "metodos": methods
+    }
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--escala", choices=list(PRESETS), default="medio")
+    parser.add_argument("--horizonte", type=int, default=28)
+    parser.add_argument("--series-pesadas", type=int, default=10)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    output = Path(args.output or RESULTS_DIR / f"fast_forecast_{args.escala}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    print(f"Resultados salvos em {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Mede jobs/minuto da fila distribuída conforme o número de trabalhadores aumenta.
+
+Uso:
+    python -m benchmarks.bench_job_queue --jobs 64 --workers 1 2 4
+
+Cada cenário cria uma fila SQLite nova, enfileira `--jobs` pipelines com os
+agentes simulados de `bench_worker_pool` e inicia os trabalhadores como
+processos independentes, da mesma forma que `worker.py` faz em cada
+máquina. O tempo vai do início dos trabalhadores até a fila esvaziar.
+"""
+from typing import Dict, Any
+from pathlib import Path
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.bench_worker_pool import build_benchmark_runner, make_jobs
+from utils.queue_worker import JOB_PIPELINE, build_queue, start_workers
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+def run_scenario(workers: int, args: argparse.Namespace) -> Dict[str, Any]:
+    settings = {
+        "arquivo": str(Path(tempfile.mkdtemp()) / "fila.db"),
+        "lease_segundos": 60,
+        "intervalo_busca_segundos": 0.05
+    }
+    queue = build_queue(settings)
+    for job in make_jobs(args.jobs, args.products, args.days):
+        queue.enqueue(JOB_PIPELINE, {"user_config": job}, job_key=job["usuario_id"])
+
+    processes, stop_event = start_workers(settings, workers, build_benchmark_runner)
+    start = time.perf_counter()
+    while True:
+        stats = queue.stats()
+        if not stats.get("pendente") and not stats.get("executando"):
+            break
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    stop_event.set()
+    for process in processes:
+        process.join()
+    queue.close()
+    return {
+        "workers": workers,
+        "jobs": args.jobs,
+        "concluidos": stats.get("concluido", 0),
+        "falhas": stats.get("falhou", 0),
+        "segundos": round(elapsed, 3),
+        "jobs_por_minuto": round(args.jobs / elapsed * 60, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=64)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--output", default=str(RESULTS_DIR / "job_queue.json"))
+    args = parser.parse_args()
+
+    scenarios = []
+    for workers in sorted(set(args.workers)):
+        scenarios.append(run_scenario(workers, args))
+        print(f"{workers:>3} trabalhadores: {scenarios[-1]['jobs_por_minuto']:>8.1f} jobs/min "
+              f"({scenarios[-1]['falhas']} falhas)")
+
+    report = {
+        "benchmark": "job_queue",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "cpu_count": os.cpu_count(),
+        "cenarios": scenarios
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    print(f"Resultados salvos em {output}")
+
+if __name__ == "__main__":
+    main()
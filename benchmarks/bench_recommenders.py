@@ -0,0 +1,160 @@
+"""Compara o recomendador ALS implícito com o colaborativo por cosseno.
+
+Uso:
+    python -m benchmarks.bench_recommenders --usuarios 2000,8000,32000 --produtos 2000
+
+Os dados sintéticos têm estrutura latente: cada cliente pertence a um
+grupo com produtos preferidos e compra deles com probabilidade
+`--afinidade`, com quantidades e datas aleatórias; a nota explícita é
+ruído, como nos dados reais de exemplo. Para cada cliente com ao menos três
+produtos distintos, o produto da compra mais recente sai do treino e
+vira o alvo.
+
+Para cada tamanho, mede:
+- tempo do top-N de todos os clientes pelo cosseno em lote
+  (`batch_collaborative_recommendations`, mesmas notas do método por
+  usuário, que exige sklearn e uma matriz densa usuário × usuário) e pelo
+  ALS (`batch_als_recommendations`, treino incluído);
+- taxa de acerto@N (o alvo está entre as N recomendações) de cada método
+  e de uma referência por popularidade;
+- fold-in: o ALS é treinado sem `--novos` dos clientes, que depois são
+  recomendados sem retreino; compara o acerto e o tempo por cliente.
+"""
+from typing import Dict, Any, Tuple
+from pathlib import Path
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from models.implicit_als import interaction_weights
+from models.product_recommendation import ProductRecommendationModel
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+def make_interactions(users: int, products: int, per_user: int, groups: int, affinity: float,
+                      seed: int = 0) -> pd.DataFrame:
+    """Vendas sintéticas com grupos de clientes que compram os mesmos produtos."""
+    rng = np.random.default_rng(seed)
+    group_products = [rng.choice(products, size=max(5, products // groups), replace=False) for _ in range(groups)]
+    popularity = rng.pareto(1.5, products) + 1
+    popularity /= popularity.sum()
+    counts = rng.poisson(per_user, users) + 1
+    user_ids = np.repeat(np.arange(users), counts)
+    user_group = rng.integers(0, groups, users)[user_ids]
+    from_group = rng.random(len(user_ids)) < affinity
+    product_ids = rng.choice(products, size=len(user_ids), p=popularity)
+    for group in range(groups):
+        mask = from_group & (user_group == group)
+        product_ids[mask] = rng.choice(group_products[group], size=mask.sum())
+    return pd.DataFrame({
+        "user_id": user_ids + 1000,
+        "product_id": product_ids,
+        "date": pd.Timestamp("2026-09-30") - pd.to_timedelta(rng.integers(0, 90, len(user_ids)), unit="D"),
+        "quantity": rng.poisson(1.0, len(user_ids)) + 1,
+        "rating": rng.integers(1, 6, len(user_ids)),
+        "price": rng.uniform(5, 500, len(user_ids))
+    })
+
+def holdout(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
+    """Separa o produto da compra mais recente de cada cliente com ao menos três produtos distintos."""
+    distinct = df.groupby("user_id")["product_id"].nunique()
+    eligible = df[df["user_id"].isin(distinct.index[distinct >= 3])]
+    targets = eligible.sort_values(["date", "product_id"]).groupby("user_id")["product_id"].last()
+    pairs = pd.MultiIndex.from_arrays([df["user_id"], df["product_id"]])
+    held = pairs.isin(pd.MultiIndex.from_arrays([targets.index, targets.to_numpy()]))
+    return df[~held], targets
+
+def hit_rate(users: np.ndarray, products: np.ndarray, indices: np.ndarray, targets: pd.Series) -> float:
+    """Fração dos alvos que aparecem no top-N do cliente."""
+    rows = pd.Index(users).get_indexer(targets.index)
+    found = rows >= 0
+    recommended = np.where(indices[rows[found]] >= 0, products[np.maximum(indices[rows[found]], 0)], -1)
+    hits = (recommended == targets.to_numpy()[found][:, None]).any(axis=1)
+    return float(hits.sum() / max(len(targets), 1))
+
+def persona(method: str, top_n: int, settings: Dict[str, Any]) -> Dict[str, Any]:
+    return {"recomendacao_produtos": {
+        "metodo": method,
+        "filtros": {"categoria": False, "preco": False, "desempenho": True},
+        "quantidade": top_n,
+        "periodo_analise": 90,
+        "als": settings
+    }}
+
+def run_size(users: int, args) -> Dict[str, Any]:
+    df = make_interactions(users, args.produtos, args.compras, args.grupos, args.afinidade, seed=users)
+    train, targets = holdout(df)
+    settings = {"fatores": args.fatores, "iteracoes": args.iteracoes}
+    result: Dict[str, Any] = {"usuarios": users, "interacoes": len(train), "alvos": len(targets)}
+
+    # Popularidade: os mais vendidos que o cliente ainda não comprou
+    top = train["product_id"].value_counts().index.to_numpy()[:args.top_n + args.compras * 3]
+    bought = train.groupby("user_id")["product_id"].agg(set)
+    hits = sum(target in [p for p in top if p not in bought.get(user, ())][:args.top_n] for user, target in targets.items())
+    result["popularidade"] = {"acerto": round(hits / max(len(targets), 1), 4)}
+
+    for method in ("colaborativo", "als"):
+        if method == "colaborativo" and users > args.limite_cosseno:
+            result[method] = {"status": "ignorado", "motivo": f"acima de --limite-cosseno {args.limite_cosseno}"}
+            continue
+        model = ProductRecommendationModel({})
+        start = time.perf_counter()
+        batch_users, products, indices, _ = model.batch_recommendations(train, persona(method, args.top_n, settings))
+        seconds = time.perf_counter() - start
+        result[method] = {"segundos": round(seconds, 3), "acerto": round(hit_rate(batch_users, products, indices, targets), 4)}
+        print(f"{users:>7} clientes {method:>12}: {seconds:8.2f}s  acerto@{args.top_n} {result[method]['acerto']:.3f}")
+
+    # Fold-in: clientes fora do treino recomendados com os fatores de produto fixos
+    rng = np.random.default_rng(users)
+    new_users = rng.choice(targets.index.to_numpy(), size=max(1, int(len(targets) * args.novos)), replace=False)
+    known = train[~train["user_id"].isin(new_users)]
+    model = ProductRecommendationModel({})
+    als = model.train_als_model(known, persona("als", args.top_n, settings))
+    new_weights = interaction_weights(train[train["user_id"].isin(new_users)], reference_date=train["date"].max())
+    start = time.perf_counter()
+    hits = 0
+    for user in new_users:
+        codes, _ = als.recommend(user, args.top_n, new_weights.loc[user])
+        hits += targets[user] in als.products[codes]
+    seconds = time.perf_counter() - start
+    result["fold_in"] = {"clientes": len(new_users), "acerto": round(hits / len(new_users), 4),
+                         "us_por_cliente": round(seconds / len(new_users) * 1e6, 1)}
+    print(f"{users:>7} clientes      fold-in: {len(new_users)} novos, {result['fold_in']['us_por_cliente']:.0f}µs/cliente"
+          f"  acerto@{args.top_n} {result['fold_in']['acerto']:.3f}  (popularidade {result['popularidade']['acerto']:.3f})")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", default="2000,8000,32000", help="tamanhos separados por vírgula")
+    parser.add_argument("--produtos", type=int, default=2000)
+    parser.add_argument("--compras", type=int, default=12, help="compras médias por cliente")
+    parser.add_argument("--grupos", type=int, default=40)
+    parser.add_argument("--afinidade", type=float, default=0.7)
+    parser.add_argument("--fatores", type=int, default=32)
+    parser.add_argument("--iteracoes", type=int, default=10)
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--novos", type=float, default=0.05, help="fração de clientes para o fold-in")
+    parser.add_argument("--limite-cosseno", type=int, default=100000)
+    parser.add_argument("--output", default=str(RESULTS_DIR / "recommenders.json"))
+    args = parser.parse_args()
+
+    sizes = [run_size(int(users), args) for users in args.usuarios.split(",")]
+    report = {
+        "benchmark": "recommenders",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "cpu_count": os.cpu_count(),
+        "parametros": vars(args),
+        "tamanhos": sizes
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    print(f"Resultados salvos em {output}")
+
+if __name__ == "__main__":
+    main()
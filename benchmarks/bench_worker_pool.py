@@ -0,0 +1,153 @@
+"""Mede jobs/minuto do PipelineWorkerPool conforme o número de processos aumenta.
+
+Uso:
+    python -m benchmarks.bench_worker_pool --jobs 32 --workers 1 2 4
+
+Por padrão os agentes são substituídos por versões locais que fazem um
+trabalho de CPU parecido com a modelagem (agregações do pandas e ajustes
+de mínimos quadrados por série), sem LLM nem Telegram. Com --real, usa os
+agentes reais e a configuração informada em --config.
+"""
+from typing import Dict, Any, List
+from pathlib import Path
+import argparse
+import json
+import os
+import platform
+import time
+import numpy as np
+import pandas as pd
+
+from utils.worker_pool import PipelineWorkerPool, build_default_runner
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+class BenchmarkIngestionAgent:
+    """Gera um histórico sintético em vez de ler arquivos."""
+
+    def load_source(self, source_config: Dict[str, Any]) -> pd.DataFrame:
+        rng = np.random.default_rng(source_config.get("seed", 0))
+        n_products = source_config.get("products", 200)
+        days = source_config.get("days", 365)
+        dates = pd.date_range("2023-01-01", periods=days, freq="D")
+        return pd.DataFrame({
+            "date": np.repeat(dates, n_products),
+            "product_id": np.tile(np.arange(n_products), days),
+            "price": rng.uniform(10, 1000, n_products * days),
+            "quantity": rng.poisson(20, n_products * days)
+        })
+
+    def combine(self, dfs: List[pd.DataFrame]) -> pd.DataFrame:
+        return pd.concat(dfs, ignore_index=True)
+
+class BenchmarkModelingAgent:
+    """Ajusta uma tendência com sazonalidade semanal por produto, mantendo o GIL ocupado com pandas."""
+
+    def run_forecasts(self, df: pd.DataFrame, user_config: Dict[str, Any]) -> Dict[str, Any]:
+        forecasts = {}
+        for product_id, series in df.groupby("product_id"):
+            y = (series["price"] * series["quantity"]).to_numpy()
+            t = np.arange(len(y))
+            design = np.column_stack([np.ones_like(t), t] + [(t % 7 == d).astype(float) for d in range(6)])
+            coef, *_ = np.linalg.lstsq(design, y, rcond=None)
+            forecasts[int(product_id)] = float(design[-1] @ coef)
+        return {"tendencia": forecasts}
+
+    def run_recommendations(self, df: pd.DataFrame, user_config: Dict[str, Any]) -> List[Dict[str, Any]]:
+        top = df.groupby("product_id")["quantity"].sum().nlargest(5)
+        return [{"product_id": int(p), "score": float(q)} for p, q in top.items()]
+
+    def detect_anomalies(self, df: pd.DataFrame, user_config: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return []
+
+    def compute_kpis(self, df: pd.DataFrame) -> Dict[str, Any]:
+        return {"receita_total": float((df["price"] * df["quantity"]).sum())}
+
+class BenchmarkNLPAgent:
+    def execute(self, task_input: Dict[str, Any]) -> Dict[str, Any]:
+        return {"status": "success", "insights": f"{len(json.dumps(task_input['data']))} bytes de dados"}
+
+class BenchmarkDispatchAgent:
+    def execute(self, task_input: Dict[str, Any]) -> Dict[str, Any]:
+        return {"status": "success", "message": f"Simulado para {task_input['user_id']}"}
+
+def build_benchmark_runner():
+    """Fábrica de runner usada nos processos trabalhadores do benchmark."""
+    from utils.pipeline_runner import PipelineRunner
+
+    return PipelineRunner(
+        BenchmarkIngestionAgent(),
+        BenchmarkModelingAgent(),
+        BenchmarkNLPAgent(),
+        BenchmarkDispatchAgent()
+    )
+
+def make_jobs(n_jobs: int, products: int, days: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "usuario_id": f"bench_{i}",
+            "persona": "analista_de_vendas",
+            "data_sources": [{"type": "csv", "path": "", "seed": i, "products": products, "days": days}]
+        }
+        for i in range(n_jobs)
+    ]
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    if args.real:
+        with open(args.config, "r", encoding="utf-8") as f:
+            base_config = json.load(f)
+        jobs = [dict(base_config, usuario_id=f"{base_config['usuario_id']}_{i}") for i in range(args.jobs)]
+        factory, preload = build_default_runner, None
+    else:
+        jobs = make_jobs(args.jobs, args.products, args.days)
+        factory, preload = build_benchmark_runner, ["pandas", "numpy"]
+
+    scenarios = []
+    for workers in args.workers:
+        pool = PipelineWorkerPool(max_workers=workers, preload_modules=preload, runner_factory=factory)
+        pool.start()
+        start = time.perf_counter()
+        results = pool.map(jobs)
+        elapsed = time.perf_counter() - start
+        pool.shutdown()
+
+        failures = sum(1 for r in results if r["status"] != "success")
+        scenarios.append({
+            "workers": workers,
+            "jobs": len(jobs),
+            "falhas": failures,
+            "segundos": round(elapsed, 3),
+            "jobs_por_minuto": round(len(jobs) / elapsed * 60, 1)
+        })
+        print(f"{workers:>3} processos: {scenarios[-1]['jobs_por_minuto']:>8.1f} jobs/min ({failures} falhas)")
+
+    return {
+        "benchmark": "worker_pool",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "real": args.real,
+        "cenarios": scenarios
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=32)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--real", action="store_true", help="Usa os agentes reais")
+    parser.add_argument("--config", default="config/user_configs/default_user.json")
+    parser.add_argument("--output", default=str(RESULTS_DIR / "worker_pool.json"))
+    args = parser.parse_args()
+    args.workers = sorted(set(args.workers))
+
+    report = run(args)
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    print(f"Resultados salvos em {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""Suíte de benchmarks do pipeline com dados sintéticos reproduzíveis.
+
+Uso:
+    python -m benchmarks.run_benchmarks --escala medio
+    python -m benchmarks.run_benchmarks --escala producao --repeticoes 1
+    python -m benchmarks.run_benchmarks --escala medio --comparar benchmarks/results/suite_medio_base.json
+
+Os dados são gerados por `benchmarks.synthetic_data` com semente fixa, de
+modo que duas execuções com os mesmos parâmetros medem exatamente o mesmo
+trabalho. Cada cenário é repetido e registra o tempo mínimo e a mediana.
+O LLM e o Telegram são substituídos pelos agentes simulados de
+`bench_worker_pool`. Cenários cujas dependências não estão instaladas são
+marcados como "ignorado" em vez de interromper a suíte.
+
+Com --comparar, os tempos medianos são comparados com um resultado anterior
+e o processo termina com código 1 se algum cenário ficar mais lento que a
+tolerância.
+"""
+from typing import Dict, Any, List, Callable, Optional
+from pathlib import Path
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic_data import PRESETS, SyntheticConfig, generate_sales_data, generate_user_configs, describe
+from benchmarks.bench_worker_pool import BenchmarkNLPAgent, BenchmarkDispatchAgent
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+class ScenarioSkipped(Exception):
+    """O cenário não pode rodar neste ambiente (dependência ausente, escala inviável)."""
+
+class BenchmarkContext:
+    """Dados e objetos compartilhados entre os cenários de uma execução."""
+
+    def __init__(self, config: SyntheticConfig, work_dir: Path, collaborative_limit: int):
+        self.config = config
+        self.work_dir = work_dir
+        self.collaborative_limit = collaborative_limit
+        self.csv_path = work_dir / "vendas.csv"
+        self.sales = generate_sales_data(config)
+        self.sales.to_csv(self.csv_path, index=False)
+        self.user_config = generate_user_configs(config, 1, str(self.csv_path))[0]
+        self._raw = None
+
+    @property
+    def raw(self) -> pd.DataFrame:
+        """CSV lido sem tratamento, entrada do cenário de process_data."""
+        if self._raw is None:
+            self._raw = pd.read_csv(self.csv_path)
+        return self._raw
+
+    def daily_sales(self) -> pd.DataFrame:
+        """Série diária de receita no formato do Prophet (ds, y)."""
+        sales = self.sales["price"] * self.sales["quantity"]
+        daily = sales.groupby(self.sales["date"]).sum()
+        return pd.DataFrame({"ds": daily.index, "y": daily.to_numpy()})
+
+def _require(module: str) -> None:
+    try:
+        __import__(module)
+    except ImportError as e:
+        raise ScenarioSkipped(f"{module} não instalado ({str(e)})")
+
+def _ingestion_agent():
+    _require("crewai")
+    from agents.data_ingestion_agent import DataIngestionAgent
+    return DataIngestionAgent()
+
+def bench_ingestion(ctx: BenchmarkContext) -> Dict[str, Any]:
+    agent = _ingestion_agent()
+    df = agent.load_source({"type": "csv", "path": str(ctx.csv_path)})
+    return {"rows": len(df)}
+
+def bench_process_data(ctx: BenchmarkContext) -> Dict[str, Any]:
+    agent = _ingestion_agent()
+    df = agent.process_data(ctx.raw.copy())
+    return {"rows": len(df)}
+
+def bench_compaction(ctx: BenchmarkContext) -> Dict[str, Any]:
+    from utils.fact_table import compact_sales_frame, memory_report
+    from utils.catalog import get_catalog
+    catalog_ids = get_catalog(Path("data")).product_ids()
+    # Mesma entrada que a ingestão entrega: datas já convertidas por process_data
+    processed = ctx.raw.assign(date=pd.to_datetime(ctx.raw["date"]))
+    compact = compact_sales_frame(processed, catalog_ids)
+    report = memory_report(processed, compact)
+    return {"rows": len(compact), "memoria": report}
+
+def _forecast(method: str, ctx: BenchmarkContext, *args) -> Dict[str, Any]:
+    _require("prophet" if method == "prophet" else "xgboost")
+    from models.sales_forecasting import SalesForecastingModel
+    daily = ctx.daily_sales()
+    model = SalesForecastingModel()
+    result = getattr(model, f"predict_with_{method}")(daily, *args)
+    if "error" in result:
+        raise RuntimeError(result["error"])
+    return {"rows": len(daily)}
+
+def bench_prophet(ctx: BenchmarkContext) -> Dict[str, Any]:
+    return _forecast("prophet", ctx)
+
+def bench_prophet_full(ctx: BenchmarkContext) -> Dict[str, Any]:
+    # Predict sobre histórico + horizonte com 1000 simulações, para comparar com o modo rápido
+    return _forecast("prophet", ctx, {"prophet": {"previsao_rapida": False}})
+
+def bench_xgboost(ctx: BenchmarkContext) -> Dict[str, Any]:
+    return _forecast("xgboost", ctx)
+
+def bench_hierarchical(ctx: BenchmarkContext) -> Dict[str, Any]:
+    from models.hierarchical_forecast import HierarchicalForecaster
+    config = ctx.user_config["preferencias_analise"]["previsao_vendas"]
+    result = HierarchicalForecaster(config).forecast(ctx.sales)
+    return {"rows": len(ctx.sales), "series_ajustadas": result["series_ajustadas"],
+            "series_reconciliadas": result["series_reconciliadas"]}
+
+def bench_backtest(ctx: BenchmarkContext) -> Dict[str, Any]:
+    from models.anomaly_detection import segment_totals
+    from models.backtesting import Backtester
+    config = ctx.user_config["preferencias_analise"]["previsao_vendas"]
+    series = segment_totals(ctx.sales, config.get("segmentos", ["geral"]))
+    # Cache novo a cada repetição: mede todas as janelas, sem previsões reaproveitadas
+    result = Backtester(config, Path(tempfile.mkdtemp(dir=ctx.work_dir))).run(series)
+    return {"rows": len(ctx.sales), "series": int(series["key"].nunique()),
+            "escolhas": result["escolhas"], "wape": result["resumo"]}
+
+def _recommendation_config(ctx: BenchmarkContext, method: str) -> Dict[str, Any]:
+    preferences = json.loads(json.dumps(ctx.user_config["preferencias_analise"]))
+    preferences["recomendacao_produtos"]["metodo"] = method
+    return preferences
+
+def bench_collaborative(ctx: BenchmarkContext) -> Dict[str, Any]:
+    _require("sklearn")
+    from models.product_recommendation import ProductRecommendationModel
+    preferences = _recommendation_config(ctx, "colaborativo")
+    model = ProductRecommendationModel({})
+    matrix = model.prepare_collaborative_data(ctx.sales, preferences)
+    # A similaridade usuário × usuário é densa: acima do limite não cabe em memória
+    if len(matrix) > ctx.collaborative_limit:
+        raise ScenarioSkipped(f"{len(matrix)} usuários no período excedem o limite de {ctx.collaborative_limit}")
+    user_id = int(ctx.sales["user_id"].mode().iloc[0])
+    recommendations = model.generate_collaborative_recommendations(matrix, user_id, preferences)
+    return {"rows": len(ctx.sales), "usuarios": len(matrix), "produtos": matrix.shape[1], "recomendacoes": len(recommendations)}
+
+def bench_recommendation_table(ctx: BenchmarkContext) -> Dict[str, Any]:
+    from models.product_recommendation import ProductRecommendationModel
+    from utils.recommendation_table import publish_table, RecommendationTable
+    preferences = _recommendation_config(ctx, "colaborativo")
+    users, products, indices, scores = ProductRecommendationModel({}).batch_collaborative_recommendations(ctx.sales, preferences)
+    table_dir = ctx.work_dir / "recomendacoes"
+    publish_table(table_dir, users, products, indices, scores)
+    table = RecommendationTable(table_dir)
+    sample = users[:1000].tolist()
+    start = time.perf_counter()
+    for user_id in sample:
+        table.lookup(user_id)
+    lookup_us = (time.perf_counter() - start) / max(len(sample), 1) * 1e6
+    return {"rows": len(ctx.sales), "usuarios": len(users), "produtos": len(products), "consulta_us": round(lookup_us, 1)}
+
+def bench_als(ctx: BenchmarkContext) -> Dict[str, Any]:
+    from models.product_recommendation import ProductRecommendationModel
+    preferences = _recommendation_config(ctx, "als")
+    users, products, indices, scores = ProductRecommendationModel({}).batch_recommendations(ctx.sales, preferences)
+    return {"rows": len(ctx.sales), "usuarios": len(users), "produtos": len(products)}
+
+def bench_association(ctx: BenchmarkContext) -> Dict[str, Any]:
+    _require("mlxtend")
+    from models.product_recommendation import ProductRecommendationModel
+    preferences = _recommendation_config(ctx, "associacao")
+    model = ProductRecommendationModel({})
+    recommendations = model.generate_recommendations(ctx.sales, preferences)
+    return {"rows": len(ctx.sales), "recomendacoes": len(recommendations)}
+
+def bench_anomalies(ctx: BenchmarkContext) -> Dict[str, Any]:
+    from models.anomaly_detection import AnomalyDetector
+    config = {
+        "alertas": ctx.user_config["alertas"],
+        "preferencias_analise": ctx.user_config["preferencias_analise"]
+    }
+    # Diretório novo a cada repetição: mede o ajuste completo, sem estado salvo
+    state_dir = Path(tempfile.mkdtemp(dir=ctx.work_dir))
+    alerts = AnomalyDetector(config, state_dir).detect(ctx.sales)
+    return {"rows": len(ctx.sales), "alertas": len(alerts)}
+
+def bench_pipeline(ctx: BenchmarkContext) -> Dict[str, Any]:
+    _require("crewai")
+    from agents.data_ingestion_agent import DataIngestionAgent
+    from agents.modeling_agent import ModelingAgent
+    from utils.pipeline_runner import PipelineRunner
+
+    modeling = ModelingAgent()
+    modeling.state_dir = Path(tempfile.mkdtemp(dir=ctx.work_dir))
+    runner = PipelineRunner(DataIngestionAgent(), modeling, BenchmarkNLPAgent(), BenchmarkDispatchAgent())
+    result = runner.run(ctx.user_config)
+    if result.status != "success":
+        raise RuntimeError(f"{result.failed_stage}: {result.error}")
+    return {"rows": result.ingestion.rows, "etapas": {k: round(v, 4) for k, v in result.timings.items()}}
+
+SCENARIOS: Dict[str, Callable[[BenchmarkContext], Dict[str, Any]]] = {
+    "ingestao": bench_ingestion,
+    "process_data": bench_process_data,
+    "compactacao": bench_compaction,
+    "previsao_prophet": bench_prophet,
+    "previsao_prophet_completa": bench_prophet_full,
+    "previsao_xgboost": bench_xgboost,
+    "previsao_hierarquica": bench_hierarchical,
+    "backtest": bench_backtest,
+    "recomendacao_colaborativa": bench_collaborative,
+    "tabela_recomendacoes": bench_recommendation_table,
+    "recomendacao_als": bench_als,
+    "recomendacao_associacao": bench_association,
+    "anomalias": bench_anomalies,
+    "pipeline_completo": bench_pipeline,
+}
+
+def run_scenario(name: str, func: Callable, ctx: BenchmarkContext, repetitions: int) -> Dict[str, Any]:
+    """Executa um cenário `repetitions` vezes e resume os tempos."""
+    times = []
+    details: Dict[str, Any] = {}
+    try:
+        for _ in range(repetitions):
+            start = time.perf_counter()
+            details = func(ctx)
+            times.append(time.perf_counter() - start)
+    except ScenarioSkipped as e:
+        return {"cenario": name, "status": "ignorado", "motivo": str(e)}
+    except Exception as e:
+        return {"cenario": name, "status": "erro", "motivo": f"{type(e).__name__}: {str(e)}"}
+    return {
+        "cenario": name,
+        "status": "ok",
+        "repeticoes": repetitions,
+        "min_s": round(min(times), 4),
+        "mediana_s": round(statistics.median(times), 4),
+        "tempos_s": [round(t, 4) for t in times],
+        **details
+    }
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """Compara as medianas com um resultado anterior e retorna os cenários mais lentos que a tolerância."""
+    previous = {s["cenario"]: s for s in baseline.get("cenarios", []) if s.get("status") == "ok"}
+    if baseline.get("dados") != report["dados"]:
+        print("Aviso: o resultado de referência foi gerado com outros parâmetros de dados")
+    regressions = []
+    for scenario in report["cenarios"]:
+        before = previous.get(scenario["cenario"])
+        if scenario["status"] != "ok" or before is None:
+            continue
+        ratio = scenario["mediana_s"] / max(before["mediana_s"], 1e-9)
+        scenario["razao_referencia"] = round(ratio, 3)
+        if ratio > tolerance:
+            regressions.append(scenario)
+    return regressions
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    overrides = {
+        key: value for key, value in {
+            "products": args.produtos,
+            "stores": args.lojas,
+            "regions": args.regioes,
+            "users": args.usuarios,
+            "years": args.anos,
+            "transactions_per_day": args.transacoes_dia,
+            "seed": args.semente
+        }.items() if value is not None
+    }
+    config = SyntheticConfig(**{**describe(PRESETS[args.escala]), **overrides})
+    names = args.cenarios or list(SCENARIOS)
+
+    with tempfile.TemporaryDirectory(prefix="salespulse_bench_") as tmp:
+        start = time.perf_counter()
+        ctx = BenchmarkContext(config, Path(tmp), args.limite_colaborativo)
+        generation_time = time.perf_counter() - start
+        print(f"{len(ctx.sales)} linhas geradas em {generation_time:.1f}s ({ctx.csv_path.stat().st_size / 1e6:.1f} MB em CSV)")
+
+        scenarios = []
+        for name in names:
+            result = run_scenario(name, SCENARIOS[name], ctx, args.repeticoes)
+            scenarios.append(result)
+            if result["status"] == "ok":
+                print(f"{name:<28} {result['mediana_s']:>9.3f}s (mín {result['min_s']:.3f}s)")
+                if "memoria" in result:
+                    memory = result["memoria"]
+                    print(f"{'':<28} {memory['bytes_por_linha_antes']:.1f} -> {memory['bytes_por_linha_depois']:.1f} bytes/linha")
+            else:
+                print(f"{name:<28} {result['status']}: {result['motivo']}")
+
+    return {
+        "benchmark": "suite",
+        "escala": args.escala,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "dados": {**describe(config), "linhas": len(ctx.sales)},
+        "geracao_s": round(generation_time, 3),
+        "cenarios": scenarios
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--escala", choices=sorted(PRESETS), default="medio")
+    parser.add_argument("--cenarios", nargs="+", choices=list(SCENARIOS))
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--produtos", type=int)
+    parser.add_argument("--lojas", type=int)
+    parser.add_argument("--regioes", type=int)
+    parser.add_argument("--usuarios", type=int)
+    parser.add_argument("--anos", type=float)
+    parser.add_argument("--transacoes-dia", type=int)
+    parser.add_argument("--semente", type=int)
+    parser.add_argument("--limite-colaborativo", type=int, default=20000,
+                        help="Máximo de usuários no período para o cenário colaborativo")
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: benchmarks/results/suite_<escala>.json)")
+    parser.add_argument("--comparar", help="Resultado anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=1.2,
+                        help="Razão máxima aceita entre a mediana atual e a de referência")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    regressions = []
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerancia)
+        for scenario in regressions:
+            print(f"Regressão em {scenario['cenario']}: {scenario['razao_referencia']:.2f}x a referência")
+
+    output = Path(args.output or RESULTS_DIR / f"suite_{args.escala}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False, default=str)
+    print(f"Resultados salvos em {output}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+from typing import Dict, Any, List
+from dataclasses import dataclass, asdict
+import numpy as np
+import pandas as pd
+
+CATEGORIES = ["Eletrônicos", "Acessórios", "Roupas", "Alimentos", "Casa", "Esportes", "Beleza", "Brinquedos"]
+REGIONS = ["Sudeste", "Sul", "Nordeste", "Centro-Oeste", "Norte"]
+PAYMENT_METHODS = ["Cartão de Crédito", "Cartão de Débito", "PIX", "Boleto"]
+
+@dataclass
+class SyntheticConfig:
+    """Parâmetros do gerador de vendas sintéticas."""
+    products: int = 500
+    stores: int = 20
+    regions: int = 5
+    users: int = 10000
+    years: float = 2.0
+    transactions_per_day: int = 2000
+    start_date: str = "2022-01-01"
+    trend_per_year: float = 0.15
+    weekly_amplitude: float = 0.25
+    yearly_amplitude: float = 0.30
+    popularity_skew: float = 1.1
+    seed: int = 42
+
+# Cenários de escala usados pelo benchmark
+PRESETS = {
+    "pequeno": SyntheticConfig(products=50, stores=5, users=1000, years=1.0, transactions_per_day=200),
+    "medio": SyntheticConfig(),
+    "producao": SyntheticConfig(products=5000, stores=100, users=200000, years=3.0, transactions_per_day=5000),
+}
+
+def _demand_curve(dates: pd.DatetimeIndex, config: SyntheticConfig) -> np.ndarray:
+    """Multiplicador diário de demanda: tendência, sazonalidade semanal e anual (pico em dezembro)."""
+    t = np.arange(len(dates)) / 365.25
+    trend = (1 + config.trend_per_year) ** t
+    weekly = 1 + config.weekly_amplitude * np.where(dates.dayofweek >= 5, 1.0, -0.4)
+    yearly = 1 + config.yearly_amplitude * np.cos(2 * np.pi * (dates.dayofyear.to_numpy() - 350) / 365.25)
+    return trend * weekly * yearly
+
+def generate_products(config: SyntheticConfig) -> pd.DataFrame:
+    """Gera o catálogo com categoria, marca e preço base por produto."""
+    rng = np.random.default_rng(config.seed)
+    product_ids = np.arange(1, config.products + 1)
+    categories = np.array(CATEGORIES)[rng.integers(0, len(CATEGORIES), config.products)]
+    return pd.DataFrame({
+        "product_id": product_ids,
+        "product_name": [f"Produto {i}" for i in product_ids],
+        "category": categories,
+        "brand": [f"Marca {i}" for i in rng.integers(1, max(2, config.products // 20) + 1, config.products)],
+        "base_price": np.round(rng.lognormal(mean=4.5, sigma=1.0, size=config.products), 2)
+    })
+
+def generate_stores(config: SyntheticConfig) -> pd.DataFrame:
+    """Gera as lojas, distribuídas entre as regiões."""
+    regions = REGIONS[:config.regions] if config.regions <= len(REGIONS) else \
+        REGIONS + [f"Região {i}" for i in range(len(REGIONS) + 1, config.regions + 1)]
+    return pd.DataFrame({
+        "store_id": [f"S{i:03d}" for i in range(1, config.stores + 1)],
+        "region": [regions[i % len(regions)] for i in range(config.stores)]
+    })
+
+def generate_sales_data(config: SyntheticConfig = None) -> pd.DataFrame:
+    """Gera a tabela de vendas com o mesmo esquema de data/sample_sales_data.csv.
+
+    O número de transações por dia segue a curva de demanda; produtos e
+    clientes seguem popularidade de Zipf. A mesma semente sempre produz os
+    mesmos dados.
+    """
+    config = config or SyntheticConfig()
+    rng = np.random.default_rng(config.seed)
+    products = generate_products(config)
+    stores = generate_stores(config)
+
+    dates = pd.date_range(config.start_date, periods=int(round(config.years * 365)), freq="D")
+    per_day = rng.poisson(config.transactions_per_day * _demand_curve(dates, config))
+    n_rows = int(per_day.sum())
+
+    product_weights = 1 / np.arange(1, config.products + 1) ** config.popularity_skew
+    product_idx = rng.choice(config.products, size=n_rows, p=product_weights / product_weights.sum())
+    user_weights = 1 / np.arange(1, config.users + 1) ** 0.8
+    store_idx = rng.integers(0, config.stores, n_rows)
+    base_price = products["base_price"].to_numpy()[product_idx]
+
+    return pd.DataFrame({
+        "date": np.repeat(dates.to_numpy(), per_day),
+        "transaction_id": np.arange(1, n_rows + 1),
+        "product_id": products["product_id"].to_numpy()[product_idx],
+        "product_name": products["product_name"].to_numpy()[product_idx],
+        "category": products["category"].to_numpy()[product_idx],
+        "price": np.round(base_price * rng.uniform(0.9, 1.1, n_rows), 2),
+        "quantity": 1 + rng.poisson(1.5, n_rows),
+        "user_id": 1000 + rng.choice(config.users, size=n_rows, p=user_weights / user_weights.sum()),
+        "rating": np.clip(np.rint(rng.normal(3.9, 0.9, n_rows)), 1, 5).astype(int),
+        "store_id": stores["store_id"].to_numpy()[store_idx],
+        "region": stores["region"].to_numpy()[store_idx],
+        "payment_method": np.array(PAYMENT_METHODS)[rng.integers(0, len(PAYMENT_METHODS), n_rows)]
+    })
+
+def generate_user_configs(config: SyntheticConfig, n_users: int, data_path: str) -> List[Dict[str, Any]]:
+    """Gera configurações de usuário válidas distribuídas entre as personas."""
+    personas = ["diretor_comercial", "analista_de_vendas", "representante_de_campo"]
+    rng = np.random.default_rng(config.seed)
+    configs = []
+    for i in range(n_users):
+        hour, minute = 7 + int(rng.integers(0, 3)), int(rng.choice([0, 15, 30, 45]))
+        configs.append({
+            "usuario_id": f"sintetico_{i}",
+            "persona": personas[i % len(personas)],
+            "frequencia_envio": "diario",
+            "tipo_conteudo": ["tendencias", "anomalias", "top_produtos"],
+            "horario_preferido": f"{hour:02d}:{minute:02d}",
+            "formato_preferido": "resumo_executivo",
+            "data_sources": [{"type": "csv", "path": data_path}],
+            "preferencias_analise": {
+                "previsao_vendas": {
+                    "horizonte": 30,
+                    "metodo": "prophet",
+                    "nivel_detalhe": "alto",
+                    "metricas": ["volume", "receita"],
+                    "segmentos": ["geral", "categoria", "produto"]
+                },
+                "recomendacao_produtos": {
+                    "metodo": "colaborativo",
+                    "filtros": {"categoria": True, "preco": True, "desempenho": True},
+                    "quantidade": 5,
+                    "periodo_analise": 90
+                }
+            },
+            "alertas": {"anomalias": True, "tendencias": True, "metas": True, "threshold_anomalia": 0.2}
+        })
+    return configs
+
+def describe(config: SyntheticConfig) -> Dict[str, Any]:
+    """Parâmetros do gerador em formato serializável, para registrar nos resultados."""
+    return asdict(config)
@@ -1,35 +1,160 @@
 import os
 import json
-from datetime import datetime
+import logging
+import signal
+import sys
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from functools import cached_property
 from typing import Dict, List
 from pathlib import Path
 
-from crewai import Agent, Task, Crew, Process
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+import pytz
 
-from agents.data_ingestion_agent import DataIngestionAgent
-from agents.modeling_agent import ModelingAgent
-from agents.nlp_generation_agent import NLPGenerationAgent
-from agents.telegram_dispatch_agent import TelegramDispatchAgent
-from utils.data_loader import load_user_configs
+from utils.data_loader import load_system_config
+from utils.config_registry import ConfigRegistry, ConfigChanges, effective_config, load_persona_defaults
 from utils.telegram_api import TelegramAPI
+from utils.worker_pool import PipelineWorkerPool
+
+# Agents, models and CrewAI are imported on first use so that startup (and every
+# worker spawn) only pays for the libraries a run actually needs.
 
 class SalesInsightsSystem:
     def __init__(self):
         self.config_dir = Path("config")
-        self.user_configs = load_user_configs(self.config_dir / "user_configs")
+        self.system_config = load_system_config(self.config_dir)
+        self.config_settings = self.system_config.get("configuracoes", {})
+        self.config_registry = ConfigRegistry(self.config_dir, max_workers=self.config_settings.get("max_workers", 8))
+        self.config_registry.load_all()
+        self.persona_defaults = load_persona_defaults(self.config_dir)
+        self.scheduler_settings = self.system_config.get("agendador", {})
+        self.precompute_settings = self.scheduler_settings.get("pre_calculo", {})
+        self.default_timezone = self.scheduler_settings.get("fuso_horario", "America/Sao_Paulo")
+        # (usuário, prazo) cujo pré-cálculo já começou, para o replanejamento não repeti-lo
+        self._prepared = set()
+        self._prepared_lock = threading.Lock()
+        self._user_locks = defaultdict(threading.Lock)
+        self._user_locks_guard = threading.Lock()
         self.telegram_api = TelegramAPI()
-        self.scheduler = BackgroundScheduler()
+        self.scheduler = self.create_scheduler()
+        self.worker_pool = None
+        if self.scheduler_settings.get("executor", "threads") == "processos":
+            self.worker_pool = PipelineWorkerPool(
+                max_workers=self.scheduler_settings.get("max_workers"),
+                memory_limit_mb=self.scheduler_settings.get("memoria_max_mb"),
+                preload_modules=self.scheduler_settings.get("pre_carregar")
+            )
+        self._shutdown_event = threading.Event()
+        self.alert_watcher = None
+        self.pipeline_settings = self.system_config.get("pipeline", {})
+        self.bot_settings = self.system_config.get("bot", {})
+        self.bot = None
+        
+    @property
+    def user_configs(self) -> List[Dict]:
+        """Current user configurations, served from the registry."""
+        return self.config_registry.all()
+        
+    @cached_property
+    def data_ingestion_agent(self):
+        from agents.data_ingestion_agent import DataIngestionAgent
+        return DataIngestionAgent()
+        
+    @cached_property
+    def modeling_agent(self):
+        from agents.modeling_agent import ModelingAgent
+        return ModelingAgent()
+        
+    @cached_property
+    def nlp_generation_agent(self):
+        from agents.nlp_generation_agent import NLPGenerationAgent
+        return NLPGenerationAgent()
+        
+    @cached_property
+    def telegram_dispatch_agent(self):
+        from agents.telegram_dispatch_agent import TelegramDispatchAgent
+        return TelegramDispatchAgent(self.telegram_api, self.config_registry)
+        
+    @cached_property
+    def pipeline_runner(self):
+        from utils.pipeline_runner import PipelineRunner
+        return PipelineRunner(
+            self.data_ingestion_agent,
+            self.modeling_agent,
+            self.nlp_generation_agent,
+            self.telegram_dispatch_agent,
+            max_workers=self.pipeline_settings.get("max_workers", 4),
+            instrumentation=self.system_config.get("instrumentacao", {}),
+            result_cache=self.result_cache,
+            checkpoint_store=self.checkpoint_store,
+            max_attempts=self.pipeline_settings.get("max_tentativas", 1),
+            retry_delay=self.pipeline_settings.get("intervalo_tentativas_segundos", 30),
+            timing_history=self.timing_history,
+            chart_renderer=self.chart_renderer,
+            report_exporter=self.report_exporter,
+            persona_defaults=self.persona_defaults
+        )
+        
+    @cached_property
+    def chart_renderer(self):
+        from utils.chart_renderer import build_chart_renderer
+        return build_chart_renderer(self.system_config.get("graficos", {}))
+        
+    @cached_property
+    def report_exporter(self):
+        from utils.report_export import build_report_exporter
+        return build_report_exporter(self.system_config.get("exportacao", {}))
+        
+    @cached_property
+    def timing_history(self):
+        from utils.deadline_planner import RunTimingHistory
+        return RunTimingHistory(Path(self.precompute_settings.get("diretorio_duracoes", "data/state/duracoes")))
         
-        # Initialize agents
-        self.data_ingestion_agent = DataIngestionAgent()
-        self.modeling_agent = ModelingAgent()
-        self.nlp_generation_agent = NLPGenerationAgent()
-        self.telegram_dispatch_agent = TelegramDispatchAgent(self.telegram_api)
+    @cached_property
+    def checkpoint_store(self):
+        from utils.checkpoint_store import CheckpointStore
+        return CheckpointStore(
+            Path(self.pipeline_settings.get("diretorio_checkpoints", "data/state/checkpoints")),
+            retention_days=self.pipeline_settings.get("retencao_checkpoints_dias", 7)
+        )
+        
+    @cached_property
+    def recommendation_tables(self):
+        from utils.recommendation_table import RecommendationTables
+        settings = self.system_config.get("recomendacoes_servico", {})
+        return RecommendationTables(Path(settings.get("diretorio", "data/state/recomendacoes")))
         
-    def create_crew(self, user_config: Dict) -> Crew:
+    @cached_property
+    def result_cache(self):
+        from utils.result_cache import ResultCache
+        return ResultCache(Path(self.bot_settings.get("diretorio_cache", "data/state/resultados")))
+        
+    def create_scheduler(self) -> BackgroundScheduler:
+        """Create the scheduler with the executor and job defaults from system_config.json."""
+        settings = self.scheduler_settings
+        # In process mode the scheduler threads only wait on the worker pool
+        executor = ThreadPoolExecutor(settings.get("max_workers", 4))
+            
+        return BackgroundScheduler(
+            executors={"default": executor},
+            job_defaults={
+                # A user's run never overlaps with itself and missed runs collapse into one
+                "max_instances": settings.get("max_instances", 1),
+                "coalesce": settings.get("coalesce", True),
+                "misfire_grace_time": settings.get("misfire_grace_time", 300)
+            }
+        )
+    
+    def create_crew(self, user_config: Dict):
         """Create a CrewAI crew for processing a single user's insights."""
+        from crewai import Task, Crew, Process
+        
         tasks = [
             Task(
                 description=f"Coletar e processar dados de vendas para {user_config['persona']}",
@@ -56,8 +181,85 @@ class SalesInsightsSystem:
             process=Process.sequential
         )
     
+    def _user_lock(self, user_id: str) -> threading.Lock:
+        with self._user_locks_guard:
+            return self._user_locks[user_id]
+        
+    def _local_date(self, user_config: Dict, moment: datetime = None):
+        """Calendar date of `moment` (default: now) in the user's timezone; keys the day's checkpoints."""
+        from utils.deadline_planner import user_timezone
+        moment = moment or datetime.now(pytz.utc)
+        return moment.astimezone(user_timezone(user_config, self.default_timezone)).date()
+    
     def process_user_insights(self, user_config: Dict):
-        """Process insights for a single user."""
+        """Process insights for a single user.
+        
+        When the heavy stages were pre-computed for today, the run resumes
+        from their checkpoints and only dispatches the staged report.
+        """
+        if self.pipeline_settings.get("modo", "direto") == "crewai":
+            self.process_user_insights_crew(user_config)
+            return
+            
+        run_date = self._local_date(user_config)
+        if self.pipeline_settings.get("modo", "direto") == "distribuido":
+            self.enqueue_user(user_config, run_date=run_date)
+            return
+            
+        # Waits for a pre-computation that is still running instead of duplicating it
+        with self._user_lock(user_config["usuario_id"]):
+            if self.worker_pool:
+                result = self.worker_pool.run(user_config, run_date=run_date)
+            else:
+                result = self.pipeline_runner.run(user_config, run_date=run_date).to_dict()
+        if result["status"] == "success":
+            print(f"Processamento concluído para usuário {user_config['usuario_id']}")
+        else:
+            print(f"Erro ao processar insights para usuário {user_config['usuario_id']}: {result['error']}")
+            
+    def prepare_user_insights(self, user_config: Dict, deadline: datetime):
+        """Run ingestion, modeling and generation ahead of `deadline`, staging the report for dispatch."""
+        from utils.deadline_planner import PREPARATION_STAGES
+        user_id = user_config["usuario_id"]
+        with self._prepared_lock:
+            self._prepared.add((user_id, deadline))
+        run_date = self._local_date(user_config, deadline)
+        until = PREPARATION_STAGES[-1]
+        if self.pipeline_settings.get("modo", "direto") == "distribuido":
+            self.enqueue_user(user_config, run_date=run_date, until=until)
+            return
+            
+        with self._user_lock(user_id):
+            if self.worker_pool:
+                result = self.worker_pool.run(user_config, until=until, run_date=run_date)
+            else:
+                result = self.pipeline_runner.run(user_config, until=until, run_date=run_date).to_dict()
+        if result["status"] == "success":
+            print(f"Relatório de {user_id} preparado para {deadline.strftime('%d/%m %H:%M %Z')}")
+        else:
+            print(f"Erro no pré-cálculo de {user_id}, o envio recalculará as etapas: {result['error']}")
+    
+    @cached_property
+    def job_queue(self):
+        from utils.queue_worker import build_queue
+        return build_queue(self.system_config.get("fila", {}))
+        
+    def enqueue_user(self, user_config: Dict, run_date=None, until: str = None):
+        """Queue a user's run for the distributed workers (one active job per user, day and stage range)."""
+        from utils.queue_worker import JOB_PIPELINE
+        run_date = run_date or self._local_date(user_config)
+        job_key = f"{user_config['usuario_id']}:{run_date.isoformat()}" + (f":{until}" if until else "")
+        payload = {"user_config": user_config, "data_execucao": run_date.isoformat()}
+        if until:
+            payload["ate_etapa"] = until
+        job_id = self.job_queue.enqueue(JOB_PIPELINE, payload, job_key=job_key)
+        if job_id is None:
+            print(f"Processamento de {user_config['usuario_id']} já está na fila")
+        else:
+            print(f"Processamento de {user_config['usuario_id']} enfileirado (job {job_id})")
+    
+    def process_user_insights_crew(self, user_config: Dict):
+        """Process insights for a single user through CrewAI orchestration."""
         try:
             crew = self.create_crew(user_config)
             crew.kickoff()
@@ -65,45 +267,257 @@ class SalesInsightsSystem:
         except Exception as e:
             print(f"Erro ao processar insights para usuário {user_config['usuario_id']}: {str(e)}")
     
-    def schedule_jobs(self):
-        """Schedule jobs for all users based on their preferences."""
+    def publish_recommendation_tables(self):
+        """Offline job: rebuild every user's per-customer recommendation table."""
+        settings = self.system_config.get("recomendacoes_servico", {})
         for user_config in self.user_configs:
-            # Parse the preferred time
-            hour, minute = map(int, user_config['horario_preferido'].split(':'))
-            
-            # Schedule based on frequency
-            if user_config['frequencia_envio'] == 'diario':
-                self.scheduler.add_job(
-                    self.process_user_insights,
-                    CronTrigger(hour=hour, minute=minute),
-                    args=[user_config],
-                    id=f"user_{user_config['usuario_id']}"
+            user_id = user_config["usuario_id"]
+            try:
+                user_config = effective_config(user_config, self.persona_defaults)
+                ingestion = self.pipeline_runner.ingest(user_config)
+                summary = self.modeling_agent.publish_recommendation_table(
+                    ingestion.data,
+                    user_config,
+                    self.recommendation_tables.table_dir(user_id),
+                    top_n=settings.get("quantidade"),
+                    keep_versions=settings.get("versoes_mantidas", 2)
+                )
+                print(f"Tabela de recomendações de {user_id} publicada: {summary['clientes']} clientes ({summary['versao']})")
+            except Exception as e:
+                print(f"Erro ao publicar recomendações de {user_id}: {str(e)}")
+    
+    def schedule_user(self, user_config: Dict):
+        """Schedule (or reschedule) a single user's job based on their preferences."""
+        from utils.deadline_planner import user_timezone
+        jitter = self.scheduler_settings.get("jitter_segundos")
+        timezone = user_timezone(user_config, self.default_timezone)
+        
+        # Parse the preferred time
+        hour, minute = map(int, user_config['horario_preferido'].split(':'))
+        
+        # Schedule based on frequency, in the user's timezone
+        if user_config['frequencia_envio'] == 'diario':
+            trigger = CronTrigger(hour=hour, minute=minute, jitter=jitter, timezone=timezone)
+        elif user_config['frequencia_envio'] == 'semanal':
+            trigger = CronTrigger(day_of_week='mon', hour=hour, minute=minute, jitter=jitter, timezone=timezone)
+        else:
+            return
+        self.scheduler.add_job(
+            self.process_user_insights,
+            trigger,
+            args=[user_config],
+            id=f"user_{user_config['usuario_id']}",
+            replace_existing=True
+        )
+        
+    def unschedule_user(self, user_id: str):
+        """Remove a user's jobs, if scheduled."""
+        for job_id in (f"user_{user_id}", f"preparo_{user_id}"):
+            if self.scheduler.get_job(job_id):
+                self.scheduler.remove_job(job_id)
+                
+    @property
+    def precompute_enabled(self) -> bool:
+        return bool(self.precompute_settings.get("ativo")) and self.pipeline_settings.get("modo", "direto") != "crewai"
+    
+    def plan_precomputation(self):
+        """Schedule each user's heavy stages so the report is ready at their preferred time.
+        
+        Durations are estimated from past runs; users sharing a delivery time
+        are staggered across the preceding window so that at most
+        `vagas` pre-computations run at once. Deliveries in the next 24 hours
+        are (re)planned on every call, except those already started.
+        """
+        from utils.deadline_planner import next_deadline, plan_starts
+        settings = self.precompute_settings
+        now = datetime.now(pytz.utc)
+        horizon = now + timedelta(hours=24)
+        # A pre-computation starting mid-plan waits here, so it is never rescheduled after it began
+        with self._prepared_lock:
+            self._prepared = {(user_id, deadline) for user_id, deadline in self._prepared if deadline > now}
+        
+            jobs, pending = [], {}
+            for user_config in self.user_configs:
+                user_id = user_config["usuario_id"]
+                deadline = next_deadline(user_config, now, self.default_timezone)
+                if deadline is None or deadline > horizon or (user_id, deadline) in self._prepared:
+                    continue
+                estimate = self.timing_history.estimate(
+                    user_id,
+                    quantile=settings.get("quantil_duracao", 0.9),
+                    default=settings.get("duracao_padrao_segundos", 300)
                 )
-            elif user_config['frequencia_envio'] == 'semanal':
+                duration = estimate * settings.get("fator_seguranca", 1.2) + settings.get("margem_segundos", 60)
+                jobs.append((user_id, deadline, duration))
+                pending[user_id] = (user_config, deadline)
+            
+            slots = settings.get("vagas") or (self.worker_pool.max_workers if self.worker_pool
+                                              else self.scheduler_settings.get("max_workers", 4))
+            starts = plan_starts(jobs, slots, max_lead=settings.get("antecipacao_maxima_minutos", 120) * 60)
+            for user_id, start in starts.items():
+                user_config, deadline = pending[user_id]
                 self.scheduler.add_job(
-                    self.process_user_insights,
-                    CronTrigger(day_of_week='mon', hour=hour, minute=minute),
-                    args=[user_config],
-                    id=f"user_{user_config['usuario_id']}"
+                    self.prepare_user_insights,
+                    DateTrigger(run_date=max(start, now)),
+                    args=[user_config, deadline],
+                    id=f"preparo_{user_id}",
+                    replace_existing=True
                 )
+        if starts:
+            print(f"Pré-cálculo planejado para {len(starts)} usuários")
+    
+    def schedule_jobs(self):
+        """Schedule jobs for all users based on their preferences."""
+        for user_config in self.user_configs:
+            self.schedule_user(user_config)
+            
+    def apply_config_changes(self, changes: ConfigChanges):
+        """Reschedule only the jobs of users whose configuration changed."""
+        for user_id in changes.removed:
+            self.unschedule_user(user_id)
+        for user_config in changes.added + changes.updated:
+            self.schedule_user(user_config)
+        if self.precompute_enabled:
+            self.plan_precomputation()
+        if self.alert_watcher:
+            self.start_alert_watcher()
+        print(
+            f"Agendamentos atualizados: {len(changes.added)} novos, "
+            f"{len(changes.updated)} alterados, {len(changes.removed)} removidos"
+        )
     
     def start(self):
         """Start the system."""
+        metrics_port = self.system_config.get("instrumentacao", {}).get("porta_prometheus")
+        if metrics_port:
+            from utils.instrumentation import start_metrics_server
+            start_metrics_server(metrics_port)
+        if self.worker_pool:
+            self.worker_pool.start()
         self.schedule_jobs()
+        if self.precompute_enabled:
+            self.scheduler.add_job(
+                self.plan_precomputation,
+                IntervalTrigger(minutes=self.precompute_settings.get("intervalo_planejamento_minutos", 30)),
+                id="planejamento_pre_calculo",
+                next_run_time=datetime.now(pytz.utc),
+                replace_existing=True
+            )
+        recommendation_settings = self.system_config.get("recomendacoes_servico", {})
+        if recommendation_settings.get("ativo"):
+            hour, minute = map(int, recommendation_settings.get("horario", "03:00").split(":"))
+            self.scheduler.add_job(
+                self.publish_recommendation_tables,
+                CronTrigger(hour=hour, minute=minute, timezone=pytz.timezone(self.default_timezone)),
+                id="tabela_recomendacoes",
+                replace_existing=True
+            )
         self.scheduler.start()
+        if self.config_settings.get("monitorar", True):
+            self.config_registry.watch(self.apply_config_changes, self.config_settings.get("intervalo_segundos", 10))
+        self.start_alert_watcher()
+        self.start_bot()
         print("Sistema de Insights de Vendas iniciado!")
         
+    def start_alert_watcher(self):
+        """Start the real-time alert path if enabled in system_config.json.
+        
+        When a watcher is already running (configuration reload), it is
+        stopped and replaced by one built from the current user configs,
+        which keeps the source and the partial totals of the open day.
+        """
+        settings = self.system_config.get("alertas_tempo_real", {})
+        if not settings.get("ativo"):
+            return
+        from utils.realtime_alerts import build_alert_watcher
+        previous = self.alert_watcher
+        previous_timezones = set()
+        if previous:
+            previous.stop()
+            previous_timezones = set(previous.engine.timezones())
+        user_configs = [effective_config(user_config, self.persona_defaults) for user_config in self.user_configs]
+        self.alert_watcher = build_alert_watcher(settings, user_configs, self.telegram_dispatch_agent,
+                                                 self.default_timezone, previous=previous)
+        self.alert_watcher.start()
+        timezones = self.alert_watcher.engine.timezones()
+        for timezone in previous_timezones - set(timezones):
+            self.scheduler.remove_job(f"fechamento_alertas_{timezone}")
+        # Close each timezone's day right after its midnight instead of waiting for the next day's first sale
+        for timezone in timezones:
+            self.scheduler.add_job(
+                self.alert_watcher.close_day,
+                CronTrigger(hour=0, minute=settings.get("fechamento_minutos", 5), timezone=pytz.timezone(timezone)),
+                args=[timezone],
+                id=f"fechamento_alertas_{timezone}",
+                replace_existing=True
+            )
+        
+    def request_refresh(self, user_config: Dict):
+        """Queue an immediate background run for a user (deduplicated by job id)."""
+        self.scheduler.add_job(
+            self.process_user_insights,
+            args=[user_config],
+            id=f"atualizacao_{user_config['usuario_id']}",
+            replace_existing=True
+        )
+        
+    def start_bot(self):
+        """Start the Telegram command handler if enabled in system_config.json."""
+        if not self.bot_settings.get("ativo"):
+            return
+        from utils.telegram_bot import InsightBot, TelegramUpdateSource
+        # The bot runs its own event loop, so it gets its own Telegram client
+        bot_api = TelegramAPI()
+        self.bot = InsightBot(
+            bot_api,
+            self.result_cache,
+            self.config_registry,
+            request_refresh=self.request_refresh,
+            max_age=self.bot_settings.get("validade_cache_minutos", 1440) * 60,
+            refresh_cooldown=self.bot_settings.get("intervalo_atualizacao_segundos", 300),
+            recommendation_tables=self.recommendation_tables
+        )
+        self.bot.start(TelegramUpdateSource(bot_api), self.bot_settings.get("intervalo_segundos", 1))
+        
     def stop(self):
-        """Stop the system."""
-        self.scheduler.shutdown()
+        """Stop the system, waiting for in-flight jobs to finish."""
+        if self.bot:
+            self.bot.stop()
+        self.config_registry.stop()
+        if self.alert_watcher:
+            self.alert_watcher.stop()
+        print("Aguardando a conclusão dos processamentos em andamento...")
+        self.scheduler.shutdown(wait=True)
+        if self.worker_pool:
+            self.worker_pool.shutdown()
+        for name in ("chart_renderer", "report_exporter"):
+            if self.__dict__.get(name):
+                self.__dict__[name].shutdown()
         print("Sistema de Insights de Vendas encerrado.")
+        
+    def _handle_signal(self, signum, frame):
+        """Request a graceful shutdown on SIGTERM/SIGINT."""
+        print(f"Sinal {signal.Signals(signum).name} recebido, encerrando...")
+        self._shutdown_event.set()
+        
+    def run_forever(self):
+        """Run as a service, blocking until SIGTERM or SIGINT is received."""
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, self._handle_signal)
+        self.start()
+        try:
+            self._shutdown_event.wait()
+        finally:
+            self.stop()
 
 if __name__ == "__main__":
-    system = SalesInsightsSystem()
-    try:
-        system.start()
-        # Keep the main thread alive
-        while True:
-            pass
-    except KeyboardInterrupt:
-        system.stop() 
\ No newline at end of file
+    if "--perfil-inicializacao" in sys.argv:
+        from utils.startup_profile import print_import_profile
+        print_import_profile()
+    else:
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s - %(levelname)s - %(message)s'
+        )
+        system = SalesInsightsSystem()
+        system.run_forever() 
\ No newline at end of file
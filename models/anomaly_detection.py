@@ -0,0 +1,319 @@
+from typing import Dict, Any, List, Optional
+from pathlib import Path
+import hashlib
+import json
+import pandas as pd
+import numpy as np
+import logging
+
+# Mapeia os segmentos das configurações para as colunas da tabela de vendas
+SEGMENT_COLUMNS = {
+    'categoria': 'category',
+    'produto': 'product_id',
+    'regiao': 'region',
+    'loja': 'store_id',
+    'cliente': 'user_id'
+}
+
+def metric_values(df: pd.DataFrame, metric: str) -> pd.Series:
+    """Retorna a série da métrica solicitada ('volume' ou 'receita')."""
+    if metric == 'volume':
+        return df['quantity'].astype('float64')
+    if metric == 'receita':
+        return df['price'].astype('float64') * df['quantity'].astype('float64')
+    if metric in df.columns:
+        return df[metric].astype('float64')
+    raise ValueError(f"Métrica não suportada: {metric}")
+
+def state_scope(user_config: Dict[str, Any]) -> str:
+    """Escopo do estado de um usuário: o id e as fontes de dados (tipo e caminho ou consulta).
+
+    Usuários com a mesma configuração mas execuções independentes não podem
+    compartilhar o estado: o primeiro a rodar no dia avançaria o estado e os
+    demais não veriam mais o dia novo.
+    """
+    sources = [
+        {key: source.get(key) for key in ('type', 'path', 'connection_string', 'query', 'table')}
+        for source in user_config.get('data_sources', [])
+    ]
+    fingerprint = hashlib.sha1(json.dumps(sources, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:12]
+    return f"{user_config.get('usuario_id', '')}:{fingerprint}"
+
+def segment_totals(df: pd.DataFrame, segments: List[str], metric: str = 'receita') -> pd.DataFrame:
+    """Agrega a métrica por dia para todos os segmentos de uma só vez.
+
+    Retorna um DataFrame longo com as colunas 'date', 'key' e 'value', onde
+    'key' identifica o segmento no formato 'nivel=valor' (ou 'geral').
+    """
+    dates = pd.to_datetime(df['date']).dt.normalize()
+    values = metric_values(df, metric)
+    frames = []
+    for segment in segments:
+        if segment == 'geral':
+            totals = values.groupby(dates).sum()
+            frames.append(pd.DataFrame({
+                'date': totals.index,
+                'key': 'geral',
+                'value': totals.to_numpy()
+            }))
+            continue
+        column = SEGMENT_COLUMNS.get(segment)
+        if column is None or column not in df.columns:
+            continue
+        totals = values.groupby([dates, df[column]], observed=True).sum()
+        # Monta as chaves apenas para os valores distintos do segmento
+        codes, uniques = pd.factorize(totals.index.get_level_values(1))
+        labels = np.array([f"{segment}={value}" for value in uniques], dtype=object)
+        frames.append(pd.DataFrame({
+            'date': totals.index.get_level_values(0),
+            'key': labels[codes],
+            'value': totals.to_numpy()
+        }))
+    if not frames:
+        return pd.DataFrame({'date': pd.Series(dtype='datetime64[ns]'), 'key': pd.Series(dtype=str), 'value': pd.Series(dtype=float)})
+    return pd.concat(frames, ignore_index=True)
+
+class AnomalyDetector:
+    """Detecta anomalias diárias em todos os segmentos com estado incremental.
+
+    Mantém, para cada segmento, média e variância móveis exponenciais em
+    vetores NumPy. Cada novo dia atualiza todos os segmentos com operações
+    vetorizadas, de modo que o custo por execução depende apenas do dia novo.
+    """
+
+    def __init__(self, config: Dict, state_dir: Optional[Path] = None, scope: Optional[str] = None):
+        alertas = config.get('alertas', {})
+        previsao = config.get('preferencias_analise', {}).get('previsao_vendas', {})
+        self.threshold = alertas.get('threshold_anomalia', 0.2)
+        self.z_threshold = alertas.get('z_anomalia', 3.0)
+        self.alpha = alertas.get('alpha_anomalia', 0.1)
+        self.trend_alpha = alertas.get('alpha_tendencia', 0.3)
+        self.min_periods = alertas.get('periodos_minimos', 14)
+        self.max_alerts = alertas.get('max_alertas', 10)
+        self.segments = previsao.get('segmentos', ['geral', 'categoria', 'produto'])
+        self.metric = alertas.get('metrica_anomalia', 'receita')
+        # Sem escopo, o estado é compartilhado por quem tem os mesmos segmentos e métrica
+        # (ex.: o monitoramento em tempo real, que processa um único fluxo de vendas)
+        self.scope = scope
+        self.state_path = Path(state_dir) / f"anomalias_{self.state_key()}.npz" if state_dir else None
+        self.logger = logging.getLogger(__name__)
+        self._reset()
+        if self.state_path and self.state_path.exists():
+            self.load(self.state_path)
+
+    def state_key(self) -> str:
+        """Identifica o estado: segmentos, métrica, suavização e o escopo (usuário e fontes de dados)."""
+        key = json.dumps([self.segments, self.metric, self.alpha, self.trend_alpha] + ([self.scope] if self.scope else []))
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+
+    def _reset(self) -> None:
+        self.keys = np.empty(0, dtype=object)
+        self.mean = np.empty(0)
+        self.var = np.empty(0)
+        self.fast_mean = np.empty(0)
+        self.count = np.empty(0, dtype=np.int64)
+        self.last_date = None
+        self.last_alerts: List[Dict[str, Any]] = []
+        self._index = pd.Index(self.keys)
+
+    def _positions(self, keys: np.ndarray) -> np.ndarray:
+        """Retorna a posição de cada chave no estado, registrando chaves novas."""
+        positions = self._index.get_indexer(keys)
+        missing = positions < 0
+        if missing.any():
+            new_keys = pd.unique(keys[missing])
+            self.keys = np.concatenate([self.keys, new_keys.astype(object)])
+            self.mean = np.concatenate([self.mean, np.zeros(len(new_keys))])
+            self.var = np.concatenate([self.var, np.zeros(len(new_keys))])
+            self.fast_mean = np.concatenate([self.fast_mean, np.zeros(len(new_keys))])
+            self.count = np.concatenate([self.count, np.zeros(len(new_keys), dtype=np.int64)])
+            self._index = pd.Index(self.keys)
+            positions = self._index.get_indexer(keys)
+        return positions
+
+    def _day_vector(self, day: pd.DataFrame) -> np.ndarray:
+        """Converte os totais de um dia em um vetor alinhado ao estado."""
+        positions = self._positions(day['key'].to_numpy())
+        values = np.zeros(len(self.keys))
+        np.add.at(values, positions, day['value'].to_numpy(dtype=float))
+        return values
+
+    def _advance(self, values: np.ndarray) -> None:
+        """Atualiza média e variância exponenciais de todos os segmentos."""
+        first = self.count == 0
+        diff = values - self.mean
+        increment = self.alpha * diff
+        self.mean = np.where(first, values, self.mean + increment)
+        self.var = np.where(first, 0.0, (1 - self.alpha) * (self.var + diff * increment))
+        self.fast_mean = np.where(first, values, self.fast_mean + self.trend_alpha * (values - self.fast_mean))
+        self.count += 1
+
+    def baseline(self, keys: np.ndarray) -> Dict[str, np.ndarray]:
+        """Retorna média, desvio-padrão e contagem atuais para as chaves informadas."""
+        positions = self._index.get_indexer(keys)
+        known = positions >= 0
+        mean = np.zeros(len(keys))
+        std = np.zeros(len(keys))
+        count = np.zeros(len(keys), dtype=np.int64)
+        mean[known] = self.mean[positions[known]]
+        std[known] = np.sqrt(self.var[positions[known]])
+        count[known] = self.count[positions[known]]
+        return {'mean': mean, 'std': std, 'count': count}
+
+    def trends(self) -> List[Dict[str, Any]]:
+        """Sinaliza segmentos cuja média rápida se afastou da média lenta além do limiar."""
+        ready = self.count >= self.min_periods
+        change = (self.fast_mean - self.mean) / np.maximum(np.abs(self.mean), 1e-9)
+        flagged = np.flatnonzero(ready & (np.abs(change) > self.threshold))
+        if len(flagged) > self.max_alerts:
+            flagged = flagged[np.argpartition(-np.abs(change[flagged]), self.max_alerts - 1)[:self.max_alerts]]
+        flagged = flagged[np.argsort(-np.abs(change[flagged]))]
+
+        trends = []
+        for i in flagged:
+            segment, _, value = str(self.keys[i]).partition('=')
+            trends.append({
+                'segmento': segment,
+                'valor': value or segment,
+                'variacao': round(float(change[i]), 4),
+                'tipo': 'alta' if change[i] > 0 else 'queda'
+            })
+        return trends
+
+    def fit(self, totals: pd.DataFrame) -> None:
+        """Inicializa o estado a partir do histórico de totais diários."""
+        self._reset()
+        if totals.empty:
+            return
+        totals = totals.sort_values('date', kind='stable')
+        positions = self._positions(totals['key'].to_numpy())
+        values = totals['value'].to_numpy(dtype=float)
+        dates, starts = np.unique(totals['date'].to_numpy(), return_index=True)
+        bounds = np.append(starts, len(totals))
+        for i, date in enumerate(dates):
+            day = np.zeros(len(self.keys))
+            np.add.at(day, positions[bounds[i]:bounds[i + 1]], values[bounds[i]:bounds[i + 1]])
+            self._advance(day)
+            self.last_date = pd.Timestamp(date)
+
+    def update(self, day: pd.DataFrame, band: Optional[pd.DataFrame] = None) -> List[Dict[str, Any]]:
+        """Avalia um novo dia contra o estado atual e incorpora-o ao estado.
+
+        `band` é opcional e, quando informado, deve ser indexado pela chave do
+        segmento com as colunas 'yhat', 'yhat_lower' e 'yhat_upper'; nesses
+        segmentos a faixa de previsão substitui a linha de base móvel.
+        """
+        date = pd.Timestamp(day['date'].iloc[0])
+        if self.last_date is not None and date <= self.last_date:
+            return []
+
+        values = self._day_vector(day)
+        ready = self.count >= self.min_periods
+        expected = self.mean.copy()
+        std = np.sqrt(self.var)
+        outside = np.abs(values - expected) >= self.z_threshold * np.maximum(std, 1e-9)
+
+        if band is not None and not band.empty:
+            aligned = band.reindex(self.keys)
+            has_band = aligned['yhat'].notna().to_numpy()
+            expected = np.where(has_band, aligned['yhat'].to_numpy(dtype=float), expected)
+            band_outside = (values < aligned['yhat_lower'].to_numpy(dtype=float)) | \
+                (values > aligned['yhat_upper'].to_numpy(dtype=float))
+            outside = np.where(has_band, band_outside, outside)
+            ready = ready | has_band
+
+        deviation = (values - expected) / np.maximum(np.abs(expected), 1e-9)
+        flagged = np.flatnonzero(ready & outside & (np.abs(deviation) > self.threshold))
+
+        self._advance(values)
+        self.last_date = date
+        return self._format_alerts(flagged, values, expected, deviation, date)
+
+    def _format_alerts(
+        self,
+        flagged: np.ndarray,
+        values: np.ndarray,
+        expected: np.ndarray,
+        deviation: np.ndarray,
+        date: pd.Timestamp
+    ) -> List[Dict[str, Any]]:
+        """Seleciona as anomalias mais severas em formato compacto."""
+        if len(flagged) > self.max_alerts:
+            severity = np.abs(deviation[flagged])
+            flagged = flagged[np.argpartition(-severity, self.max_alerts - 1)[:self.max_alerts]]
+        flagged = flagged[np.argsort(-np.abs(deviation[flagged]))]
+
+        alerts = []
+        for i in flagged:
+            segment, _, value = str(self.keys[i]).partition('=')
+            alerts.append({
+                'data': date.strftime('%Y-%m-%d'),
+                'segmento': segment,
+                'valor': value or segment,
+                'observado': round(float(values[i]), 2),
+                'esperado': round(float(expected[i]), 2),
+                'desvio': round(float(deviation[i]), 4),
+                'tipo': 'alta' if deviation[i] > 0 else 'queda'
+            })
+        return alerts
+
+    def detect(self, df: pd.DataFrame, band: Optional[pd.DataFrame] = None) -> List[Dict[str, Any]]:
+        """Processa apenas os dias posteriores ao estado e retorna as anomalias do dia mais recente.
+
+        Sem dias novos (ex.: nova execução no mesmo dia), retorna as anomalias
+        já calculadas para o último dia do estado.
+        """
+        try:
+            dates = pd.to_datetime(df['date']).dt.normalize()
+            if self.last_date is None:
+                # Sem estado: aprende com o histórico anterior ao último dia
+                latest = dates.max()
+                self.fit(segment_totals(df[dates < latest], self.segments, self.metric))
+            else:
+                df = df[dates > self.last_date]
+
+            totals = segment_totals(df, self.segments, self.metric)
+            if totals.empty:
+                return list(self.last_alerts)
+            alerts = []
+            for _, day in totals.groupby('date', sort=True):
+                alerts = self.update(day, band)
+            self.last_alerts = alerts
+
+            if self.state_path:
+                self.save(self.state_path)
+            return alerts
+        except Exception as e:
+            self.logger.error(f"Erro ao detectar anomalias: {str(e)}")
+            raise
+
+    def save(self, path: Path) -> None:
+        """Persiste o estado móvel em um arquivo .npz."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                keys=self.keys.astype(str),
+                mean=self.mean,
+                var=self.var,
+                fast_mean=self.fast_mean,
+                count=self.count,
+                last_date=np.array(str(self.last_date) if self.last_date is not None else ''),
+                last_alerts=np.array(json.dumps(self.last_alerts, ensure_ascii=False))
+            )
+        tmp_path.replace(path)
+
+    def load(self, path: Path) -> None:
+        """Carrega o estado móvel salvo por `save`."""
+        with np.load(path) as state:
+            self.keys = state['keys'].astype(object)
+            self.mean = state['mean']
+            self.var = state['var']
+            self.fast_mean = state['fast_mean'] if 'fast_mean' in state else state['mean'].copy()
+            self.count = state['count']
+            last_date = str(state['last_date'])
+            self.last_alerts = json.loads(str(state['last_alerts'])) if 'last_alerts' in state else []
+        self.last_date = pd.Timestamp(last_date) if last_date else None
+        self._index = pd.Index(self.keys)
@@ -0,0 +1,208 @@
+from typing import Dict, Any, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import hashlib
+import importlib.util
+import logging
+import multiprocessing
+import numpy as np
+import pandas as pd
+
+from models.fast_forecast import FAST_FORECASTERS, fast_forecast
+from models.sales_forecast import HEAVY_METHODS, SalesForecastModel
+from utils.instrumentation import span
+
+logger = logging.getLogger(__name__)
+
+# Módulo que cada método pesado exige nos processos do pool
+HEAVY_MODULES = {'prophet': 'prophet', 'xgb': 'xgboost'}
+
+def rolling_origins(n_days: int, horizon: int, folds: int, step: int, min_train: int) -> List[int]:
+    """Tamanhos de treino de cada origem, da mais antiga para a mais recente.
+
+    A origem mais recente deixa exatamente `horizon` dias para o teste; as
+    anteriores recuam `step` dias cada uma, desde que sobrem `min_train` dias.
+    """
+    cutoffs = [n_days - horizon - k * step for k in range(folds)]
+    return sorted(c for c in cutoffs if c >= min_train)
+
+def _fold_key(method: str, horizon: int, start: pd.Timestamp, values: np.ndarray) -> str:
+    digest = hashlib.sha1(f"{method}|{horizon}|{start.date()}|{values.shape}".encode('utf-8'))
+    digest.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+def _heavy_fold(method: str, dates: pd.DatetimeIndex, values: np.ndarray, horizon: int) -> np.ndarray:
+    """Ajusta um modelo pesado em uma série e janela (executado nos processos do pool)."""
+    persona_config = {"previsao_vendas": {"metodo": method, "horizonte": horizon,
+                                          "nivel_detalhe": "alto", "metricas": []}}
+    model = SalesForecastModel(persona_config)
+    forecast = model._generate_heavy_forecast(pd.Series(values, index=dates), persona_config)
+    return forecast['yhat'].to_numpy(dtype=np.float64)
+
+class Backtester:
+    """Avalia métodos de previsão em origens móveis e escolhe o melhor por segmento.
+
+    Para cada origem, os modelos são ajustados com os dados até ela e
+    comparados com os `horizonte` dias seguintes (WAPE). Os métodos rápidos
+    prevêem todas as séries de uma janela em uma chamada; Prophet e XGBoost
+    rodam uma tarefa por série e janela em um pool de processos, apenas nas
+    `max_series_pesadas` séries de maior volume. Cada previsão fica em cache
+    em disco, identificada pelo hash dos dados de treino, de modo que uma
+    nova execução só ajusta as janelas que mudaram.
+
+    Um método pesado só é escolhido quando reduz o erro do melhor método
+    rápido em pelo menos `ganho_minimo` (relativo).
+    """
+
+    def __init__(self, config: Dict[str, Any], cache_dir: Optional[Path] = Path("data") / "state" / "backtests",
+                 max_workers: Optional[int] = None):
+        backtest = config.get('backtest', {})
+        self.horizon = config.get('horizonte', 30)
+        default_methods = ['media_sazonal', 'holt_winters', config.get('metodo', 'prophet')]
+        self.methods = list(dict.fromkeys(backtest.get('metodos', default_methods)))
+        unknown = [m for m in self.methods if m not in FAST_FORECASTERS and m not in HEAVY_METHODS]
+        if unknown:
+            raise ValueError(f"Métodos de previsão inválidos: {', '.join(unknown)}")
+        self.folds = backtest.get('janelas', 3)
+        self.step = backtest.get('passo', self.horizon)
+        self.min_train = backtest.get('treino_minimo', 56)
+        self.max_heavy = backtest.get('max_series_pesadas', 10)
+        self.min_gain = backtest.get('ganho_minimo', 0.05)
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_workers = max_workers
+
+    def _cached(self, key: str) -> Optional[np.ndarray]:
+        if self.cache_dir is None:
+            return None
+        path = self.cache_dir / f"{key}.npy"
+        try:
+            return np.load(path)
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, key: str, forecast: np.ndarray) -> None:
+        if self.cache_dir is None:
+            return
+        path = self.cache_dir / f"{key}.npy"
+        tmp_path = path.with_name(key + ".tmp.npy")
+        try:
+            np.save(tmp_path, forecast)
+            tmp_path.replace(path)
+        except OSError as e:
+            logger.error(f"Erro ao gravar janela do backtest: {str(e)}")
+
+    def _fast_forecasts(self, method: str, calendar: pd.DatetimeIndex, matrix: np.ndarray,
+                        cutoffs: List[int]) -> Dict[int, np.ndarray]:
+        forecasts = {}
+        for cutoff in cutoffs:
+            train = matrix[:, :cutoff]
+            key = _fold_key(method, self.horizon, calendar[0], train)
+            forecast = self._cached(key)
+            if forecast is None or forecast.shape != (len(matrix), self.horizon):
+                forecast, _ = fast_forecast(train, self.horizon, method)
+                self._store(key, forecast)
+            forecasts[cutoff] = forecast
+        return forecasts
+
+    def _heavy_forecasts(self, calendar: pd.DatetimeIndex, matrix: np.ndarray, rows: np.ndarray,
+                         cutoffs: List[int]) -> Dict[Tuple[str, int, int], np.ndarray]:
+        """Previsões dos métodos pesados por (método, linha, origem), do cache ou do pool."""
+        forecasts, pending = {}, {}
+        for method in (m for m in self.methods if m in HEAVY_METHODS):
+            if importlib.util.find_spec(HEAVY_MODULES[method]) is None:
+                logger.warning(f"Backtest sem {method}: módulo {HEAVY_MODULES[method]} não instalado")
+                continue
+            for row in rows:
+                for cutoff in cutoffs:
+                    train = matrix[row, :cutoff]
+                    key = _fold_key(method, self.horizon, calendar[0], train)
+                    cached = self._cached(key)
+                    if cached is not None and len(cached) == self.horizon:
+                        forecasts[(method, row, cutoff)] = cached
+                    else:
+                        pending[(method, row, cutoff)] = (key, train)
+        if not pending:
+            return forecasts
+
+        workers = min(self.max_workers or multiprocessing.cpu_count(), len(pending))
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = {
+                task: executor.submit(_heavy_fold, task[0], calendar[:task[2]], train, self.horizon)
+                for task, (key, train) in pending.items()
+            }
+            for task, future in futures.items():
+                try:
+                    forecasts[task] = future.result()
+                except Exception as e:
+                    logger.warning(f"Backtest de {task[0]} falhou na série {task[1]}: {str(e)}")
+                    continue
+                self._store(pending[task][0], forecasts[task])
+        return forecasts
+
+    def evaluate(self, series: pd.DataFrame) -> pd.DataFrame:
+        """Erros por segmento, método e origem.
+
+        `series` está no formato longo de `segment_totals` (date, key, value).
+        Retorna as colunas key, metodo, origem, erro_absoluto e realizado.
+        """
+        matrix_df = series.pivot_table(index='key', columns='date', values='value', aggfunc='sum', fill_value=0)
+        calendar = pd.date_range(matrix_df.columns.min(), matrix_df.columns.max(), freq='D')
+        matrix = matrix_df.reindex(columns=calendar, fill_value=0).to_numpy(dtype=np.float64)
+        keys = np.asarray(matrix_df.index)
+        cutoffs = rolling_origins(len(calendar), self.horizon, self.folds, self.step, self.min_train)
+        if not cutoffs:
+            raise ValueError(f"Histórico de {len(calendar)} dias insuficiente para o backtest")
+
+        frames = []
+        def add(method: str, rows: np.ndarray, cutoff: int, forecast: np.ndarray) -> None:
+            actual = matrix[rows, cutoff:cutoff + self.horizon]
+            frames.append(pd.DataFrame({
+                'key': keys[rows],
+                'metodo': method,
+                'origem': calendar[cutoff],
+                'erro_absoluto': np.abs(actual - forecast).sum(axis=1),
+                'realizado': np.abs(actual).sum(axis=1)
+            }))
+
+        all_rows = np.arange(len(matrix))
+        for method in (m for m in self.methods if m in FAST_FORECASTERS):
+            with span("backtest", method=method, series=len(matrix), folds=len(cutoffs)):
+                for cutoff, forecast in self._fast_forecasts(method, calendar, matrix, cutoffs).items():
+                    add(method, all_rows, cutoff, forecast)
+
+        heavy_rows = np.argsort(-matrix.sum(axis=1), kind='stable')[:self.max_heavy]
+        if any(m in HEAVY_METHODS for m in self.methods) and len(heavy_rows):
+            with span("backtest", method="pesados", series=len(heavy_rows), folds=len(cutoffs)):
+                for (method, row, cutoff), forecast in self._heavy_forecasts(calendar, matrix, heavy_rows, cutoffs).items():
+                    add(method, np.array([row]), cutoff, forecast[None, :])
+        return pd.concat(frames, ignore_index=True)
+
+    def select(self, errors: pd.DataFrame) -> Dict[str, Any]:
+        """Escolhe o método de menor WAPE por segmento, preferindo os rápidos."""
+        totals = errors.groupby(['key', 'metodo'])[['erro_absoluto', 'realizado']].sum()
+        wape = (totals['erro_absoluto'] / totals['realizado'].clip(lower=1e-9)).unstack('metodo')
+        fast = [m for m in wape.columns if m in FAST_FORECASTERS]
+        heavy = [m for m in wape.columns if m in HEAVY_METHODS]
+
+        best = wape[fast].idxmin(axis=1) if fast else pd.Series(index=wape.index, dtype=object)
+        best_error = wape[fast].min(axis=1) if fast else pd.Series(np.inf, index=wape.index)
+        for method in heavy:
+            # O modelo pesado precisa vencer o melhor rápido com folga
+            wins = wape[method] < best_error * (1 - self.min_gain)
+            best = best.where(~wins, method)
+            best_error = best_error.where(~wins, wape[method])
+
+        overall = errors.groupby('metodo')[['erro_absoluto', 'realizado']].sum()
+        return {
+            "metodos": best.to_dict(),
+            "erros": {key: {m: round(float(v), 4) for m, v in row.items() if pd.notna(v)}
+                      for key, row in wape.iterrows()},
+            "resumo": {m: round(float(r.erro_absoluto / max(r.realizado, 1e-9)), 4) for m, r in overall.iterrows()},
+            "escolhas": {m: int(c) for m, c in best.value_counts().items()}
+        }
+
+    def run(self, series: pd.DataFrame) -> Dict[str, Any]:
+        """Executa o backtest e retorna o melhor método de cada segmento."""
+        return self.select(self.evaluate(series))
@@ -0,0 +1,155 @@
+from typing import Tuple, Sequence, Callable, Dict
+import itertools
+import numpy as np
+
+# Previsores vetorizados sobre uma matriz de séries (uma série por linha,
+# um dia por coluna). Todas as séries são ajustadas de uma só vez com
+# operações NumPy, sem laço por série: os laços são apenas sobre os
+# parâmetros testados e o tempo, e cada passo atualiza todas as séries.
+# Os erros de um passo não são guardados: cada parâmetro acumula a soma
+# dos quadrados por série e só o melhor estado de cada série é mantido,
+# então a memória é O(séries × ciclo), independente da grade e do histórico.
+
+SMOOTHING_GRID = (0.05, 0.1, 0.2, 0.3, 0.5, 0.8)
+HOLT_WINTERS_GRID = tuple(itertools.product((0.1, 0.3, 0.6), (0.01, 0.1), (0.05, 0.3)))
+
+def _as_matrix(Y: np.ndarray) -> np.ndarray:
+    Y = np.asarray(Y, dtype=np.float64)
+    return Y[None, :] if Y.ndim == 1 else Y
+
+def _floor_variance(variance: np.ndarray) -> np.ndarray:
+    # Variância nula (séries constantes ou vazias) quebraria a ponderação
+    floor = max(float(np.mean(variance)) * 1e-6, 1e-9) if len(variance) else 1e-9
+    return np.maximum(variance, floor)
+
+def _keep_best(sse: np.ndarray, best_sse: np.ndarray, best: Sequence[np.ndarray],
+               state: Sequence[np.ndarray]) -> None:
+    """Guarda (no lugar) o estado das séries em que `sse` bateu o melhor erro até aqui.
+
+    Em empate fica o parâmetro anterior da grade, como no argmin.
+    """
+    better = sse < best_sse
+    best_sse[better] = sse[better]
+    for kept, current in zip(best, state):
+        kept[better] = current[better]
+
+def seasonal_average(Y: np.ndarray, horizon: int, season: int = 7, cycles: int = 4) -> Tuple[np.ndarray, np.ndarray]:
+    """Média sazonal: cada dia futuro recebe a média dos mesmos dias da semana
+    nos últimos `cycles` ciclos.
+
+    Retorna a previsão (n_series × horizon) e a variância dos resíduos de um
+    passo sazonal dentro da amostra (n_series), usada como peso na reconciliação.
+    """
+    Y = _as_matrix(Y)
+    n_series, length = Y.shape
+    if length == 0:
+        return np.zeros((n_series, horizon)), np.ones(n_series)
+    cycles = max(1, min(cycles, length // season)) if length >= season else 1
+    window = Y[:, -cycles * season:] if length >= season else Y
+
+    if length >= season:
+        # (n_series, cycles, season): média de cada posição do ciclo
+        profile = window.reshape(n_series, cycles, season).mean(axis=1)
+        steps = np.arange(horizon) % season
+        forecast = profile[:, steps]
+    else:
+        forecast = np.repeat(window.mean(axis=1, keepdims=True), horizon, axis=1)
+
+    if length > season:
+        residuals = Y[:, season:] - Y[:, :-season]
+        residuals = residuals[:, -max(cycles * season, season):]
+        variance = residuals.var(axis=1)
+    else:
+        variance = Y.var(axis=1)
+    return forecast, _floor_variance(variance)
+
+def seasonal_naive(Y: np.ndarray, horizon: int, season: int = 7) -> Tuple[np.ndarray, np.ndarray]:
+    """Repete o último ciclo observado."""
+    Y = _as_matrix(Y)
+    n_series, length = Y.shape
+    if length < season:
+        return seasonal_average(Y, horizon, season)
+    forecast = Y[:, -season:][:, np.arange(horizon) % season]
+    residuals = Y[:, season:] - Y[:, :-season]
+    variance = (residuals ** 2).mean(axis=1) if residuals.size else Y.var(axis=1)
+    return forecast, _floor_variance(variance)
+
+def exponential_smoothing(Y: np.ndarray, horizon: int,
+                          alphas: Sequence[float] = SMOOTHING_GRID) -> Tuple[np.ndarray, np.ndarray]:
+    """Suavização exponencial simples, com o alfa escolhido por série na grade `alphas`."""
+    Y = _as_matrix(Y)
+    n_series, length = Y.shape
+    if length == 0:
+        return np.zeros((n_series, horizon)), np.ones(n_series)
+    warmup = min(7, length - 1)
+    best_sse = np.full(n_series, np.inf)
+    final = np.zeros(n_series)
+    for alpha in alphas:
+        level = Y[:, 0].copy()
+        sse = np.zeros(n_series)
+        for t in range(1, length):
+            error = Y[:, t] - level
+            if t >= warmup:
+                sse += error ** 2
+            level += alpha * error
+        _keep_best(sse, best_sse, (final,), (level,))
+    variance = best_sse / (length - warmup)
+    return np.repeat(final[:, None], horizon, axis=1), _floor_variance(variance)
+
+def holt_winters(Y: np.ndarray, horizon: int, season: int = 7,
+                 grid: Sequence[Tuple[float, float, float]] = HOLT_WINTERS_GRID,
+                 damping: float = 0.98) -> Tuple[np.ndarray, np.ndarray]:
+    """Holt-Winters aditivo com tendência amortecida.
+
+    As combinações (alfa, beta, gama) da grade são ajustadas uma a uma sobre
+    todas as séries e cada série fica com a de menor erro de um passo dentro
+    da amostra.
+    Séries com menos de dois ciclos caem na suavização exponencial simples.
+    """
+    Y = _as_matrix(Y)
+    n_series, length = Y.shape
+    if length < 2 * season:
+        return exponential_smoothing(Y, horizon)
+    warmup = 2 * season
+    first, second = Y[:, :season].mean(axis=1), Y[:, season:warmup].mean(axis=1)
+    best_sse = np.full(n_series, np.inf)
+    best_level, best_trend = np.zeros(n_series), np.zeros(n_series)
+    best_seasonal = np.zeros((n_series, season))
+    for alpha, beta, gamma in grid:
+        level = first.copy()
+        trend = (second - first) / season
+        seasonal = Y[:, :season] - first[:, None]
+        sse = np.zeros(n_series)
+        for t in range(length):
+            position = t % season
+            s = seasonal[:, position].copy()
+            damped = damping * trend
+            if t >= warmup:
+                sse += (Y[:, t] - (level + damped + s)) ** 2
+            new_level = alpha * (Y[:, t] - s) + (1 - alpha) * (level + damped)
+            trend = beta * (new_level - level) + (1 - beta) * damped
+            seasonal[:, position] = gamma * (Y[:, t] - new_level) + (1 - gamma) * s
+            level = new_level
+        _keep_best(sse, best_sse, (best_level, best_trend, best_seasonal), (level, trend, seasonal))
+
+    variance = best_sse / max(length - warmup, 1)
+    steps = np.arange(1, horizon + 1)
+    # Soma amortecida da tendência: phi + phi² + ... + phi^h
+    damped_steps = np.cumsum(damping ** steps)
+    positions = (length + steps - 1) % season
+    forecast = best_level[:, None] + damped_steps[None, :] * best_trend[:, None] + best_seasonal[:, positions]
+    return forecast, _floor_variance(variance)
+
+FAST_FORECASTERS: Dict[str, Callable[..., Tuple[np.ndarray, np.ndarray]]] = {
+    'media_sazonal': seasonal_average,
+    'sazonal_ingenuo': seasonal_naive,
+    'suavizacao_exponencial': exponential_smoothing,
+    'holt_winters': holt_winters,
+}
+
+def fast_forecast(Y: np.ndarray, horizon: int, method: str = 'holt_winters') -> Tuple[np.ndarray, np.ndarray]:
+    """Previsão de todas as séries de `Y` com o método rápido informado."""
+    forecaster = FAST_FORECASTERS.get(method)
+    if forecaster is None:
+        raise ValueError(f"Método de previsão rápida inválido: {method}")
+    return forecaster(Y, horizon)
@@ -0,0 +1,219 @@
+from typing import Dict, Any, List, Optional
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.linalg import splu
+
+from models.anomaly_detection import SEGMENT_COLUMNS, metric_values
+from models.fast_forecast import fast_forecast
+from utils.instrumentation import span
+
+RECONCILIATION_METHODS = ('bottom_up', 'top_down', 'mint')
+
+@dataclass
+class Hierarchy:
+    """Séries da base da hierarquia e a matriz que as soma nos níveis superiores.
+
+    `bottom` tem uma linha por combinação distinta das colunas dos segmentos
+    (por exemplo categoria × produto) e uma coluna por dia. `summing` é a
+    matriz esparsa 0/1 que leva a base para cada série agregada de `keys`
+    ('geral', 'categoria=Eletrônicos', ...). `bottom_keys` identifica cada
+    série da base pelo segmento mais detalhado ('produto=7'), o mesmo nome
+    que a série tem no formato de `segment_totals`.
+    """
+    dates: pd.DatetimeIndex
+    bottom: np.ndarray
+    keys: List[str]
+    levels: List[str]
+    summing: sparse.csr_matrix
+    bottom_keys: List[str]
+
+    def aggregate(self, values: np.ndarray) -> np.ndarray:
+        """Soma valores da base (n_base × k) em todas as séries agregadas."""
+        return np.asarray(self.summing @ values)
+
+def build_hierarchy(df: pd.DataFrame, segments: List[str], metric: str = 'receita',
+                    history_days: Optional[int] = None, max_series: Optional[int] = None) -> Hierarchy:
+    """Agrega as vendas por dia na base da hierarquia em uma única passada.
+
+    Com `history_days`, só os últimos dias entram na matriz, o suficiente
+    para os previsores rápidos e bem menor que o histórico completo.
+    """
+    levels = [s for s in segments if s != 'geral' and SEGMENT_COLUMNS.get(s) in df.columns]
+    columns = [SEGMENT_COLUMNS[s] for s in levels]
+    dates = pd.to_datetime(df['date']).dt.normalize()
+    if history_days is not None:
+        recent = (dates > dates.max() - pd.Timedelta(days=history_days)).to_numpy()
+        df, dates = df[recent], dates[recent]
+    values = metric_values(df, metric).to_numpy()
+
+    start = dates.min()
+    day_index = ((dates - start).dt.days).to_numpy()
+    n_days = int(day_index.max()) + 1 if len(day_index) else 0
+    if columns:
+        bottom_codes = df[columns].groupby(columns, observed=True, sort=False, dropna=False).ngroup().to_numpy()
+    else:
+        bottom_codes = np.zeros(len(df), dtype=np.int64)
+    n_bottom = int(bottom_codes.max()) + 1 if len(bottom_codes) else 0
+    if max_series is not None and n_bottom > max_series:
+        raise ValueError(f"Hierarquia com {n_bottom} séries na base excede o limite de {max_series}; "
+                         f"reduza os segmentos ({', '.join(levels)})")
+    # Dias sem venda de uma combinação ficam com zero
+    bottom = np.bincount(bottom_codes * n_days + day_index, weights=values,
+                         minlength=n_bottom * n_days).reshape(n_bottom, n_days)
+
+    keys, key_levels, blocks = ['geral'], ['geral'], [sparse.csr_matrix(np.ones((1, n_bottom)))]
+    _, first_rows = np.unique(bottom_codes, return_index=True)
+    if levels:
+        bottom_keys = [f"{levels[-1]}={value}" for value in df[columns[-1]].to_numpy()[first_rows]]
+    else:
+        bottom_keys = ['geral'] * n_bottom
+    for segment, column in zip(levels, columns):
+        codes, uniques = pd.factorize(df[column].to_numpy()[first_rows])
+        blocks.append(sparse.csr_matrix(
+            (np.ones(n_bottom), (codes, np.arange(n_bottom))), shape=(len(uniques), n_bottom)
+        ))
+        keys.extend(f"{segment}={value}" for value in uniques)
+        key_levels.extend([segment] * len(uniques))
+
+    return Hierarchy(
+        dates=pd.date_range(start, periods=n_days, freq='D'),
+        bottom=bottom,
+        keys=keys,
+        levels=key_levels,
+        summing=sparse.vstack(blocks, format='csr'),
+        bottom_keys=bottom_keys
+    )
+
+class HierarchicalForecaster:
+    """Previsão coerente para todos os segmentos com poucos ajustes.
+
+    Só a base da hierarquia (e os níveis de `niveis_ajustados`) recebe um
+    modelo, o previsor rápido vetorizado de `fast_forecast` escolhido em
+    `modelo_rapido`. Com um `router` (`SalesForecastModel`), essas séries
+    são roteadas por volume por `forecast_matrix`: as maiores de cada nível
+    vão para Prophet/XGBoost e a cauda longa para `roteamento.metodo_rapido`,
+    ou cada uma usa o método de `methods` (o resultado do backtest). Os demais níveis
+    são obtidos por soma, de modo que a previsão de cada categoria é a soma
+    dos seus produtos e a geral é a soma de tudo. A reconciliação pode ser:
+
+    - bottom_up: soma direta das previsões da base;
+    - top_down: a previsão geral é distribuída pelas proporções históricas
+      dos últimos `janela_proporcoes` dias;
+    - mint: combina base e níveis ajustados por mínimos quadrados ponderados
+      pelas variâncias dos resíduos (MinT com matriz diagonal), resolvendo um
+      sistema esparso do tamanho dos níveis ajustados.
+    """
+
+    def __init__(self, config: Dict[str, Any], router=None, methods: Optional[Dict[str, str]] = None):
+        hierarquia = config.get('hierarquia', {})
+        self.config = config
+        self.router = router
+        self.methods = methods
+        self.horizon = config.get('horizonte', 30)
+        self.segments = config.get('segmentos', ['geral'])
+        self.method = hierarquia.get('reconciliacao', 'mint')
+        if self.method not in RECONCILIATION_METHODS:
+            raise ValueError(f"Método de reconciliação não suportado: {self.method}")
+        self.fitted_levels = hierarquia.get('niveis_ajustados', ['geral', 'categoria'])
+        self.window = hierarquia.get('janela_proporcoes', 28)
+        self.max_segments = hierarquia.get('limite_segmentos', 20)
+        self.metric = hierarquia.get('metrica', 'receita')
+        self.history_days = hierarquia.get('janela_historico', 91)
+        self.max_bottom = hierarquia.get('limite_series_base', 100000)
+        self.fast_method = hierarquia.get('modelo_rapido', 'media_sazonal')
+
+    def _fitted_rows(self, hierarchy: Hierarchy) -> np.ndarray:
+        if self.method == 'bottom_up':
+            return np.array([], dtype=np.int64)
+        if self.method == 'top_down':
+            return np.array([0])
+        return np.flatnonzero(np.isin(hierarchy.levels, self.fitted_levels))
+
+    def reconcile(self, hierarchy: Hierarchy, base_bottom: np.ndarray, var_bottom: np.ndarray,
+                  rows: np.ndarray, base_rows: Optional[np.ndarray], var_rows: Optional[np.ndarray]) -> np.ndarray:
+        """Retorna a previsão reconciliada da base (n_base × horizonte)."""
+        if len(rows) == 0:
+            return base_bottom
+        if self.method == 'top_down':
+            recent = hierarchy.bottom[:, -self.window:].sum(axis=1)
+            total = recent.sum()
+            shares = recent / total if total > 0 else np.full(len(recent), 1 / len(recent))
+            return shares[:, None] * base_rows[0][None, :]
+
+        # ỹ_b = ŷ_b + W_b S_fᵀ (W_f + S_f W_b S_fᵀ)⁻¹ (ŷ_f − S_f ŷ_b)
+        S_f = hierarchy.summing[rows]
+        system = sparse.diags(var_rows) + S_f @ sparse.diags(var_bottom) @ S_f.T
+        gap = base_rows - np.asarray(S_f @ base_bottom)
+        correction = splu(sparse.csc_matrix(system)).solve(gap)
+        return base_bottom + var_bottom[:, None] * np.asarray(S_f.T @ correction)
+
+    def forecast(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """Previsões diárias por segmento ('nivel=valor') no horizonte configurado."""
+        with span("hierarchy", rows=len(df)):
+            hierarchy = build_hierarchy(df, self.segments, self.metric, self.history_days, self.max_bottom)
+        rows = self._fitted_rows(hierarchy)
+
+        models: Dict[str, int] = {}
+        with span("fit", model="hierarchical", series=len(hierarchy.bottom) + len(rows)):
+            history = np.asarray(hierarchy.summing[rows] @ hierarchy.bottom) if len(rows) else None
+            if self.router is not None:
+                n_bottom = len(hierarchy.bottom)
+                series = hierarchy.bottom if history is None else np.vstack([hierarchy.bottom, history])
+                keys = hierarchy.bottom_keys + [hierarchy.keys[row] for row in rows]
+                levels = ['base'] * n_bottom + [hierarchy.levels[row] for row in rows]
+                # Níveis ajustados primeiro: a prioridade das séries pesadas segue a ordem dos níveis
+                order = np.r_[np.arange(n_bottom, len(keys)), np.arange(n_bottom)]
+                forecast, variance, chosen = self.router.forecast_matrix(
+                    hierarchy.dates, series[order], [keys[i] for i in order],
+                    {'previsao_vendas': dict(self.config, horizonte=self.horizon)},
+                    self.methods, [levels[i] for i in order]
+                )
+                restore = np.argsort(order)
+                forecast, variance = forecast[restore], variance[restore]
+                for method in chosen:
+                    models[method] = models.get(method, 0) + 1
+                base_bottom, var_bottom = forecast[:n_bottom], variance[:n_bottom]
+                base_rows, var_rows = (forecast[n_bottom:], variance[n_bottom:]) if len(rows) else (None, None)
+            else:
+                base_bottom, var_bottom = fast_forecast(hierarchy.bottom, self.horizon, self.fast_method)
+                base_rows = var_rows = None
+                if len(rows):
+                    base_rows, var_rows = fast_forecast(history, self.horizon, self.fast_method)
+                models[self.fast_method] = len(hierarchy.bottom) + len(rows)
+
+        with span("reconcile", method=self.method):
+            # Vendas negativas não existem; o corte é feito na base para manter a coerência
+            bottom = np.maximum(self.reconcile(hierarchy, base_bottom, var_bottom, rows, base_rows, var_rows), 0)
+            forecast = hierarchy.aggregate(bottom)
+            # Intervalo aproximado supondo erros independentes entre as séries da base
+            spread = 1.96 * np.sqrt(hierarchy.aggregate(var_bottom))
+
+        future = pd.date_range(hierarchy.dates[-1] + pd.Timedelta(days=1), periods=self.horizon, freq='D')
+        recent = hierarchy.aggregate(hierarchy.bottom[:, -self.window:].sum(axis=1))
+        segments = {}
+        for level in dict.fromkeys(hierarchy.levels):
+            if level not in self.segments:
+                continue
+            level_rows = np.flatnonzero(np.asarray(hierarchy.levels) == level)
+            # Mantém no relatório apenas os maiores segmentos de cada nível
+            level_rows = level_rows[np.argsort(-recent[level_rows], kind='stable')[:self.max_segments]]
+            for row in level_rows:
+                segments[hierarchy.keys[row]] = [
+                    {
+                        "ds": date,
+                        "yhat": float(value),
+                        "yhat_lower": float(max(value - spread[row], 0)),
+                        "yhat_upper": float(value + spread[row])
+                    }
+                    for date, value in zip(future, forecast[row])
+                ]
+        return {
+            "reconciliacao": self.method,
+            "series_base": len(hierarchy.bottom),
+            "series_ajustadas": len(hierarchy.bottom) + len(rows),
+            "series_reconciliadas": len(hierarchy.keys),
+            "modelos": models,
+            "previsoes": segments
+        }
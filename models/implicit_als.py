@@ -0,0 +1,224 @@
+from typing import Dict, Any, Optional, Tuple
+import time
+
+import pandas as pd
+import numpy as np
+
+DEFAULT_SETTINGS = {
+    "fatores": 32,
+    "regularizacao": 0.05,
+    "alpha": 10.0,
+    "iteracoes": 10,
+    "passos_cg": 3,
+    "meia_vida_dias": 30
+}
+
+def interaction_weights(df: pd.DataFrame, half_life_days: Optional[float] = 30,
+                        reference_date: Optional[pd.Timestamp] = None) -> pd.Series:
+    """Peso implícito de cada par (user_id, product_id): quantidade comprada com decaimento por recência.
+
+    Cada venda conta `quantity * 2 ** (-idade / meia_vida)`, com a idade em
+    dias até `reference_date` (por padrão, a última data dos dados). Sem
+    coluna `quantity`, cada venda vale 1; sem `half_life_days` ou sem
+    coluna `date`, não há decaimento.
+    """
+    if 'quantity' in df.columns:
+        weight = df['quantity'].to_numpy(dtype=np.float64).clip(min=0)
+    else:
+        weight = np.ones(len(df))
+    if half_life_days and 'date' in df.columns and len(df):
+        reference_date = reference_date if reference_date is not None else df['date'].max()
+        age_days = (reference_date - df['date']).dt.total_seconds().to_numpy() / 86400.0
+        weight = weight * np.exp2(-np.clip(age_days, 0, None) / half_life_days)
+    weights = pd.Series(weight, index=pd.MultiIndex.from_arrays([df['user_id'], df['product_id']]))
+    weights = weights.groupby(level=[0, 1], observed=True).sum()
+    return weights[weights > 0]
+
+def _row_dots(A: np.ndarray, B: np.ndarray, rows: np.ndarray, cols: np.ndarray,
+              chunk: int = 1 << 18) -> np.ndarray:
+    """Produto interno A[rows[k]] · B[cols[k]] de cada interação, em blocos para limitar a memória."""
+    out = np.empty(len(rows), dtype=A.dtype)
+    for start in range(0, len(rows), chunk):
+        stop = start + chunk
+        out[start:stop] = np.einsum('ij,ij->i', A[rows[start:stop]], B[cols[start:stop]])
+    return out
+
+class ImplicitALS:
+    """Fatoração de matrizes para feedback implícito (ALS de Hu, Koren e Volinsky).
+
+    Cada par usuário-produto com peso w > 0 vira preferência 1 com confiança
+    c = 1 + alpha * log(1 + w); os pares sem compra têm preferência 0 e
+    confiança 1. Cada meia-iteração resolve os fatores de um lado com os do
+    outro fixos, por gradiente conjugado vetorizado sobre todas as linhas
+    (`passos_cg` passos a partir da solução anterior): com o termo YᵀY
+    pré-calculado, o custo é O(interações · fatores + linhas · fatores²),
+    linear no número de interações, e a matriz densa nunca é montada.
+
+    Usuários que não estavam no treino são incluídos por fold-in
+    (`fold_in`): os fatores dos produtos ficam fixos e apenas o sistema
+    fatores × fatores do novo usuário é resolvido, sem retreinar.
+    """
+
+    def __init__(self, factors: int = 32, regularization: float = 0.05, alpha: float = 10.0,
+                 iterations: int = 10, cg_steps: int = 3, seed: int = 0):
+        self.factors = factors
+        self.regularization = regularization
+        self.alpha = alpha
+        self.iterations = iterations
+        self.cg_steps = cg_steps
+        self.seed = seed
+        self.users: Optional[pd.Index] = None
+        self.products: Optional[pd.Index] = None
+        self.user_factors: Optional[np.ndarray] = None
+        self.item_factors: Optional[np.ndarray] = None
+        self.seen = None
+        self.trained_at: Optional[float] = None
+        self._gram: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_settings(cls, settings: Optional[Dict[str, Any]] = None) -> "ImplicitALS":
+        """Cria o modelo a partir da seção 'als' de `recomendacao_produtos`."""
+        settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+        return cls(
+            factors=int(settings["fatores"]),
+            regularization=float(settings["regularizacao"]),
+            alpha=float(settings["alpha"]),
+            iterations=int(settings["iteracoes"]),
+            cg_steps=int(settings["passos_cg"])
+        )
+
+    def confidence(self, weights: np.ndarray) -> np.ndarray:
+        """Confiança adicional (c - 1) de cada interação."""
+        return (self.alpha * np.log1p(weights)).astype(np.float32)
+
+    def fit(self, weights: pd.Series) -> "ImplicitALS":
+        """Treina com os pesos por par (user_id, product_id) de `interaction_weights`."""
+        from scipy import sparse
+
+        user_codes, users = pd.factorize(weights.index.get_level_values(0), sort=True)
+        product_codes, products = pd.factorize(weights.index.get_level_values(1), sort=True)
+        shape = (len(users), len(products))
+        Cui = sparse.csr_matrix((self.confidence(weights.to_numpy()), (user_codes, product_codes)), shape=shape)
+        Ciu = Cui.T.tocsr()
+
+        rng = np.random.default_rng(self.seed)
+        X = (rng.standard_normal((shape[0], self.factors)) * 0.01).astype(np.float32)
+        Y = (rng.standard_normal((shape[1], self.factors)) * 0.01).astype(np.float32)
+        for _ in range(self.iterations):
+            self._conjugate_gradient(Cui, X, Y)
+            self._conjugate_gradient(Ciu, Y, X)
+
+        self.users, self.products = pd.Index(users), pd.Index(products)
+        self.user_factors, self.item_factors = X, Y
+        # Padrão de compras, para não recomendar o que o usuário já comprou
+        self.seen = Cui
+        self.seen.sort_indices()
+        self._gram = None
+        self.trained_at = time.time()
+        return self
+
+    def _conjugate_gradient(self, C, X: np.ndarray, Y: np.ndarray) -> None:
+        """Atualiza X (no lugar) resolvendo (YᵀY + Yᵀ(Cᵤ - I)Y + λI) xᵤ = YᵀCᵤpᵤ para todas as linhas."""
+        from scipy import sparse
+
+        rows = np.repeat(np.arange(C.shape[0]), np.diff(C.indptr))
+        cols = C.indices
+        gram = Y.T @ Y + self.regularization * np.eye(self.factors, dtype=np.float32)
+
+        def apply(V: np.ndarray) -> np.ndarray:
+            # (YᵀY + λI)v + Σᵢ (cᵤᵢ - 1)(v · yᵢ) yᵢ, só sobre as interações existentes
+            dots = _row_dots(V, Y, rows, cols) * C.data
+            return V @ gram + sparse.csr_matrix((dots, cols, C.indptr), shape=C.shape) @ Y
+
+        # Lado direito: Σᵢ cᵤᵢ yᵢ sobre os produtos comprados (pᵤᵢ = 1)
+        b = sparse.csr_matrix((C.data + 1.0, cols, C.indptr), shape=C.shape) @ Y
+        r = b - apply(X)
+        p = r.copy()
+        rs = np.einsum('ij,ij->i', r, r)
+        for _ in range(self.cg_steps):
+            Ap = apply(p)
+            denom = np.einsum('ij,ij->i', p, Ap)
+            step = np.divide(rs, denom, out=np.zeros_like(rs), where=denom > 1e-20)
+            X += step[:, None] * p
+            r -= step[:, None] * Ap
+            rs_new = np.einsum('ij,ij->i', r, r)
+            beta = np.divide(rs_new, rs, out=np.zeros_like(rs), where=rs > 1e-20)
+            p = r + beta[:, None] * p
+            rs = rs_new
+
+    def fold_in(self, product_weights: pd.Series) -> np.ndarray:
+        """Fatores de um usuário novo a partir dos seus pesos por produto, sem alterar o modelo.
+
+        Produtos fora do treino são ignorados; sem nenhum produto conhecido,
+        retorna o vetor nulo (sem recomendações personalizadas).
+        """
+        codes = self.products.get_indexer(product_weights.index)
+        known = codes >= 0
+        codes, confidence = codes[known], self.confidence(product_weights.to_numpy()[known])
+        if len(codes) == 0:
+            return np.zeros(self.factors, dtype=np.float32)
+        if self._gram is None:
+            self._gram = self.item_factors.T @ self.item_factors + self.regularization * np.eye(self.factors, dtype=np.float32)
+        Yu = self.item_factors[codes]
+        A = self._gram + (Yu.T * confidence) @ Yu
+        b = Yu.T @ (confidence + 1.0)
+        return np.linalg.solve(A, b).astype(np.float32)
+
+    def recommend(self, user_id: Any, top_n: int,
+                  product_weights: Optional[pd.Series] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-N de um usuário como (índices em `products`, notas), sem os produtos já comprados.
+
+        Usuários do treino usam os fatores aprendidos; os demais são
+        incluídos por fold-in a partir de `product_weights` (pesos por
+        produto das compras do usuário).
+        """
+        row = self.users.get_indexer([user_id])[0]
+        seen = self.seen.indices[self.seen.indptr[row]:self.seen.indptr[row + 1]] if row >= 0 else np.empty(0, dtype=np.int64)
+        if product_weights is not None and len(product_weights):
+            # Compras posteriores ao treino também ficam fora das recomendações
+            recent = self.products.get_indexer(product_weights.index)
+            seen = np.concatenate([seen, recent[recent >= 0]])
+        if row >= 0:
+            vector = self.user_factors[row]
+        elif product_weights is not None and len(product_weights):
+            vector = self.fold_in(product_weights)
+        else:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if not vector.any():
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = self.item_factors @ vector
+        scores[seen] = -np.inf
+        n = min(top_n, len(scores))
+        best = np.argpartition(-scores, n - 1)[:n]
+        best = best[np.argsort(-scores[best])]
+        best = best[np.isfinite(scores[best])]
+        return best, scores[best]
+
+    def recommend_all(self, top_n: int, block_size: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-N de todos os usuários do treino, no formato da tabela de consulta.
+
+        Retorna (indices, notas) com uma linha por usuário: índices em
+        `products` (-1 sem recomendação) e notas float32 (NaN). As notas são
+        calculadas em blocos de `block_size` usuários (por padrão, ~64 MB).
+        """
+        n_users, n_products = len(self.users), len(self.products)
+        block_size = block_size or max(16, 16_000_000 // max(n_products, 1))
+        indices = np.full((n_users, top_n), -1, dtype=np.int32)
+        scores = np.full((n_users, top_n), np.nan, dtype=np.float32)
+        n = min(top_n, n_products)
+        if n == 0:
+            return indices, scores
+        for start in range(0, n_users, block_size):
+            stop = min(start + block_size, n_users)
+            predicted = self.user_factors[start:stop] @ self.item_factors.T
+            block_seen = self.seen[start:stop].tocoo()
+            predicted[block_seen.row, block_seen.col] = -np.inf
+            best = np.argpartition(-predicted, n - 1, axis=1)[:, :n]
+            best_scores = np.take_along_axis(predicted, best, axis=1)
+            order = np.argsort(-best_scores, axis=1)
+            best = np.take_along_axis(best, order, axis=1)
+            best_scores = np.take_along_axis(best_scores, order, axis=1)
+            valid = np.isfinite(best_scores)
+            indices[start:stop, :n] = np.where(valid, best, -1)
+            scores[start:stop, :n] = np.where(valid, best_scores, np.nan)
+        return indices, scores
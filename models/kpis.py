@@ -0,0 +1,52 @@
+from typing import Dict, Any
+import pandas as pd
+import numpy as np
+
+from models.anomaly_detection import metric_values
+
+def summarize_sales(df: pd.DataFrame, top: int = 10, window: int = 30) -> Dict[str, Any]:
+    """Resume a tabela de vendas nos KPIs exibidos nos relatórios e no bot.
+
+    Todos os valores retornados são tipos nativos do Python (serializáveis em JSON).
+    """
+    if df.empty:
+        return {}
+    dates = pd.to_datetime(df['date']).dt.normalize()
+    revenue = metric_values(df, 'receita')
+    volume = metric_values(df, 'volume')
+    last_day = dates.max()
+
+    daily = revenue.groupby(dates).sum()
+    last_7 = daily[daily.index > last_day - pd.Timedelta(days=7)].sum()
+    previous_7 = daily[(daily.index <= last_day - pd.Timedelta(days=7)) &
+                       (daily.index > last_day - pd.Timedelta(days=14))].sum()
+
+    recent = (dates > last_day - pd.Timedelta(days=window)).to_numpy()
+    kpis: Dict[str, Any] = {
+        'ultima_data': last_day.strftime('%Y-%m-%d'),
+        'receita_total': round(float(revenue.sum()), 2),
+        'volume_total': int(volume.sum()),
+        'receita_ultimo_dia': round(float(daily.iloc[-1]), 2),
+        'receita_7d': round(float(last_7), 2),
+        'variacao_7d': round(float(last_7 / previous_7 - 1), 4) if previous_7 > 0 else None,
+        f'receita_{window}d': round(float(revenue[recent].sum()), 2)
+    }
+
+    if 'product_id' in df.columns:
+        by_product = pd.DataFrame({
+            'receita': revenue[recent].to_numpy(),
+            'volume': volume[recent].to_numpy()
+        }).groupby(df['product_id'].to_numpy()[recent]).sum()
+        best = by_product.nlargest(top, 'receita')
+        kpis['top_produtos'] = [
+            {'product_id': _native(pid), 'receita': round(float(row.receita), 2), 'volume': int(row.volume)}
+            for pid, row in zip(best.index, best.itertuples())
+        ]
+    for level, column in (('categoria', 'category'), ('regiao', 'region')):
+        if column in df.columns:
+            totals = revenue[recent].groupby(df[column][recent], observed=True).sum().sort_values(ascending=False)
+            kpis[f'receita_por_{level}'] = {str(k): round(float(v), 2) for k, v in totals.items()}
+    return kpis
+
+def _native(value: Any) -> Any:
+    return value.item() if isinstance(value, np.generic) else value
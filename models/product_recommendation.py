@@ -1,10 +1,15 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import pandas as pd
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from mlxtend.frequent_patterns import apriori, association_rules
-from mlxtend.preprocessing import TransactionEncoder
+import hashlib
+import json
 import logging
+import threading
+import time
+
+from models.implicit_als import ImplicitALS, interaction_weights, DEFAULT_SETTINGS as ALS_DEFAULTS
+
+# sklearn e mlxtend são importados apenas pelo método de recomendação que os usa
 
 class ProductRecommendationModel:
     def __init__(self, config: Dict):
@@ -14,31 +19,41 @@ class ProductRecommendationModel:
         self.item_similarity_matrix = None
         self.frequent_itemsets = None
         self.association_rules = None
+        # Último modelo ALS de cada (dono, persona), com a chave dos dados em que foi treinado;
+        # reaproveitado por `retreino_horas` (usuários novos entram por fold-in) e substituído no retreino
+        self.als_models: Dict[Tuple[Optional[str], Optional[str]], Tuple[str, ImplicitALS]] = {}
+        self._als_lock = threading.Lock()
+        
+    def _filter_collaborative_data(self, df: pd.DataFrame, persona_config: Dict) -> pd.DataFrame:
+        """Aplica o período de análise e os filtros de preço e desempenho da persona."""
+        # Seleciona período de análise baseado na configuração
+        period = persona_config['recomendacao_produtos']['periodo_analise']
+        end_date = df['date'].max()
+        start_date = end_date - pd.Timedelta(days=period)
+        
+        # Filtra dados pelo período
+        df = df[(df['date'] >= start_date) & (df['date'] <= end_date)]
+        
+        # Aplica filtros configurados
+        if persona_config['recomendacao_produtos']['filtros']['preco']:
+            df = df[df['price'] <= df['price'].quantile(0.95)]
+        
+        if persona_config['recomendacao_produtos']['filtros']['desempenho']:
+            df = df[df['quantity'] > 0]
+        return df
         
     def prepare_collaborative_data(self, df: pd.DataFrame, persona_config: Dict) -> pd.DataFrame:
         """Prepara matriz usuário-item para filtragem colaborativa."""
         try:
-            # Seleciona período de análise baseado na configuração
-            period = persona_config['recomendacao_produtos']['periodo_analise']
-            end_date = df['date'].max()
-            start_date = end_date - pd.Timedelta(days=period)
-            
-            # Filtra dados pelo período
-            df = df[(df['date'] >= start_date) & (df['date'] <= end_date)]
-            
-            # Aplica filtros configurados
-            if persona_config['recomendacao_produtos']['filtros']['preco']:
-                df = df[df['price'] <= df['price'].quantile(0.95)]
-            
-            if persona_config['recomendacao_produtos']['filtros']['desempenho']:
-                df = df[df['quantity'] > 0]
+            df = self._filter_collaborative_data(df, persona_config)
             
             # Cria matriz usuário-item
             user_item_matrix = df.pivot_table(
                 index='user_id',
                 columns='product_id',
                 values='rating',
-                fill_value=0
+                fill_value=0,
+                observed=True
             )
             
             return user_item_matrix
@@ -59,9 +74,9 @@ class ProductRecommendationModel:
             
             # Aplica filtros configurados
             if persona_config['recomendacao_produtos']['filtros']['categoria']:
-                df = df.groupby(['transaction_id', 'category'])['product_id'].count().unstack().fillna(0)
+                df = df.groupby(['transaction_id', 'category'], observed=True)['product_id'].count().unstack().fillna(0)
             else:
-                df = df.groupby(['transaction_id', 'product_id'])['quantity'].sum().unstack().fillna(0)
+                df = df.groupby(['transaction_id', 'product_id'], observed=True)['quantity'].sum().unstack().fillna(0)
             
             # Binariza os dados
             df = (df > 0).astype(int)
@@ -79,6 +94,8 @@ class ProductRecommendationModel:
     ) -> List[Dict]:
         """Gera recomendações baseadas em filtragem colaborativa."""
         try:
+            from sklearn.metrics.pairwise import cosine_similarity
+            
             if user_id not in user_item_matrix.index:
                 return []
             
@@ -122,6 +139,180 @@ class ProductRecommendationModel:
             self.logger.error(f"Erro ao gerar recomendações colaborativas: {str(e)}")
             raise
         
+    def batch_collaborative_recommendations(
+        self,
+        df: pd.DataFrame,
+        persona_config: Dict,
+        top_n: Optional[int] = None,
+        neighbors: int = 5,
+        block_size: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Top-N colaborativo de todos os usuários de uma vez, para a tabela de consulta.
+
+        Mesmo critério de `generate_collaborative_recommendations` (os
+        `neighbors` usuários mais similares por cosseno e a média das notas
+        deles ponderada pela similaridade, só para produtos que o usuário não
+        avaliou), mas com a matriz usuário-item esparsa e a similaridade
+        calculada em blocos de `block_size` usuários (por padrão, o que
+        cabe em ~64 MB): a matriz densa usuário × usuário nunca é montada.
+
+        Retorna (usuarios, produtos, indices, notas): `indices` e `notas` têm
+        uma linha por usuário e `top_n` colunas, com índices em `produtos`;
+        posições sem recomendação têm índice -1 e nota NaN.
+        """
+        from scipy import sparse
+        
+        top_n = top_n or persona_config['recomendacao_produtos']['quantidade']
+        df = self._filter_collaborative_data(df, persona_config)
+        # Média das notas por par, como o pivot_table da versão por usuário
+        ratings = df.groupby(['user_id', 'product_id'], observed=True)['rating'].mean()
+        ratings = ratings[ratings != 0]
+        users, user_codes = np.unique(ratings.index.get_level_values(0), return_inverse=True)
+        products, product_codes = np.unique(ratings.index.get_level_values(1), return_inverse=True)
+        n_users, n_products = len(users), len(products)
+        
+        R = sparse.csr_matrix((ratings.to_numpy(dtype=np.float64), (user_codes, product_codes)), shape=(n_users, n_products))
+        rated = R.copy()
+        rated.data[:] = 1.0
+        norms = np.sqrt(np.asarray(R.multiply(R).sum(axis=1))).ravel()
+        Rn = sparse.diags(1.0 / np.where(norms > 0, norms, 1.0)) @ R
+        RnT = Rn.T.tocsr()
+        
+        block_size = block_size or max(16, 8_000_000 // max(n_users, n_products, 1))
+        k = min(neighbors, n_users - 1)
+        indices = np.full((n_users, top_n), -1, dtype=np.int32)
+        scores = np.full((n_users, top_n), np.nan, dtype=np.float32)
+        if k <= 0:
+            return users, products, indices, scores
+        for start in range(0, n_users, block_size):
+            stop = min(start + block_size, n_users)
+            rows = np.arange(start, stop)
+            similarity = (Rn[start:stop] @ RnT).toarray()
+            # O próprio usuário fica fora dos vizinhos
+            similarity[np.arange(stop - start), rows] = -np.inf
+            neighbor_idx = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+            neighbor_sim = np.take_along_axis(similarity, neighbor_idx, axis=1)
+            neighbor_sim = np.where(np.isfinite(neighbor_sim), neighbor_sim, 0.0)
+            W = sparse.csr_matrix(
+                (neighbor_sim.ravel(), (np.repeat(np.arange(stop - start), k), neighbor_idx.ravel())),
+                shape=(stop - start, n_users)
+            )
+            weighted = (W @ R).toarray()
+            weights = (W @ rated).toarray()
+            with np.errstate(invalid='ignore', divide='ignore'):
+                predicted = np.where(weights > 0, weighted / weights, -np.inf)
+            # Produtos já avaliados pelo usuário não são recomendados
+            block_rated = rated[start:stop].tocoo()
+            predicted[block_rated.row, block_rated.col] = -np.inf
+            
+            n = min(top_n, n_products)
+            best = np.argpartition(-predicted, n - 1, axis=1)[:, :n]
+            best_scores = np.take_along_axis(predicted, best, axis=1)
+            order = np.argsort(-best_scores, axis=1)
+            best = np.take_along_axis(best, order, axis=1)
+            best_scores = np.take_along_axis(best_scores, order, axis=1)
+            valid = np.isfinite(best_scores)
+            indices[start:stop, :n] = np.where(valid, best, -1)
+            scores[start:stop, :n] = np.where(valid, best_scores, np.nan)
+        return users, products, indices, scores
+        
+    def _als_settings(self, persona_config: Dict) -> Dict[str, Any]:
+        return dict(ALS_DEFAULTS, retreino_horas=24, **persona_config['recomendacao_produtos'].get('als', {}))
+        
+    def _als_key(self, df: pd.DataFrame, persona_config: Dict) -> str:
+        """Chave do modelo: parâmetros, período, filtros e catálogo de produtos dos dados."""
+        products = np.sort(df['product_id'].unique())
+        params = {key: persona_config['recomendacao_produtos'].get(key) for key in ('periodo_analise', 'filtros', 'als')}
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode('utf-8'))
+        digest.update(pd.util.hash_array(products).tobytes())
+        return digest.hexdigest()
+        
+    def train_als_model(self, df: pd.DataFrame, persona_config: Dict, reuse: bool = True,
+                        owner: Optional[str] = None, persona: Optional[str] = None) -> ImplicitALS:
+        """Modelo ALS treinado com os dados filtrados da persona.
+        
+        Guarda um único modelo por (`owner`, `persona`). Com `reuse`, o
+        modelo guardado é reaproveitado se foi treinado com o mesmo catálogo
+        e parâmetros há menos de `retreino_horas`: usuários que surgiram
+        depois dele são atendidos por fold-in, sem novo treino. Um novo
+        treino substitui o modelo anterior do mesmo dono e persona.
+        """
+        settings = self._als_settings(persona_config)
+        key = self._als_key(df, persona_config)
+        slot = (owner, persona)
+        with self._als_lock:
+            cached_key, model = self.als_models.get(slot, (None, None))
+            if (reuse and cached_key == key
+                    and time.time() - model.trained_at < settings['retreino_horas'] * 3600):
+                return model
+        model = ImplicitALS.from_settings(settings).fit(interaction_weights(df, settings['meia_vida_dias']))
+        with self._als_lock:
+            self.als_models[slot] = (key, model)
+        return model
+        
+    def generate_als_recommendations(
+        self,
+        df: pd.DataFrame,
+        user_id: Optional[str],
+        persona_config: Dict,
+        owner: Optional[str] = None,
+        persona: Optional[str] = None
+    ) -> List[Dict]:
+        """Gera recomendações por fatoração de matrizes com feedback implícito (quantidade e recência)."""
+        try:
+            if user_id is None:
+                return []
+            df = self._filter_collaborative_data(df, persona_config)
+            if df.empty:
+                return []
+            model = self.train_als_model(df, persona_config, owner=owner, persona=persona)
+            half_life = self._als_settings(persona_config)['meia_vida_dias']
+            user_weights = interaction_weights(df[df['user_id'] == user_id], half_life, reference_date=df['date'].max())
+            codes, scores = model.recommend(
+                user_id,
+                persona_config['recomendacao_produtos']['quantidade'],
+                user_weights.droplevel(0)
+            )
+            return [
+                {'product_id': product, 'score': float(score)}
+                for product, score in zip(model.products[codes].tolist(), scores.tolist())
+            ]
+        except Exception as e:
+            self.logger.error(f"Erro ao gerar recomendações ALS: {str(e)}")
+            raise
+        
+    def batch_als_recommendations(
+        self,
+        df: pd.DataFrame,
+        persona_config: Dict,
+        top_n: Optional[int] = None,
+        owner: Optional[str] = None,
+        persona: Optional[str] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Top-N ALS de todos os usuários, no mesmo formato de `batch_collaborative_recommendations`.
+        
+        Sempre treina um modelo novo (é o job offline que renova a tabela),
+        que passa a ser o reaproveitado pelas consultas individuais.
+        """
+        top_n = top_n or persona_config['recomendacao_produtos']['quantidade']
+        df = self._filter_collaborative_data(df, persona_config)
+        model = self.train_als_model(df, persona_config, reuse=False, owner=owner, persona=persona)
+        indices, scores = model.recommend_all(top_n)
+        return model.users.to_numpy(), model.products.to_numpy(), indices, scores
+        
+    def batch_recommendations(
+        self,
+        df: pd.DataFrame,
+        persona_config: Dict,
+        top_n: Optional[int] = None,
+        owner: Optional[str] = None,
+        persona: Optional[str] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Top-N de todos os usuários pelo método da persona: ALS com 'als', senão colaborativo por cosseno."""
+        if persona_config['recomendacao_produtos']['metodo'] == 'als':
+            return self.batch_als_recommendations(df, persona_config, top_n, owner, persona)
+        return self.batch_collaborative_recommendations(df, persona_config, top_n=top_n)
+        
     def generate_association_recommendations(
         self,
         transactions: pd.DataFrame,
@@ -129,6 +320,8 @@ class ProductRecommendationModel:
     ) -> List[Dict]:
         """Gera recomendações baseadas em regras de associação."""
         try:
+            from mlxtend.frequent_patterns import apriori, association_rules
+            
             # Encontra itemsets frequentes
             frequent_itemsets = apriori(
                 transactions,
@@ -168,7 +361,9 @@ class ProductRecommendationModel:
         self,
         df: pd.DataFrame,
         persona_config: Dict,
-        user_id: Optional[str] = None
+        user_id: Optional[str] = None,
+        owner: Optional[str] = None,
+        persona: Optional[str] = None
     ) -> List[Dict]:
         """Gera recomendações usando o método especificado na configuração."""
         try:
@@ -181,6 +376,8 @@ class ProductRecommendationModel:
                     user_id,
                     persona_config
                 )
+            elif method == 'als':
+                return self.generate_als_recommendations(df, user_id, persona_config, owner, persona)
             elif method == 'associacao':
                 transactions = self.prepare_association_data(df, persona_config)
                 return self.generate_association_recommendations(
@@ -0,0 +1,54 @@
+from typing import Dict, Any, Tuple
+import numpy as np
+import pandas as pd
+
+# Opções do Prophet em `previsao_vendas.prophet`. No modo rápido, o predict
+# roda só sobre o horizonte futuro e os intervalos vêm de `amostras_incerteza`
+# simulações (ou, com 0, de uma fórmula analítica sobre os resíduos).
+PROPHET_DEFAULTS = {
+    'previsao_rapida': True,
+    'amostras_incerteza': 0,
+    'largura_intervalo': 0.8
+}
+
+FORECAST_COLUMNS = ['ds', 'yhat', 'yhat_lower', 'yhat_upper']
+
+def prophet_options(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Opções do Prophet da configuração de previsão, completadas com os padrões."""
+    return {**PROPHET_DEFAULTS, **(config or {}).get('prophet', {})}
+
+def build_prophet(options: Dict[str, Any], **kwargs):
+    """Cria o modelo Prophet com a amostragem de incerteza configurada."""
+    from prophet import Prophet
+    samples = options['amostras_incerteza'] if options['previsao_rapida'] else 1000
+    return Prophet(interval_width=options['largura_intervalo'], uncertainty_samples=samples, **kwargs)
+
+def predict_prophet(model, history: pd.DataFrame, horizon: int,
+                    options: Dict[str, Any]) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Prevê o horizonte e retorna também o ajuste dentro da amostra.
+
+    Retorna as linhas futuras (ds, yhat, yhat_lower, yhat_upper) e o yhat do
+    histórico, usado nas métricas. No modo rápido, o histórico é previsto sem
+    simulação de incerteza e só o horizonte recebe intervalos.
+    """
+    if not options['previsao_rapida']:
+        forecast = model.predict(model.make_future_dataframe(periods=horizon))
+        return forecast[FORECAST_COLUMNS].tail(horizon).reset_index(drop=True), forecast['yhat'].to_numpy()[:len(history)]
+
+    samples = model.uncertainty_samples
+    try:
+        model.uncertainty_samples = 0
+        fitted = model.predict(history[['ds']])['yhat'].to_numpy()
+        model.uncertainty_samples = samples
+        forecast = model.predict(model.make_future_dataframe(periods=horizon, include_history=False))
+    finally:
+        model.uncertainty_samples = samples
+
+    if not samples:
+        from scipy.stats import norm
+        # Intervalo normal com o desvio dos resíduos dentro da amostra
+        sigma = float(np.std(history['y'].to_numpy() - fitted))
+        spread = norm.ppf(0.5 + options['largura_intervalo'] / 2) * sigma
+        forecast['yhat_lower'] = forecast['yhat'] - spread
+        forecast['yhat_upper'] = forecast['yhat'] + spread
+    return forecast[FORECAST_COLUMNS].reset_index(drop=True), fitted
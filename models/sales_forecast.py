@@ -1,17 +1,23 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import pandas as pd
-from prophet import Prophet
-import xgboost as xgb
-from sklearn.preprocessing import StandardScaler
 import numpy as np
 import logging
 
+from models.fast_forecast import FAST_FORECASTERS, fast_forecast
+from models.prophet_utils import prophet_options, build_prophet, predict_prophet
+from utils.feature_store import FeatureStore, calendar_features, compute_features
+
+# prophet, xgboost e sklearn são importados sob demanda, apenas pelo método configurado
+
+HEAVY_METHODS = ('prophet', 'xgb')
+
 class SalesForecastModel:
-    def __init__(self, config: Dict):
+    def __init__(self, config: Dict, feature_store: Optional[FeatureStore] = None):
         self.config = config
+        self.feature_store = feature_store
         self.prophet_model = None
         self.xgb_model = None
-        self.scaler = StandardScaler()
+        self.scaler = None
         self.logger = logging.getLogger(__name__)
 
     def prepare_data(self, df: pd.DataFrame, persona_config: Dict) -> pd.DataFrame:
@@ -25,7 +31,7 @@ class SalesForecastModel:
             if 'geral' not in segments:
                 group_cols = [col for col in segments if col in df.columns]
                 if group_cols:
-                    df = df.groupby(['date'] + group_cols)[metrics].sum().reset_index()
+                    df = df.groupby(['date'] + group_cols, observed=True)[metrics].sum().reset_index()
             
             return df
         except Exception as e:
@@ -36,7 +42,8 @@ class SalesForecastModel:
         """Treina modelo Prophet com configurações específicas da persona."""
         try:
             horizon = persona_config['previsao_vendas']['horizonte']
-            self.prophet_model = Prophet(
+            self.prophet_model = build_prophet(
+                prophet_options(persona_config['previsao_vendas']),
                 yearly_seasonality=True,
                 weekly_seasonality=True,
                 daily_seasonality=False,
@@ -56,14 +63,18 @@ class SalesForecastModel:
             self.logger.error(f"Erro ao treinar Prophet: {str(e)}")
             raise
 
-    def train_xgboost(self, df: pd.DataFrame, persona_config: Dict) -> None:
+    def train_xgboost(self, df: pd.DataFrame, persona_config: Dict, series_key: Optional[str] = None) -> None:
         """Treina modelo XGBoost com configurações específicas da persona."""
         try:
+            import xgboost as xgb
+            from sklearn.preprocessing import StandardScaler
+            
             # Prepara features baseado no nível de detalhe
-            features = self._prepare_features(df, persona_config)
+            features = self._prepare_features(df, persona_config, series_key)
             target = df['y'].values
             
             # Escala features
+            self.scaler = StandardScaler()
             features_scaled = self.scaler.fit_transform(features)
             
             # Configura modelo baseado no nível de detalhe
@@ -86,30 +97,43 @@ class SalesForecastModel:
             self.logger.error(f"Erro ao treinar XGBoost: {str(e)}")
             raise
 
-    def _prepare_features(self, df: pd.DataFrame, persona_config: Dict) -> pd.DataFrame:
-        """Prepara features para XGBoost baseado nas configurações."""
-        features = pd.DataFrame()
-        
+    def _prepare_features(self, df: pd.DataFrame, persona_config: Dict,
+                          series_key: Optional[str] = None) -> pd.DataFrame:
+        """Prepara features para XGBoost baseado nas configurações.
+
+        Com um armazenamento de features e `series_key`, as defasagens e
+        médias móveis de cada métrica vêm do `FeatureStore` e só os dias
+        novos são calculados.
+        """
+        detail = persona_config['previsao_vendas']['nivel_detalhe']
+        dates = pd.to_datetime(df['date']).to_numpy()
+        stored = {
+            metric: self._series_features(series_key, metric, dates, df[metric])
+            for metric in persona_config['previsao_vendas']['metricas'] if metric in df.columns
+        }
+        calendar = next(iter(stored.values())) if stored else calendar_features(dates)
+
         # Adiciona features temporais
-        df['date'] = pd.to_datetime(df['date'])
-        features['day_of_week'] = df['date'].dt.dayofweek
-        features['month'] = df['date'].dt.month
-        
-        if persona_config['previsao_vendas']['nivel_detalhe'] in ['alto', 'muito_alto']:
-            features['day_of_month'] = df['date'].dt.day
-            features['quarter'] = df['date'].dt.quarter
+        features = {'day_of_week': calendar['dayofweek'], 'month': calendar['month']}
+        if detail in ['alto', 'muito_alto']:
+            features['day_of_month'] = calendar['day']
+            features['quarter'] = calendar['quarter']
         
         # Adiciona métricas como features
-        for metric in persona_config['previsao_vendas']['metricas']:
-            if metric in df.columns:
-                features[f'lag1_{metric}'] = df[metric].shift(1)
-                features[f'lag7_{metric}'] = df[metric].shift(7)
-                
-                if persona_config['previsao_vendas']['nivel_detalhe'] == 'muito_alto':
-                    features[f'lag30_{metric}'] = df[metric].shift(30)
-                    features[f'rolling_mean_7_{metric}'] = df[metric].rolling(7).mean()
+        for metric, values in stored.items():
+            features[f'lag1_{metric}'] = values['lag_1']
+            features[f'lag7_{metric}'] = values['lag_7']
+            if detail == 'muito_alto':
+                features[f'lag30_{metric}'] = values['lag_30']
+                features[f'rolling_mean_7_{metric}'] = values['rolling_mean_7']
         
-        return features.fillna(0)
+        return pd.DataFrame(features, index=df.index).fillna(0)
+
+    def _series_features(self, series_key: Optional[str], metric: str, dates: np.ndarray,
+                         values: pd.Series) -> Dict[str, np.ndarray]:
+        if self.feature_store is not None and series_key:
+            return self.feature_store.update(f"{series_key}:{metric}", dates, values)
+        return compute_features(dates, values.to_numpy(dtype=np.float64))
 
     def generate_forecast(self, df: pd.DataFrame, persona_config: Dict) -> pd.DataFrame:
         """Gera previsões usando o método especificado na configuração da persona."""
@@ -121,21 +145,162 @@ class SalesForecastModel:
                 return self._generate_prophet_forecast(df, horizon)
             elif method == 'xgb':
                 return self._generate_xgb_forecast(df, horizon)
+            elif method in FAST_FORECASTERS:
+                return self._generate_fast_forecast(df, horizon, method)
             else:
                 raise ValueError(f"Método de previsão inválido: {method}")
         except Exception as e:
             self.logger.error(f"Erro ao gerar previsão: {str(e)}")
             raise
 
+    def _generate_fast_forecast(self, df: pd.DataFrame, horizon: int, method: str) -> pd.DataFrame:
+        """Gera previsão com um modelo rápido, que dispensa o treino prévio."""
+        dates = pd.to_datetime(df['ds'] if 'ds' in df.columns else df['date'])
+        forecast, variance = fast_forecast(df['y'].to_numpy(), horizon, method)
+        return self._fast_frame(dates.max(), forecast, variance).drop(columns='key')
+
+    @staticmethod
+    def _fast_frame(last_date: pd.Timestamp, forecast: np.ndarray, variance: np.ndarray,
+                    keys: Optional[List[str]] = None) -> pd.DataFrame:
+        """Converte a matriz de previsões (séries × horizonte) em formato longo."""
+        n_series, horizon = forecast.shape
+        spread = 1.96 * np.sqrt(variance)[:, None]
+        return pd.DataFrame({
+            'key': np.repeat(keys if keys is not None else np.zeros(n_series, dtype=int), horizon),
+            'ds': np.tile(pd.date_range(last_date, periods=horizon + 1, freq='D')[1:], n_series),
+            'yhat': forecast.ravel(),
+            'yhat_lower': np.maximum(forecast - spread, 0).ravel(),
+            'yhat_upper': (forecast + spread).ravel()
+        })
+
+    def _heavy_segments(self, totals: pd.Series, persona_config: Dict,
+                        levels: Optional[List[str]] = None) -> List[str]:
+        """Segmentos de maior volume, que recebem o método configurado (prophet/xgb).
+
+        Com `levels` (o nível de cada série, na ordem de `totals`), a
+        participação é medida dentro de cada nível e os níveis mais altos
+        têm prioridade no limite de séries pesadas.
+        """
+        previsao = persona_config['previsao_vendas']
+        routing = previsao.get('roteamento', {})
+        if previsao.get('nivel_detalhe') == 'baixo' or previsao['metodo'] not in HEAVY_METHODS:
+            return []
+        share = routing.get('participacao_pesada', 0.8)
+        groups = pd.Series(levels if levels is not None else 0, index=totals.index)
+        heavy = []
+        for level in pd.unique(groups.to_numpy()):
+            ranked = totals[(groups == level).to_numpy()].sort_values(ascending=False)
+            share_before = (ranked.cumsum() - ranked) / max(ranked.sum(), 1e-9)
+            heavy.extend(ranked[share_before < share].index)
+        return list(dict.fromkeys(heavy))[:routing.get('max_series_pesadas', 10)]
+
+    def _generate_heavy_forecast(self, series: pd.Series, persona_config: Dict,
+                                 method: Optional[str] = None) -> pd.DataFrame:
+        """Treina e prevê uma única série com o método informado (ou o configurado)."""
+        method = method or persona_config['previsao_vendas']['metodo']
+        horizon = persona_config['previsao_vendas']['horizonte']
+        df = pd.DataFrame({'ds': series.index, 'date': series.index, 'y': series.to_numpy()})
+        if method == 'prophet':
+            self.train_prophet(df, persona_config)
+            return self._generate_prophet_forecast(df, horizon)
+        series_key = str(series.name) if self.feature_store is not None and series.name is not None else None
+        self.train_xgboost(df, persona_config, series_key)
+        return self._generate_xgb_forecast(df, horizon, series_key)
+
+    def forecast_matrix(self, calendar: pd.DatetimeIndex, matrix: np.ndarray, keys: List[str], persona_config: Dict,
+                        methods: Optional[Dict[str, str]] = None,
+                        levels: Optional[List[str]] = None) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        """Prevê as séries de `matrix` (uma por linha, um dia de `calendar` por coluna) roteando pelo volume.
+
+        Os segmentos de maior volume (`_heavy_segments`) usam o método
+        configurado; a cauda longa, ou todos os segmentos quando
+        `nivel_detalhe` é 'baixo', vai para `roteamento.metodo_rapido` em uma
+        única chamada vetorizada. Com `methods` (o resultado de
+        `Backtester.run`), cada segmento usa o método que venceu o backtest;
+        chaves repetidas recebem o mesmo método. Retorna a previsão
+        (séries × horizonte), a variância por série e o método usado em cada uma.
+        """
+        previsao = persona_config['previsao_vendas']
+        horizon = previsao['horizonte']
+        fast_method = previsao.get('roteamento', {}).get('metodo_rapido', 'holt_winters')
+        matrix = np.asarray(matrix, dtype=np.float64)
+
+        if methods is None:
+            totals = pd.Series(matrix.sum(axis=1), index=keys)
+            heavy_keys = self._heavy_segments(totals, persona_config, levels)
+            chosen = [previsao['metodo'] if key in heavy_keys else fast_method for key in keys]
+            # Uma chave repetida (ex.: o mesmo produto em duas categorias) só recebe o pesado uma vez
+            seen = set()
+            for row, key in enumerate(keys):
+                if chosen[row] in HEAVY_METHODS:
+                    if key in seen:
+                        chosen[row] = fast_method
+                    seen.add(key)
+        else:
+            chosen = [methods.get(key, fast_method) for key in keys]
+
+        forecast = np.zeros((len(keys), horizon))
+        variance = np.ones(len(keys))
+        unavailable = set()
+        for row, method in enumerate(chosen):
+            if method not in HEAVY_METHODS:
+                continue
+            try:
+                if method in unavailable:
+                    raise ImportError(f"{method} indisponível")
+                result = self._generate_heavy_forecast(pd.Series(matrix[row], index=calendar, name=keys[row]),
+                                                       persona_config, method)
+            except ImportError:
+                unavailable.add(method)
+                chosen[row] = fast_method
+                continue
+            except Exception as e:
+                # Sem o modelo pesado (série curta, falha no ajuste), o segmento fica no rápido
+                self.logger.warning(f"Segmento {keys[row]} sem previsão {method}: {str(e)}")
+                chosen[row] = fast_method
+                continue
+            forecast[row] = result['yhat'].to_numpy(dtype=np.float64)[:horizon]
+            # Variância equivalente ao intervalo de 95% do modelo pesado
+            spread = (result['yhat_upper'] - result['yhat_lower']).to_numpy(dtype=np.float64) / (2 * 1.96)
+            variance[row] = max(float(np.mean(spread ** 2)), 1e-9)
+        for method in unavailable:
+            self.logger.warning(f"Método {method} indisponível, usando {fast_method}")
+
+        chosen_array = np.asarray(chosen, dtype=object)
+        for method in dict.fromkeys(m for m in chosen if m not in HEAVY_METHODS):
+            rows = np.flatnonzero(chosen_array == method)
+            forecast[rows], variance[rows] = fast_forecast(matrix[rows], horizon, method)
+        return forecast, variance, chosen
+
+    def generate_tiered_forecasts(self, series: pd.DataFrame, persona_config: Dict,
+                                  methods: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+        """Gera previsões para muitos segmentos roteando cada um pelo volume (`forecast_matrix`).
+
+        `series` está no formato longo de `segment_totals` (date, key, value).
+        Retorna as colunas key, ds, yhat, yhat_lower, yhat_upper e modelo.
+        """
+        try:
+            matrix = series.pivot_table(index='key', columns='date', values='value', aggfunc='sum', fill_value=0)
+            calendar = pd.date_range(matrix.columns.min(), matrix.columns.max(), freq='D')
+            matrix = matrix.reindex(columns=calendar, fill_value=0)
+            keys = list(matrix.index)
+            forecast, variance, chosen = self.forecast_matrix(calendar, matrix.to_numpy(), keys, persona_config, methods)
+            frame = self._fast_frame(calendar[-1], forecast, variance, keys)
+            frame['modelo'] = np.repeat(chosen, forecast.shape[1])
+            return frame[['key', 'ds', 'yhat', 'yhat_lower', 'yhat_upper', 'modelo']]
+        except Exception as e:
+            self.logger.error(f"Erro ao gerar previsões por segmento: {str(e)}")
+            raise
+
     def _generate_prophet_forecast(self, df: pd.DataFrame, horizon: int) -> pd.DataFrame:
         """Gera previsão usando Prophet."""
-        future = self.prophet_model.make_future_dataframe(periods=horizon)
-        forecast = self.prophet_model.predict(future)
-        return forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
+        options = prophet_options(self.config.get('previsao_vendas', {}))
+        forecast, _ = predict_prophet(self.prophet_model, df, horizon, options)
+        return forecast
 
-    def _generate_xgb_forecast(self, df: pd.DataFrame, horizon: int) -> pd.DataFrame:
+    def _generate_xgb_forecast(self, df: pd.DataFrame, horizon: int, series_key: Optional[str] = None) -> pd.DataFrame:
         """Gera previsão usando XGBoost."""
-        features = self._prepare_features(df, self.config)
+        features = self._prepare_features(df, self.config, series_key)
         features_scaled = self.scaler.transform(features)
         
         predictions = []
@@ -1,61 +1,62 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import pandas as pd
 import numpy as np
-from prophet import Prophet
-import xgboost as xgb
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import mean_squared_error
+from utils.instrumentation import span
+from models.hierarchical_forecast import HierarchicalForecaster
+from models.prophet_utils import prophet_options, build_prophet, predict_prophet
+from utils.feature_store import FeatureStore, compute_features, future_features
+
+# prophet, xgboost e sklearn são importados dentro dos métodos que os usam,
+# para que só sejam carregados quando o método de previsão for executado.
+
+# Features usadas pelo XGBoost, na ordem em que entram no modelo
+XGBOOST_FEATURES = ['year', 'month', 'day', 'dayofweek', 'quarter',
+                    'lag_7', 'lag_14', 'lag_30', 'rolling_mean_7', 'rolling_std_7']
 
 class SalesForecastingModel:
-    def __init__(self):
+    def __init__(self, feature_store: Optional[FeatureStore] = None):
         self.prophet_model = None
         self.xgboost_model = None
-        self.scaler = StandardScaler()
-        
-    def prepare_xgboost_features(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Prepare features for XGBoost model."""
-        # Create time-based features
-        df['year'] = df['ds'].dt.year
-        df['month'] = df['ds'].dt.month
-        df['day'] = df['ds'].dt.day
-        df['dayofweek'] = df['ds'].dt.dayofweek
-        df['quarter'] = df['ds'].dt.quarter
-        
-        # Create lag features
-        df['lag_7'] = df['y'].shift(7)
-        df['lag_14'] = df['y'].shift(14)
-        df['lag_30'] = df['y'].shift(30)
+        self.scaler = None
+        self.feature_store = feature_store
         
-        # Create rolling features
-        df['rolling_mean_7'] = df['y'].rolling(window=7).mean()
-        df['rolling_std_7'] = df['y'].rolling(window=7).std()
+    def series_features(self, df: pd.DataFrame, series_key: Optional[str] = None) -> Dict[str, np.ndarray]:
+        """Calendar, lag and rolling features for a (ds, y) series, from the feature store when keyed."""
+        if self.feature_store is not None and series_key:
+            return self.feature_store.update(series_key, df['ds'], df['y'])
+        return compute_features(pd.to_datetime(df['ds']).to_numpy(), df['y'].to_numpy(dtype=np.float64))
         
-        # Drop rows with NaN values
-        df = df.dropna()
+    def prepare_xgboost_features(self, df: pd.DataFrame, series_key: Optional[str] = None) -> pd.DataFrame:
+        """Prepare features for XGBoost model without modifying the input frame."""
+        features = pd.DataFrame(self.series_features(df, series_key))
         
-        return df
+        # Drop rows with NaN values (the first 30 days have no lag_30)
+        return features[['ds', 'y'] + XGBOOST_FEATURES].dropna()
         
-    def predict_with_prophet(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def predict_with_prophet(self, df: pd.DataFrame, config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Generate forecast using Prophet."""
         try:
+            from sklearn.metrics import mean_squared_error
+            
             # Initialize and fit the model
-            self.prophet_model = Prophet(
+            options = prophet_options(config)
+            self.prophet_model = build_prophet(
+                options,
                 yearly_seasonality=True,
                 weekly_seasonality=True,
                 daily_seasonality=True
             )
-            self.prophet_model.fit(df)
-            
-            # Create future dates for forecasting
-            future = self.prophet_model.make_future_dataframe(periods=30)
+            with span("fit", model="prophet", rows=len(df)):
+                self.prophet_model.fit(df)
             
-            # Generate forecast
-            forecast = self.prophet_model.predict(future)
+            # Generate forecast, simulating intervals only for the future horizon in fast mode
+            with span("predict", model="prophet", rows=30, fast=options['previsao_rapida']):
+                forecast, fitted = predict_prophet(self.prophet_model, df, 30, options)
             
             return {
-                "forecast": forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].tail(30).to_dict('records'),
+                "forecast": forecast.to_dict('records'),
                 "metrics": {
-                    "mse": mean_squared_error(df['y'], forecast['yhat'][:len(df)])
+                    "mse": mean_squared_error(df['y'], fitted)
                 }
             }
             
@@ -63,17 +64,24 @@ class SalesForecastingModel:
             print(f"Error in Prophet forecasting: {str(e)}")
             return {"error": str(e)}
             
-    def predict_with_xgboost(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def predict_with_xgboost(self, df: pd.DataFrame, series_key: Optional[str] = None) -> Dict[str, Any]:
         """Generate forecast using XGBoost."""
         try:
-            # Prepare features
-            feature_df = self.prepare_xgboost_features(df)
+            import xgboost as xgb
+            from sklearn.preprocessing import StandardScaler
+            from sklearn.metrics import mean_squared_error
+            
+            # Prepare features, only new days are computed when the series is in the feature store
+            with span("prepare", model="xgboost", rows=len(df), stored=bool(self.feature_store and series_key)):
+                series = self.series_features(df, series_key)
+                feature_df = pd.DataFrame(series)[['ds', 'y'] + XGBOOST_FEATURES].dropna()
             
             # Split into features and target
-            X = feature_df.drop(['ds', 'y'], axis=1)
+            X = feature_df[XGBOOST_FEATURES]
             y = feature_df['y']
             
             # Scale features
+            self.scaler = StandardScaler()
             X_scaled = self.scaler.fit_transform(X)
             
             # Initialize and fit the model
@@ -83,20 +91,17 @@ class SalesForecastingModel:
                 learning_rate=0.1,
                 max_depth=6
             )
-            self.xgboost_model.fit(X_scaled, y)
-            
-            # Generate future dates
-            last_date = df['ds'].max()
-            future_dates = pd.date_range(start=last_date, periods=31, freq='D')[1:]
+            with span("fit", model="xgboost", rows=len(X_scaled)):
+                self.xgboost_model.fit(X_scaled, y)
             
-            # Create future features
-            future_df = pd.DataFrame({'ds': future_dates})
-            future_features = self.prepare_xgboost_features(future_df)
-            future_X = future_features.drop(['ds', 'y'], axis=1)
-            future_X_scaled = self.scaler.transform(future_X)
+            # Create future features: lags known from history, NaN (missing for XGBoost) beyond them
+            future_df = future_features(series, 30)
+            future_dates = future_df['ds']
+            future_X_scaled = self.scaler.transform(future_df[XGBOOST_FEATURES])
             
             # Generate forecast
-            forecast = self.xgboost_model.predict(future_X_scaled)
+            with span("predict", model="xgboost", rows=len(future_X_scaled)):
+                forecast = self.xgboost_model.predict(future_X_scaled)
             
             return {
                 "forecast": [
@@ -115,4 +120,22 @@ class SalesForecastingModel:
             
         except Exception as e:
             print(f"Error in XGBoost forecasting: {str(e)}")
-            return {"error": str(e)} 
\ No newline at end of file
+            return {"error": str(e)} 
+            
+    def predict_hierarchical(self, df: pd.DataFrame, config: Dict[str, Any],
+                             methods: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Generate coherent forecasts for every configured segment from raw transactions.
+
+        With `roteamento` (or a backtest `methods` map) the base forecasts are
+        routed: high-volume segments go to Prophet/XGBoost, the long tail to
+        the vectorized fast model.
+        """
+        try:
+            router = None
+            if config.get("roteamento") is not None or methods:
+                from models.sales_forecast import SalesForecastModel
+                router = SalesForecastModel({"previsao_vendas": config}, self.feature_store)
+            return HierarchicalForecaster(config, router, methods).forecast(df)
+        except Exception as e:
+            print(f"Error in hierarchical forecasting: {str(e)}")
+            return {"error": str(e)}
@@ -0,0 +1,57 @@
+"""Estado do detector de anomalias por usuário e fonte de dados."""
+import numpy as np
+import pandas as pd
+
+from models.anomaly_detection import AnomalyDetector, state_scope
+
+def make_sales(days: int = 30, spike_product: int = 7) -> pd.DataFrame:
+    """Vendas diárias estáveis de 10 produtos, com um pico do `spike_product` no último dia."""
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2026-09-01", periods=days, freq="D")
+    rows = []
+    for day, date in enumerate(dates):
+        for product in range(10):
+            quantity = 10 + rng.integers(0, 2)
+            if day == days - 1 and product == spike_product:
+                quantity = 100
+            rows.append({"date": date, "product_id": product, "category": "A",
+                         "price": 10.0, "quantity": quantity})
+    return pd.DataFrame(rows)
+
+def user_config(user_id: str) -> dict:
+    return {
+        "usuario_id": user_id,
+        "data_sources": [{"type": "csv", "path": "data/vendas.csv"}],
+        "alertas": {"anomalias": True, "threshold_anomalia": 0.2},
+        "preferencias_analise": {"previsao_vendas": {"segmentos": ["produto"]}}
+    }
+
+def product_alerts(alerts):
+    return [alert for alert in alerts if alert["segmento"] == "produto" and alert["valor"] == "7"]
+
+def test_usuarios_com_a_mesma_configuracao_nao_compartilham_estado(tmp_path):
+    """Cada usuário tem o próprio arquivo de estado e recebe os mesmos alertas para os mesmos dados."""
+    sales = make_sales()
+    alerts = {}
+    for user_id in ("a", "b"):
+        config = user_config(user_id)
+        alerts[user_id] = AnomalyDetector(config, tmp_path, scope=state_scope(config)).detect(sales)
+    assert product_alerts(alerts["a"])
+    assert product_alerts(alerts["b"]) == product_alerts(alerts["a"])
+    assert len(list(tmp_path.glob("anomalias_*.npz"))) == 2
+
+def test_fontes_diferentes_tem_estados_separados():
+    """O mesmo usuário com outra fonte de dados não reaproveita o estado da primeira."""
+    config_a, config_b = user_config("a"), user_config("a")
+    config_b["data_sources"] = [{"type": "csv", "path": "data/outra_loja.csv"}]
+    assert state_scope(config_a) != state_scope(config_b)
+
+def test_reexecucao_no_mesmo_dia_retorna_os_ultimos_alertas(tmp_path):
+    """Rodar de novo com os dados do mesmo dia devolve os alertas já calculados, sem reprocessar o dia."""
+    sales = make_sales()
+    config = user_config("a")
+    first = AnomalyDetector(config, tmp_path, scope=state_scope(config)).detect(sales)
+    # Nova instância: o estado salvo já inclui o último dia
+    second = AnomalyDetector(config, tmp_path, scope=state_scope(config)).detect(sales)
+    assert product_alerts(first)
+    assert second == first
@@ -0,0 +1,83 @@
+"""Origens móveis, cache das janelas e escolha do método no backtest."""
+import numpy as np
+import pandas as pd
+
+import models.backtesting as backtesting
+from models.backtesting import Backtester, rolling_origins
+
+def series(days: int = 100, keys=("geral", "produto=1", "produto=2")) -> pd.DataFrame:
+    """Totais diários no formato de `segment_totals` (date, key, value)."""
+    rng = np.random.default_rng(4)
+    dates = pd.date_range("2026-03-01", periods=days, freq="D")
+    return pd.DataFrame([
+        {"date": date, "key": key, "value": float(rng.poisson(50 + 20 * i))}
+        for i, key in enumerate(keys) for date in dates
+    ])
+
+def backtester(cache_dir=None, **backtest) -> Backtester:
+    options = {"metodos": ["media_sazonal", "holt_winters"], "janelas": 3, "passo": 7, "treino_minimo": 56}
+    return Backtester({"horizonte": 14, "backtest": dict(options, **backtest)}, cache_dir=cache_dir)
+
+def test_origens_recuam_pelo_passo_e_respeitam_o_treino_minimo():
+    """A origem mais recente deixa exatamente o horizonte para o teste."""
+    assert rolling_origins(100, 14, 3, 7, 56) == [72, 79, 86]
+    assert rolling_origins(100, 14, 3, 7, 75) == [79, 86]
+    assert rolling_origins(60, 14, 3, 7, 56) == []
+
+    errors = backtester().evaluate(series())
+    assert sorted(errors["origem"].unique()) == list(pd.Timestamp("2026-03-01") + pd.to_timedelta([72, 79, 86], "D"))
+    # 3 séries × 2 métodos × 3 origens, cada uma medida nos 14 dias seguintes
+    assert len(errors) == 18
+
+def test_janelas_em_cache_so_sao_refeitas_quando_o_treino_muda(tmp_path, monkeypatch):
+    calls = []
+    original = backtesting.fast_forecast
+
+    def counting(train, horizon, method):
+        calls.append((method, train.shape[1]))
+        return original(train, horizon, method)
+
+    monkeypatch.setattr(backtesting, "fast_forecast", counting)
+    first = backtester(tmp_path).evaluate(series())
+    assert len(calls) == 6 and len(list(tmp_path.glob("*.npy"))) == 6
+
+    # Mesmos dados: todas as janelas vêm do cache e dão os mesmos erros
+    calls.clear()
+    pd.testing.assert_frame_equal(backtester(tmp_path).evaluate(series()), first)
+    assert calls == []
+
+    # Um dia alterado entre a segunda e a terceira origem só invalida a janela mais recente
+    changed = series()
+    changed.loc[changed["date"] == pd.Timestamp("2026-03-01") + pd.Timedelta(days=80), "value"] += 30
+    backtester(tmp_path).evaluate(changed)
+    assert sorted(calls) == [("holt_winters", 86), ("media_sazonal", 86)]
+
+    # O mesmo treino começando em outra data é outra janela
+    calls.clear()
+    shifted = series()
+    shifted["date"] += pd.Timedelta(days=1)
+    backtester(tmp_path).evaluate(shifted)
+    assert len(calls) == 6
+
+def test_metodo_pesado_so_e_escolhido_com_o_ganho_minimo():
+    """O Prophet precisa reduzir o WAPE do melhor rápido em pelo menos `ganho_minimo`."""
+    errors = pd.DataFrame([
+        # key, metodo, erro_absoluto, realizado: WAPE = erro / realizado
+        ("produto=1", "media_sazonal", 20.0, 100.0),
+        ("produto=1", "holt_winters", 25.0, 100.0),
+        ("produto=1", "prophet", 19.5, 100.0),
+        ("produto=2", "media_sazonal", 30.0, 100.0),
+        ("produto=2", "holt_winters", 20.0, 100.0),
+        ("produto=2", "prophet", 18.0, 100.0),
+        ("produto=3", "media_sazonal", 10.0, 100.0),
+        ("produto=3", "holt_winters", 12.0, 100.0),
+    ], columns=["key", "metodo", "erro_absoluto", "realizado"])
+    methods = ["media_sazonal", "holt_winters", "prophet"]
+
+    selected = backtester(metodos=methods, ganho_minimo=0.05).select(errors)
+    assert selected["metodos"] == {"produto=1": "media_sazonal", "produto=2": "prophet", "produto=3": "media_sazonal"}
+    assert selected["escolhas"] == {"media_sazonal": 2, "prophet": 1}
+    assert selected["erros"]["produto=3"] == {"media_sazonal": 0.1, "holt_winters": 0.12}
+
+    strict = backtester(metodos=methods, ganho_minimo=0.15).select(errors)
+    assert strict["metodos"]["produto=2"] == "holt_winters"
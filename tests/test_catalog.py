@@ -0,0 +1,27 @@
+"""Enriquecimento em lote pelo catálogo."""
+import json
+
+import pandas as pd
+
+from utils.catalog import CatalogService
+
+def test_catalogo_vazio_nao_quebra_o_enriquecimento(tmp_path):
+    """Sem arquivos de catálogo, os atributos ficam None e os dicionários não mudam."""
+    catalog = CatalogService(tmp_path)
+    products = catalog.enrich_products(pd.DataFrame({"product_id": [1, 2]}))
+    assert products["catalog_product_name"].isna().all()
+    assert len(catalog.enrich_stores(pd.DataFrame({"store_id": ["S1"]}))) == 1
+    assert catalog.enrich_records([{"product_id": 1}]) == [{"product_id": 1}]
+    assert catalog.enrich_alerts([{"segmento": "loja", "valor": "1"}]) == [{"segmento": "loja", "valor": "1"}]
+
+def test_registros_e_alertas_resolvem_ids_nas_duas_formas(tmp_path):
+    """'P001', 1 e '1' encontram o mesmo produto; ids ausentes ficam como estavam."""
+    (tmp_path / "product_catalog.json").write_text(json.dumps({"products": [
+        {"product_id": "P001", "product_name": "Smartphone", "category": "Eletrônicos", "brand": "TechCo"}
+    ]}), encoding="utf-8")
+    catalog = CatalogService(tmp_path)
+    records = catalog.enrich_records([{"product_id": "P001"}, {"product_id": 1}, {"product_id": 9}])
+    assert [record.get("product_name") for record in records] == ["Smartphone", "Smartphone", None]
+    assert "product_name" not in records[2]
+    alert = catalog.enrich_alerts([{"segmento": "produto", "valor": "1", "nome": "manual"}])[0]
+    assert alert["nome"] == "manual" and alert["marca"] == "TechCo"
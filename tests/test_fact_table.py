@@ -0,0 +1,40 @@
+"""Compactação da tabela de vendas sem mudar valores nem resultados de contas."""
+import numpy as np
+import pandas as pd
+
+from utils.fact_table import compact_sales_frame
+
+def sales() -> pd.DataFrame:
+    return pd.DataFrame({
+        "user_id": [1001, 1002, 1003, 1001],
+        "transaction_id": [1, 2, 3, 4],
+        "product_id": [7, 8, 7, 9],
+        "quantity": [200, 5, 130, 1],
+        "rating": [5, 4, 1, 3],
+        "price": [10.5, 2999.99, 0.1, 15.0],
+        "category": ["A", "A", "B", "A"]
+    })
+
+def test_contagens_mantem_sinal_e_nao_dao_a_volta():
+    """quantity * 2 com 200 continua 400 (em uint8 viraria 144) e rating - 5 continua negativo."""
+    compact = compact_sales_frame(sales())
+
+    assert compact["quantity"].dtype == np.int32 and compact["rating"].dtype == np.int32
+    assert (compact["quantity"] * 2).tolist() == [400, 10, 260, 2]
+    assert (compact["rating"] - 5).tolist() == [0, -1, -4, -2]
+    assert compact["quantity"].groupby(compact["user_id"]).sum().loc[1001] == 201
+
+def test_ids_sao_reduzidos_e_valores_preservados():
+    df = sales()
+    compact = compact_sales_frame(df)
+
+    assert compact["user_id"].dtype == np.uint16 and compact["transaction_id"].dtype == np.uint8
+    assert compact["price"].dtype == np.float32 and isinstance(compact["category"].dtype, pd.CategoricalDtype)
+    for column in df.columns.drop("price"):
+        assert compact[column].astype(df[column].dtype).equals(df[column])
+    np.testing.assert_allclose(compact["price"], df["price"], atol=0.005)
+
+def test_contagens_fora_do_int32_ou_nao_inteiras_ficam_como_estao():
+    df = sales().assign(quantity=[2.5, 1.0, 3.0, 4.0], rating=[2 ** 40, 1, 2, 3])
+    compact = compact_sales_frame(df)
+    assert compact["quantity"].dtype == np.float64 and compact["rating"].dtype == np.int64
@@ -0,0 +1,116 @@
+"""Previsores vetorizados comparados com um laço simples por série."""
+import numpy as np
+import pytest
+
+from models.fast_forecast import (
+    HOLT_WINTERS_GRID, SMOOTHING_GRID, exponential_smoothing, fast_forecast, holt_winters,
+    seasonal_average, seasonal_naive
+)
+
+SEASON = 7
+
+def matrix(n_series: int = 6, length: int = 45) -> np.ndarray:
+    """Séries com nível, tendência e padrão semanal diferentes, mais ruído."""
+    rng = np.random.default_rng(3)
+    t = np.arange(length)
+    rows = [
+        (10 + 5 * i) + 0.2 * i * t + (2 + i) * np.sin(2 * np.pi * t / SEASON) + rng.normal(0, 1 + i, length)
+        for i in range(n_series)
+    ]
+    return np.array(rows)
+
+def loop_seasonal_average(y, horizon, cycles=4):
+    cycles = max(1, min(cycles, len(y) // SEASON))
+    window = y[-cycles * SEASON:]
+    profile = [np.mean(window[p::SEASON]) for p in range(SEASON)]
+    residuals = [y[t] - y[t - SEASON] for t in range(SEASON, len(y))][-cycles * SEASON:]
+    return [profile[h % SEASON] for h in range(horizon)], np.var(residuals)
+
+def loop_seasonal_naive(y, horizon):
+    residuals = [y[t] - y[t - SEASON] for t in range(SEASON, len(y))]
+    return [y[len(y) - SEASON + h % SEASON] for h in range(horizon)], np.mean(np.square(residuals))
+
+def loop_exponential_smoothing(y, horizon):
+    warmup = min(7, len(y) - 1)
+    best = (np.inf, None)
+    for alpha in SMOOTHING_GRID:
+        level, sse = y[0], 0.0
+        for t in range(1, len(y)):
+            error = y[t] - level
+            if t >= warmup:
+                sse += error ** 2
+            level += alpha * error
+        if sse < best[0]:
+            best = (sse, level)
+    return [best[1]] * horizon, best[0] / (len(y) - warmup)
+
+def loop_holt_winters(y, horizon, damping=0.98):
+    warmup = 2 * SEASON
+    first, second = np.mean(y[:SEASON]), np.mean(y[SEASON:warmup])
+    best = (np.inf, None)
+    for alpha, beta, gamma in HOLT_WINTERS_GRID:
+        level, trend = first, (second - first) / SEASON
+        seasonal = [value - first for value in y[:SEASON]]
+        sse = 0.0
+        for t in range(len(y)):
+            s = seasonal[t % SEASON]
+            damped = damping * trend
+            if t >= warmup:
+                sse += (y[t] - (level + damped + s)) ** 2
+            new_level = alpha * (y[t] - s) + (1 - alpha) * (level + damped)
+            trend = beta * (new_level - level) + (1 - beta) * damped
+            seasonal[t % SEASON] = gamma * (y[t] - new_level) + (1 - gamma) * s
+            level = new_level
+        if sse < best[0]:
+            best = (sse, (level, trend, list(seasonal)))
+    level, trend, seasonal = best[1]
+    forecast = []
+    for h in range(1, horizon + 1):
+        damped_trend = sum(damping ** k for k in range(1, h + 1)) * trend
+        forecast.append(level + damped_trend + seasonal[(len(y) + h - 1) % SEASON])
+    return forecast, best[0] / (len(y) - warmup)
+
+@pytest.mark.parametrize("vectorized, loop", [
+    (seasonal_average, loop_seasonal_average),
+    (seasonal_naive, loop_seasonal_naive),
+    (exponential_smoothing, loop_exponential_smoothing),
+    (holt_winters, loop_holt_winters),
+])
+def test_previsao_vetorizada_igual_ao_laco_por_serie(vectorized, loop):
+    """Cada linha da previsão e da variância é a do mesmo método aplicado à série isolada."""
+    Y = matrix()
+    forecast, variance = vectorized(Y, 10)
+
+    assert forecast.shape == (len(Y), 10) and variance.shape == (len(Y),)
+    for i, y in enumerate(Y):
+        expected_forecast, expected_variance = loop(list(y), 10)
+        np.testing.assert_allclose(forecast[i], expected_forecast, rtol=1e-10)
+        np.testing.assert_allclose(variance[i], expected_variance, rtol=1e-10)
+
+def test_series_curtas_caem_nos_metodos_mais_simples():
+    """Menos de dois ciclos: Holt-Winters vira suavização; menos de um: a ingênua vira média."""
+    Y = matrix(length=12)
+    for got, expected in [(holt_winters(Y, 5), exponential_smoothing(Y, 5)),
+                          (seasonal_naive(Y[:, :5], 5), seasonal_average(Y[:, :5], 5))]:
+        np.testing.assert_array_equal(got[0], expected[0])
+        np.testing.assert_array_equal(got[1], expected[1])
+
+    forecast, variance = seasonal_average(Y[:, :5], 3)
+    np.testing.assert_allclose(forecast, np.repeat(Y[:, :5].mean(axis=1, keepdims=True), 3, axis=1))
+    np.testing.assert_allclose(variance, Y[:, :5].var(axis=1))
+
+def test_entradas_degeneradas():
+    """Série única em vetor, matriz sem dias, séries constantes e método desconhecido."""
+    forecast, _ = fast_forecast(matrix()[0], 4, "holt_winters")
+    assert forecast.shape == (1, 4)
+
+    forecast, variance = seasonal_average(np.zeros((3, 0)), 4)
+    np.testing.assert_array_equal(forecast, np.zeros((3, 4)))
+    np.testing.assert_array_equal(variance, np.ones(3))
+
+    # Variância nula recebe um piso positivo, para não zerar os pesos da reconciliação
+    _, variance = exponential_smoothing(np.full((2, 20), 5.0), 3)
+    assert (variance > 0).all()
+
+    with pytest.raises(ValueError):
+        fast_forecast(matrix(), 4, "arima")
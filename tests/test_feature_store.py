@@ -0,0 +1,57 @@
+"""Armazenamento de features por acréscimo."""
+import json
+
+import numpy as np
+import pandas as pd
+
+from utils.feature_store import FeatureStore, compute_features
+
+def _series(days):
+    dates = pd.date_range("2026-01-01", periods=days, freq="D").to_numpy()
+    values = np.random.default_rng(0).poisson(20, 400)[:days].astype(np.float64)
+    return dates, values
+
+def _assert_same(features, expected):
+    assert set(features) == set(expected)
+    for name in expected:
+        if np.issubdtype(expected[name].dtype, np.floating):
+            # Janelas móveis calculadas sobre o contexto diferem no último bit
+            np.testing.assert_allclose(features[name], expected[name], rtol=1e-12)
+        else:
+            np.testing.assert_array_equal(features[name], expected[name])
+
+def test_dias_novos_viram_uma_parte_e_batem_com_o_calculo_completo(tmp_path):
+    """Cada atualização grava só os dias novos e o resultado é o do cálculo completo."""
+    store = FeatureStore(tmp_path)
+    for days in (60, 61, 75):
+        features = store.update("u1/geral:receita", *_series(days))
+    _assert_same(features, compute_features(*_series(75)))
+
+    directory = store._dir("u1/geral:receita")
+    index = json.loads((directory / "partes.json").read_text())
+    assert index["linhas"] == 75 and len(index["partes"]) == 3
+    with np.load(directory / index["partes"][-1]) as last:
+        assert len(last["y"]) == 14
+
+    # Outra instância lê as partes do disco e continua acrescentando
+    reopened = FeatureStore(tmp_path)
+    _assert_same(reopened.update("u1/geral:receita", *_series(90)), compute_features(*_series(90)))
+
+def test_historico_alterado_e_compactacao_regravam_uma_parte(tmp_path):
+    """Mudança no fim do histórico recalcula tudo; partes demais são compactadas."""
+    store = FeatureStore(tmp_path, max_parts=3)
+    dates, values = _series(60)
+    store.update("chave", dates, values)
+    values = values.copy()
+    values[-1] += 1
+    _assert_same(store.update("chave", dates, values), compute_features(dates, values))
+    directory = store._dir("chave")
+    assert len(json.loads((directory / "partes.json").read_text())["partes"]) == 1
+
+    for days in range(61, 66):
+        dates, values = _series(days)
+        features = store.update("chave", dates, values)
+    _assert_same(features, compute_features(dates, values))
+    index = json.loads((directory / "partes.json").read_text())
+    assert len(index["partes"]) <= 3
+    assert sorted(path.name for path in directory.glob("*.npz")) == sorted(index["partes"])
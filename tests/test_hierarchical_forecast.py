@@ -0,0 +1,73 @@
+"""Coerência das previsões hierárquicas em cada método de reconciliação."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.hierarchical_forecast import RECONCILIATION_METHODS, HierarchicalForecaster, build_hierarchy
+
+CATEGORIES = {"A": [1, 2, 3, 4], "B": [5, 6, 7], "C": [8, 9]}
+
+def sales(days: int = 70) -> pd.DataFrame:
+    """Vendas diárias de 9 produtos em 3 categorias, com volumes e sazonalidade diferentes."""
+    rng = np.random.default_rng(1)
+    rows = []
+    for day, date in enumerate(pd.date_range("2026-06-01", periods=days, freq="D")):
+        for category, products in CATEGORIES.items():
+            for product in products:
+                level = 5 * product * (1.3 if day % 7 in (4, 5) else 1.0)
+                rows.append({"date": date, "product_id": product, "category": category,
+                             "price": 10.0, "quantity": int(rng.poisson(level))})
+    return pd.DataFrame(rows)
+
+def forecaster(method: str) -> HierarchicalForecaster:
+    return HierarchicalForecaster({
+        "horizonte": 14,
+        "segmentos": ["geral", "categoria", "produto"],
+        "hierarquia": {"reconciliacao": method, "limite_segmentos": 100}
+    })
+
+@pytest.mark.parametrize("method", RECONCILIATION_METHODS)
+def test_cada_segmento_pai_e_a_soma_dos_filhos(method):
+    """Geral = soma das categorias e cada categoria = soma dos seus produtos, dia a dia."""
+    result = forecaster(method).forecast(sales())
+    yhat = {key: np.array([point["yhat"] for point in points]) for key, points in result["previsoes"].items()}
+
+    assert result["reconciliacao"] == method
+    assert len(yhat) == 1 + len(CATEGORIES) + sum(len(products) for products in CATEGORIES.values())
+    assert yhat["geral"].sum() > 0
+    np.testing.assert_allclose(yhat["geral"], sum(yhat[f"categoria={c}"] for c in CATEGORIES))
+    for category, products in CATEGORIES.items():
+        np.testing.assert_allclose(yhat[f"categoria={category}"], sum(yhat[f"produto={p}"] for p in products))
+
+def test_mint_preserva_previsoes_ja_coerentes():
+    """Sem diferença entre os níveis ajustados e a soma da base, o MinT não altera a base."""
+    model = forecaster("mint")
+    hierarchy = build_hierarchy(sales(), model.segments)
+    rows = model._fitted_rows(hierarchy)
+    rng = np.random.default_rng(2)
+    base_bottom = rng.uniform(10, 50, (len(hierarchy.bottom), 14))
+    var_bottom = rng.uniform(1, 5, len(hierarchy.bottom))
+    base_rows = np.asarray(hierarchy.summing[rows] @ base_bottom)
+
+    reconciled = model.reconcile(hierarchy, base_bottom, var_bottom, rows, base_rows, rng.uniform(1, 5, len(rows)))
+    np.testing.assert_allclose(reconciled, base_bottom)
+
+    # Geral e uma categoria deslocadas juntas: com variância quase nula nos níveis
+    # ajustados, a base absorve a diferença e passa a somar exatamente esses níveis
+    shifted = base_rows.copy()
+    shifted[:2] += 100
+    reconciled = model.reconcile(hierarchy, base_bottom, var_bottom, rows, shifted, np.full(len(rows), 1e-9))
+    np.testing.assert_allclose(np.asarray(hierarchy.summing[rows] @ reconciled), shifted, rtol=1e-6)
+
+def test_top_down_distribui_a_geral_pelas_proporcoes_recentes():
+    """Cada série da base recebe a sua fração dos últimos `janela_proporcoes` dias."""
+    model = forecaster("top_down")
+    hierarchy = build_hierarchy(sales(), model.segments)
+    rows = model._fitted_rows(hierarchy)
+    total = np.linspace(100, 200, 14)[None, :]
+
+    reconciled = model.reconcile(hierarchy, np.zeros((len(hierarchy.bottom), 14)), np.ones(len(hierarchy.bottom)),
+                                 rows, total, np.ones(1))
+    np.testing.assert_allclose(reconciled.sum(axis=0), total[0])
+    recent = hierarchy.bottom[:, -model.window:].sum(axis=1)
+    np.testing.assert_allclose(reconciled[:, 0], total[0, 0] * recent / recent.sum())
@@ -0,0 +1,75 @@
+"""ALS implícito: fold-in, produtos já comprados e o top-N de todos os usuários."""
+import numpy as np
+import pandas as pd
+
+from models.implicit_als import ImplicitALS, interaction_weights
+
+def sales() -> pd.DataFrame:
+    """Dois grupos de clientes (produtos 0-5 e 6-11) e um cliente que comprou todos os produtos."""
+    rng = np.random.default_rng(5)
+    rows = []
+    for user in range(40):
+        group = user % 2
+        for product in rng.choice(6, size=3, replace=False) + 6 * group:
+            rows.append({"date": pd.Timestamp("2026-09-01") + pd.Timedelta(days=int(rng.integers(0, 60))),
+                         "user_id": f"c{user}", "product_id": int(product), "quantity": int(rng.integers(1, 5))})
+    rows.extend({"date": pd.Timestamp("2026-10-01"), "user_id": "todos", "product_id": product, "quantity": 1}
+                for product in range(12))
+    return pd.DataFrame(rows)
+
+def trained(**options) -> ImplicitALS:
+    return ImplicitALS(**dict({"factors": 6, "iterations": 15, "cg_steps": 6}, **options)).fit(interaction_weights(sales()))
+
+def test_fold_in_resolve_o_mesmo_sistema_da_linha_treinada():
+    """Com os fatores dos produtos fixos, o fold-in de um cliente do treino reproduz a sua linha."""
+    model = trained()
+    # Uma meia-iteração a mais deixa os fatores dos clientes resolvidos contra os produtos finais;
+    # com `passos_cg` igual ao número de fatores o gradiente conjugado chega à solução exata
+    model._conjugate_gradient(model.seen, model.user_factors, model.item_factors)
+    weights = interaction_weights(sales())
+
+    for user in ("c0", "c1", "c7", "todos"):
+        folded = model.fold_in(weights.loc[user])
+        row = model.user_factors[model.users.get_loc(user)]
+        np.testing.assert_allclose(folded, row, rtol=1e-3, atol=1e-3 * np.abs(row).max())
+
+    # Sem produto conhecido o fold-in não tem informação: vetor nulo e nenhuma recomendação
+    unknown = pd.Series([2.0], index=[999])
+    assert not model.fold_in(unknown).any()
+    assert len(model.recommend("novo", 5, unknown)[0]) == 0
+    assert len(model.recommend("novo", 5)[0]) == 0
+
+def test_produtos_comprados_nao_sao_recomendados():
+    """Nem os do treino nem os informados em `product_weights`, em ordem decrescente de nota."""
+    model = trained()
+    weights = interaction_weights(sales())
+    for user in ("c0", "c3"):
+        bought = set(weights.loc[user].index)
+        indices, scores = model.recommend(user, 12)
+        assert len(indices) == 12 - len(bought)
+        assert not bought & set(model.products[indices])
+        assert (np.diff(scores) <= 0).all()
+
+    # Compras posteriores ao treino também saem, para clientes do treino e por fold-in
+    recent = pd.Series([1.0], index=[int(model.products[model.recommend("c0", 1)[0][0]])])
+    assert recent.index[0] not in set(model.products[model.recommend("c0", 12, recent)[0]])
+    new_customer = weights.loc["c0"]
+    indices, _ = model.recommend("novo", 12, new_customer)
+    assert len(indices) == 12 - len(new_customer) and not set(new_customer.index) & set(model.products[indices])
+
+def test_recommend_all_preenche_linhas_sem_recomendacao():
+    """Quem comprou tudo fica com -1/NaN; top-N maior que o catálogo completa com -1."""
+    model = trained()
+    indices, scores = model.recommend_all(15, block_size=7)
+
+    assert indices.shape == scores.shape == (len(model.users), 15)
+    everything = model.users.get_loc("todos")
+    assert (indices[everything] == -1).all() and np.isnan(scores[everything]).all()
+    assert (indices[:, 12:] == -1).all() and np.isnan(scores[:, 12:]).all()
+
+    for user in ("c0", "c5"):
+        row = model.users.get_loc(user)
+        expected, expected_scores = model.recommend(user, 15)
+        valid = indices[row] >= 0
+        np.testing.assert_array_equal(indices[row][valid], expected)
+        np.testing.assert_allclose(scores[row][valid], expected_scores, rtol=1e-6)
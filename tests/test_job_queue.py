@@ -0,0 +1,136 @@
+"""Fila de jobs em SQLite: leases, heartbeats, novas tentativas e chaves únicas."""
+from types import SimpleNamespace
+
+import pytest
+
+from utils import job_queue
+from utils.job_queue import SQLiteJobQueue
+from utils.queue_worker import JOB_PIPELINE, QueueWorker
+
+class Clock:
+    """Relógio manual para os leases e as esperas da fila."""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(job_queue, "time", SimpleNamespace(time=clock.time))
+    return clock
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    queue = SQLiteJobQueue(tmp_path / "fila.db", lease_seconds=300, max_attempts=3, retry_delay=30)
+    yield queue
+    queue.close()
+
+def row(queue, job_id):
+    return queue._connection.execute(
+        "SELECT status, attempts, lease_owner, available_at, last_error, result FROM jobs WHERE id = ?", (job_id,)
+    ).fetchone()
+
+def test_claim_entrega_cada_job_a_um_trabalhador_na_ordem(queue):
+    first = queue.enqueue(JOB_PIPELINE, {"usuario": "u1"})
+    second = queue.enqueue(JOB_PIPELINE, {"usuario": "u2"})
+
+    [job] = queue.claim("w1")
+    assert (job.id, job.payload, job.attempts) == (first, {"usuario": "u1"}, 1)
+    assert [job.id for job in queue.claim("w2", limit=5)] == [second]
+    assert queue.claim("w3") == []
+    assert row(queue, first)[:3] == ("executando", 1, "w1")
+
+def test_heartbeat_renova_o_lease_so_do_dono(queue, clock):
+    job_id = queue.enqueue(JOB_PIPELINE, {})
+    queue.claim("w1")
+    clock.advance(250)
+    assert queue.heartbeat(job_id, "w1")
+    assert not queue.heartbeat(job_id, "w2")
+    clock.advance(250)
+    # 500 s depois do claim, mas só 250 s depois do heartbeat: o lease vale
+    assert queue.claim("w2") == []
+
+def test_lease_vencido_volta_para_outro_trabalhador(queue, clock):
+    job_id = queue.enqueue(JOB_PIPELINE, {})
+    queue.claim("w1")
+    clock.advance(301)
+
+    [job] = queue.claim("w2")
+    assert (job.id, job.attempts) == (job_id, 2)
+    # O trabalhador antigo perdeu o job: não renova nem conclui
+    assert not queue.heartbeat(job_id, "w1")
+    assert not queue.complete(job_id, "w1", {"ok": 1})
+    assert queue.complete(job_id, "w2", {"ok": 2})
+    assert row(queue, job_id)[0] == "concluido" and row(queue, job_id)[5] == '{"ok": 2}'
+
+def test_lease_vencido_na_ultima_tentativa_marca_falha(queue, clock):
+    job_id = queue.enqueue(JOB_PIPELINE, {})
+    for attempt in range(3):
+        assert [job.attempts for job in queue.claim(f"w{attempt}")] == [attempt + 1]
+        clock.advance(301)
+    assert queue.claim("w9") == []
+    assert row(queue, job_id)[0] == "falhou" and row(queue, job_id)[4] == "lease expirado"
+    assert queue.stats() == {"falhou": 1}
+
+def test_fail_repete_com_espera_crescente_ate_esgotar(queue, clock):
+    job_id = queue.enqueue(JOB_PIPELINE, {})
+    for attempt, wait in ((1, 30), (2, 60)):
+        queue.claim("w1")
+        assert queue.fail(job_id, "w1", f"erro {attempt}")
+        assert row(queue, job_id)[0] == "pendente"
+        assert row(queue, job_id)[3] == clock.now + wait
+        clock.advance(wait - 1)
+        assert queue.claim("w1") == []
+        clock.advance(1)
+
+    [job] = queue.claim("w1")
+    assert job.attempts == 3
+    assert not queue.fail(job_id, "w2", "outro dono")
+    assert queue.fail(job_id, "w1", "erro 3")
+    assert row(queue, job_id)[0] == "falhou" and row(queue, job_id)[4] == "erro 3"
+    clock.advance(3600)
+    assert queue.claim("w1") == []
+
+def test_job_key_unica_so_entre_jobs_ativos(queue):
+    job_id = queue.enqueue(JOB_PIPELINE, {}, job_key="u1:2026-10-19")
+    assert queue.enqueue(JOB_PIPELINE, {}, job_key="u1:2026-10-19") is None
+    # Sem chave não há deduplicação
+    assert queue.enqueue(JOB_PIPELINE, {}) != queue.enqueue(JOB_PIPELINE, {})
+
+    queue.claim("w1", limit=1)
+    assert queue.enqueue(JOB_PIPELINE, {}, job_key="u1:2026-10-19") is None
+    queue.complete(job_id, "w1")
+    # Concluído, o job deixa de ocupar a chave
+    assert queue.enqueue(JOB_PIPELINE, {}, job_key="u1:2026-10-19") is not None
+
+class FakeRunner:
+    def __init__(self, status="success"):
+        self.status = status
+        self.calls = []
+
+    def run(self, user_config, until=None, run_date=None):
+        self.calls.append((user_config["usuario_id"], until, run_date))
+        return SimpleNamespace(to_dict=lambda: {"status": self.status, "error": "falha no envio"})
+
+def test_trabalhador_conclui_ou_devolve_o_job(queue):
+    ok = queue.enqueue(JOB_PIPELINE, {"user_config": {"usuario_id": "u1"}, "ate_etapa": "export",
+                                      "data_execucao": "2026-10-19"})
+    runner = FakeRunner()
+    worker = QueueWorker(queue, runner, worker_id="w1", heartbeat_interval=60)
+    assert worker.run_once() == 1
+    assert row(queue, ok)[0] == "concluido"
+    assert runner.calls[0][:2] == ("u1", "export") and str(runner.calls[0][2]) == "2026-10-19"
+
+    failed = queue.enqueue(JOB_PIPELINE, {"user_config": {"usuario_id": "u2"}})
+    unknown = queue.enqueue("desconhecido", {})
+    worker = QueueWorker(queue, FakeRunner(status="error"), worker_id="w1", heartbeat_interval=60)
+    assert worker.run_once() == 1 and worker.run_once() == 1
+    assert row(queue, failed)[0] == "pendente" and row(queue, failed)[4] == "falha no envio"
+    assert row(queue, unknown)[4] == "Tipo de job desconhecido: desconhecido"
+    assert worker.run_once() == 0
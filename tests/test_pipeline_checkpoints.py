@@ -0,0 +1,41 @@
+"""Retomada de etapas a partir dos checkpoints."""
+import pandas as pd
+
+from utils.checkpoint_store import CheckpointStore
+from utils.pipeline_runner import ChartOutput, PipelineResult, PipelineRunner
+
+def test_render_refeito_quando_o_grafico_sumiu_do_cache(tmp_path):
+    """Um checkpoint de gráficos só é retomado se os PNGs ainda existem."""
+    chart = tmp_path / "grafico.png"
+    calls = []
+
+    def render():
+        calls.append(1)
+        chart.write_bytes(b"png")
+        return ChartOutput(charts=[{"tipo": "previsao", "arquivo": str(chart), "legenda": ""}])
+
+    runner = PipelineRunner(None, None, None, None, checkpoint_store=CheckpointStore(tmp_path / "checkpoints"))
+
+    def run(result=None):
+        return runner._checkpointed(result or PipelineResult(user_id="u1"), "2026-10-19_x", True, "render", render)
+
+    run()
+    result = PipelineResult(user_id="u1")
+    run(result)
+    assert len(calls) == 1 and result.resumed == ["render"]
+
+    # A limpeza do cache de artefatos removeu o gráfico: a etapa roda de novo
+    chart.unlink()
+    output = run()
+    assert len(calls) == 2 and chart.exists() and output.charts[0]["arquivo"] == str(chart)
+
+def test_fonte_sql_nova_muda_a_chave_da_execucao(monkeypatch):
+    """Linhas novas na tabela SQL geram outra `run_key`; a mesma tabela mantém a chave."""
+    table = {"linhas": 10, "ultima": "2026-10-18"}
+    monkeypatch.setattr(pd, "read_sql", lambda query, connection: pd.DataFrame([table]))
+    config = {"usuario_id": "u1", "data_sources": [{"type": "sql", "path": "vendas",
+                                                     "connection_string": "postgresql://base"}]}
+    first = CheckpointStore.input_hash(config)
+    assert CheckpointStore.input_hash(config) == first
+    table.update(linhas=11, ultima="2026-10-19")
+    assert CheckpointStore.input_hash(config) != first
@@ -0,0 +1,217 @@
+"""PipelineRunner com agentes de teste e as configurações de usuário do repositório."""
+import json
+import threading
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+
+from models.product_recommendation import ProductRecommendationModel
+from utils.checkpoint_store import CheckpointStore
+from utils.config_registry import load_persona_defaults
+from utils.pipeline_runner import PipelineRunner
+
+CONFIG_DIR = Path(__file__).resolve().parent.parent / "config"
+
+def shipped_config(name: str) -> dict:
+    with open(CONFIG_DIR / "user_configs" / name, encoding="utf-8") as f:
+        return json.load(f)
+
+class IngestionAgent:
+    def __init__(self, data: pd.DataFrame):
+        self.data = data
+        self.calls = 0
+
+    def load_source(self, source_config):
+        self.calls += 1
+        return self.data
+
+    def combine(self, dfs):
+        return pd.concat(dfs, ignore_index=True)
+
+class ModelingAgent:
+    """Lê a configuração como o agente real: sem os padrões da persona, as recomendações dão KeyError."""
+
+    def __init__(self):
+        self.configs = []
+
+    def run_forecasts(self, data, task_input):
+        self.configs.append(task_input)
+        return {"segmentos": task_input["preferencias_analise"]["previsao_vendas"]["segmentos"]}
+
+    def run_recommendations(self, data, task_input):
+        matrix = ProductRecommendationModel({}).prepare_collaborative_data(data, task_input["preferencias_analise"])
+        return [{"product_id": product} for product in matrix.columns[:3]]
+
+    def detect_anomalies(self, data, task_input):
+        return [] if task_input["alertas"]["anomalias"] else None
+
+    def compute_kpis(self, data):
+        return {"linhas": len(data)}
+
+class NLPAgent:
+    def execute(self, task_input):
+        return {"status": "success", "insights": f"Relatório para {task_input['persona']}"}
+
+class DispatchAgent:
+    def __init__(self):
+        self.sent = []
+
+    def execute(self, task_input):
+        self.sent.append(task_input["user_id"])
+        return {"status": "success", "message": "enviado"}
+
+def sales() -> pd.DataFrame:
+    return pd.read_csv(CONFIG_DIR.parent / "data" / "sample_sales_data.csv", parse_dates=["date"])
+
+def make_runner(**options):
+    modeling, dispatch = ModelingAgent(), DispatchAgent()
+    runner = PipelineRunner(IngestionAgent(sales()), modeling, NLPAgent(), dispatch,
+                            persona_defaults=load_persona_defaults(CONFIG_DIR), **options)
+    return runner, modeling, dispatch
+
+def test_configuracao_do_repositorio_recebe_os_padroes_da_persona():
+    """default_user.json não traz preferencias_analise: a modelagem usa as da persona diretor_comercial."""
+    runner, modeling, dispatch = make_runner()
+    result = runner.run(shipped_config("default_user.json"))
+
+    assert result.status == "success", result.error
+    assert dispatch.sent == ["default_user"]
+    config = modeling.configs[0]
+    preferences = config["preferencias_analise"]
+    assert preferences["recomendacao_produtos"]["metodo"] == "hibrido"
+    assert preferences["previsao_vendas"]["segmentos"] == ["geral", "categoria"]
+    # Seções fora da persona vêm do default_config.json; as do usuário prevalecem
+    assert "backtest" in preferences["previsao_vendas"] and config["alertas"]["anomalias"] is True
+    assert config["data_sources"] == shipped_config("default_user.json")["data_sources"]
+    assert len(result.modeling.recommendations) == 3
+
+def test_preferencias_do_usuario_sobrepoem_as_da_persona():
+    config = dict(shipped_config("default_user.json"), persona="analista_de_vendas",
+                  preferencias_analise={"recomendacao_produtos": {"quantidade": 2}})
+    runner, modeling, _ = make_runner()
+    assert runner.run(config).status == "success"
+    recommendation = modeling.configs[0]["preferencias_analise"]["recomendacao_produtos"]
+    assert recommendation["quantidade"] == 2 and recommendation["metodo"] == "als"
+    assert recommendation["periodo_analise"] == 180 and recommendation["als"]["fatores"] == 32
+
+def test_envio_retomado_nao_carrega_a_ingestao(tmp_path):
+    """Com a modelagem salva, só o envio roda e o checkpoint da ingestão nem é lido."""
+    store = CheckpointStore(tmp_path / "checkpoints")
+    runner, _, dispatch = make_runner(checkpoint_store=store)
+    config = shipped_config("default_user.json")
+    assert runner.run(config, until="export", run_date=date(2026, 10, 19)).status == "success"
+
+    loaded = []
+    load = store.load
+    store.load = lambda user_id, run_key, stage: loaded.append(stage) or load(user_id, run_key, stage)
+    result = runner.run(config, run_date=date(2026, 10, 19))
+    assert result.status == "success" and dispatch.sent == ["default_user"]
+    assert "ingest" not in loaded and runner.data_ingestion_agent.calls == 1
+    assert result.resumed == ["model", "generate", "render", "export"]
+
+class BlockingNLPAgent:
+    """Só responde depois que outra etapa do relatório começou: falha se as etapas rodarem em série."""
+
+    def __init__(self, started: threading.Event):
+        self.started = started
+
+    def execute(self, task_input):
+        if not self.started.wait(5):
+            return {"status": "error", "message": "etapa do relatório não rodou junto com o texto"}
+        return {"status": "success", "insights": "ok"}
+
+class ChartRenderer:
+    def __init__(self, started: threading.Event):
+        self.started = started
+
+    def render_many(self, requests):
+        self.started.set()
+        return [None] * len(requests)
+
+def test_graficos_rodam_junto_com_o_texto():
+    started = threading.Event()
+    runner = PipelineRunner(IngestionAgent(sales()), ModelingAgent(), BlockingNLPAgent(started), DispatchAgent(),
+                            chart_renderer=ChartRenderer(started),
+                            persona_defaults=load_persona_defaults(CONFIG_DIR))
+    result = runner.run(shipped_config("default_user.json"))
+    assert result.status == "success", result.error
+    assert {"generate", "render", "export"} <= set(result.timings)
+
+class ReportExporter:
+    def __init__(self, started: threading.Event, path: Path):
+        self.started = started
+        self.path = path
+
+    def export(self, report_data, user_config):
+        self.started.set()
+        self.path.write_bytes(b"planilha")
+        return str(self.path)
+
+def test_planilha_roda_junto_com_o_texto(tmp_path):
+    started = threading.Event()
+    runner = PipelineRunner(IngestionAgent(sales()), ModelingAgent(), BlockingNLPAgent(started), DispatchAgent(),
+                            report_exporter=ReportExporter(started, tmp_path / "relatorio.xlsx"),
+                            persona_defaults=load_persona_defaults(CONFIG_DIR))
+    result = runner.run(shipped_config("default_user.json"))
+    assert result.status == "success", result.error
+    assert [item["arquivo"] for item in result.export.files] == [str(tmp_path / "relatorio.xlsx")]
+
+class FlakyNLPAgent:
+    """Falha nas primeiras `failures` chamadas, como um LLM fora do ar."""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.calls = 0
+
+    def execute(self, task_input):
+        self.calls += 1
+        if self.calls <= self.failures:
+            return {"status": "error", "message": "LLM indisponível"}
+        return {"status": "success", "insights": "ok"}
+
+def flaky_runner(failures: int, **options):
+    nlp, dispatch = FlakyNLPAgent(failures), DispatchAgent()
+    runner = PipelineRunner(IngestionAgent(sales()), ModelingAgent(), nlp, dispatch, retry_delay=0,
+                            persona_defaults=load_persona_defaults(CONFIG_DIR), **options)
+    return runner, nlp, dispatch
+
+def test_nova_tentativa_retoma_das_etapas_salvas(tmp_path):
+    """Com checkpoints, a segunda tentativa não refaz a ingestão nem a modelagem."""
+    runner, nlp, dispatch = flaky_runner(1, max_attempts=3, checkpoint_store=CheckpointStore(tmp_path))
+    result = runner.run(shipped_config("default_user.json"), run_date=date(2026, 10, 19))
+
+    assert result.status == "success" and result.attempts == 2 and result.error is None
+    assert nlp.calls == 2 and dispatch.sent == ["default_user"]
+    assert runner.data_ingestion_agent.calls == 1 and result.resumed == ["model", "render", "export"]
+
+def test_sem_checkpoints_a_nova_tentativa_refaz_tudo():
+    runner, nlp, _ = flaky_runner(1, max_attempts=2)
+    result = runner.run(shipped_config("default_user.json"))
+    assert result.status == "success" and result.attempts == 2
+    assert runner.data_ingestion_agent.calls == 2 and result.resumed == []
+
+def test_erro_da_etapa_chega_ao_resultado_apos_as_tentativas():
+    """PipelineStageError de uma etapa vira status, etapa e mensagem do resultado; o envio não roda."""
+    runner, nlp, dispatch = flaky_runner(5, max_attempts=2)
+    result = runner.run(shipped_config("default_user.json"))
+    assert result.status == "error" and result.attempts == 2 and nlp.calls == 2
+    assert result.failed_stage == "generate" and result.error == "generate: LLM indisponível"
+    assert dispatch.sent == [] and result.to_dict()["status"] == "error"
+
+    # Exceções comuns dos agentes são convertidas em PipelineStageError com a etapa em que ocorreram
+    runner, _, dispatch = flaky_runner(0)
+    runner.modeling_agent.compute_kpis = lambda data: 1 / 0
+    result = runner.run(shipped_config("default_user.json"))
+    assert result.failed_stage == "model" and result.error == "model: division by zero"
+    assert result.generation is None and dispatch.sent == []
+
+def test_until_para_depois_da_etapa_indicada():
+    runner, nlp, dispatch = flaky_runner(0)
+    result = runner.run(shipped_config("default_user.json"), until="model")
+    assert result.status == "success" and result.modeling is not None
+    assert result.generation is None and nlp.calls == 0 and set(result.timings) == {"ingest", "model", "total"}
+
+    result = runner.run(shipped_config("default_user.json"), until="export")
+    assert result.status == "success" and result.export is not None and result.dispatch is None
+    assert nlp.calls == 1 and dispatch.sent == []
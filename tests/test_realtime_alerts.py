@@ -0,0 +1,82 @@
+"""Motor de alertas em tempo real e fonte SQL incremental."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.realtime_alerts import RealtimeAlertEngine, SQLWatermarkSource
+
+def sales(days) -> pd.DataFrame:
+    """Vendas de 5 produtos nos dias informados (índice a partir de 01/09/2026)."""
+    rng = np.random.default_rng(0)
+    rows = []
+    for day in days:
+        date = pd.Timestamp("2026-09-01") + pd.Timedelta(days=day)
+        for product in range(5):
+            rows.append({"date": date, "product_id": product, "category": "A",
+                         "price": 10.0, "quantity": 10 + int(rng.integers(0, 3))})
+    return pd.DataFrame(rows)
+
+def user(user_id="u1", **alertas) -> dict:
+    return {
+        "usuario_id": user_id,
+        "alertas": {"anomalias": True, "tendencias": True, "threshold_anomalia": 0.2, "periodos_minimos": 5, **alertas},
+        "preferencias_analise": {"previsao_vendas": {"segmentos": ["geral", "produto"]}}
+    }
+
+def engine(state_dir, previous=None) -> RealtimeAlertEngine:
+    return RealtimeAlertEngine([user()], state_dir, previous=previous)
+
+def test_linhas_atrasadas_de_dia_anterior_ao_aberto_nao_entram_no_parcial(tmp_path):
+    """Um lote atrasado do dia 19, com o dia 20 aberto, não reabre o dia 19 nem mistura os totais."""
+    history = [day for day in range(21) if day != 19]
+    late, ordered = engine(tmp_path / "atrasado"), engine(tmp_path / "ordenado")
+
+    late.process(sales(history))
+    group = next(iter(late.groups.values()))
+    partial = dict(group["partial"])
+    late.process(sales([19]))
+    assert group["day"] == pd.Timestamp("2026-09-21") and group["partial"] == partial
+    late_alerts = late.process(sales([21]))
+
+    ordered.process(sales(history))
+    ordered_alerts = ordered.process(sales([21]))
+
+    detectors = [next(iter(e.groups.values()))["detector"] for e in (late, ordered)]
+    assert detectors[0].last_date == pd.Timestamp("2026-09-21") == detectors[1].last_date
+    for name in ("mean", "var", "fast_mean", "count"):
+        np.testing.assert_array_equal(getattr(detectors[0], name), getattr(detectors[1], name))
+    assert late_alerts == ordered_alerts
+
+def test_fonte_sql_recusa_tabela_ou_coluna_que_nao_sao_identificadores(tmp_path):
+    SQLWatermarkSource("sqlite://", "vendas.sales", "id", tmp_path / "marca.json")
+    for table, column in [("sales; DROP TABLE sales", "id"), ("sales", "id OR 1=1"), ("sales", "")]:
+        with pytest.raises(ValueError):
+            SQLWatermarkSource("sqlite://", table, column, tmp_path / "marca.json")
+
+def test_usuarios_com_limiares_diferentes_nao_compartilham_o_grupo(tmp_path):
+    """O z e os períodos mínimos de um usuário não valem para outro com os mesmos segmentos."""
+    shared = RealtimeAlertEngine([user("u1"), user("u2"), user("u3", z_anomalia=5.0, periodos_minimos=10)], tmp_path)
+
+    assert sorted(len(group["users"]) for group in shared.groups.values()) == [1, 2]
+    for group in shared.groups.values():
+        for config in group["users"]:
+            assert group["detector"].z_threshold == config["alertas"].get("z_anomalia", 3.0)
+            assert group["detector"].min_periods == config["alertas"]["periodos_minimos"]
+
+def test_motor_recriado_na_recarga_mantem_o_dia_aberto(tmp_path):
+    """As linhas do dia aberto, já consumidas da fonte, continuam no parcial do motor novo."""
+    reloaded, kept = engine(tmp_path / "recarga"), engine(tmp_path / "continuo")
+    for current in (reloaded, kept):
+        current.process(sales(range(21)))
+
+    previous = reloaded
+    reloaded = engine(tmp_path / "recarga", previous=previous)
+    assert previous.groups == {} and previous.close_day() == {}
+    group = next(iter(reloaded.groups.values()))
+    assert group["day"] == pd.Timestamp("2026-09-21")
+    assert group["partial"] == next(iter(kept.groups.values()))["partial"]
+
+    assert reloaded.process(sales([21])) == kept.process(sales([21]))
+    detectors = [next(iter(e.groups.values()))["detector"] for e in (reloaded, kept)]
+    for name in ("mean", "var", "fast_mean", "count"):
+        np.testing.assert_array_equal(getattr(detectors[0], name), getattr(detectors[1], name))
@@ -0,0 +1,71 @@
+"""Tabela de recomendações: índice por sondagem linear, troca de versão e limpeza."""
+import time
+
+import numpy as np
+
+import utils.recommendation_table as recommendation_table
+from utils.recommendation_table import POINTER_FILE, RecommendationTable, _build_index, key_hash, publish_table
+
+PRODUCTS = np.array([101, 102, 103, 104])
+NAMES = ["Fone", "Cabo", "Capa", "Mouse"]
+
+def publish(table_dir, users, offset: float = 0.0, **options):
+    """Cada usuário recebe até 3 produtos; o último usuário só tem um (o resto é -1)."""
+    indices = np.array([[i % 4, (i + 1) % 4, (i + 2) % 4] for i in range(len(users))])
+    indices[-1, 1:] = -1
+    scores = np.tile(np.array([0.9, 0.5, 0.1], dtype=np.float32), (len(users), 1)) + offset
+    return publish_table(table_dir, np.array(users, dtype=object), PRODUCTS, indices, scores, NAMES, **options)
+
+def test_indice_tem_folga_e_encontra_cada_linha():
+    hashes = np.array([key_hash(f"u{i}") for i in range(100)], dtype=np.uint64)
+    slots = _build_index(hashes)
+    assert len(slots) >= 200 and len(slots) & (len(slots) - 1) == 0
+    assert sorted(slots[slots >= 0].tolist()) == list(range(100))
+
+def test_colisoes_de_hash_sao_resolvidas_pela_sondagem(tmp_path, monkeypatch):
+    """Com todos os ids no mesmo hash, cada um ainda chega à sua linha e os ausentes dão []."""
+    monkeypatch.setattr(recommendation_table, "key_hash", lambda user_id: 7)
+    users = ["ana", "bruno", 42, "carla"]
+    publish(tmp_path, users)
+    table = RecommendationTable(tmp_path)
+
+    for i, user in enumerate(users[:-1]):
+        recommendations = table.lookup(user)
+        assert [r["product_id"] for r in recommendations] == PRODUCTS[[i % 4, (i + 1) % 4, (i + 2) % 4]].tolist()
+        assert recommendations[0]["product_name"] == NAMES[i % 4]
+    assert table.lookup("carla") == [{"product_id": 104, "score": np.float32(0.9).item(), "product_name": "Mouse"}]
+    assert table.lookup(42, limit=1) == table.lookup("42", limit=1)
+    assert table.lookup("daniel") == []
+
+def test_tabela_sem_publicacao_e_vazia(tmp_path):
+    assert RecommendationTable(tmp_path).lookup("ana") == []
+    assert RecommendationTable(tmp_path).version is None
+
+def test_leitor_troca_de_versao_pelo_ponteiro(tmp_path):
+    """A nova versão só aparece quando o ponteiro muda; até lá o leitor segue na anterior."""
+    first = publish(tmp_path, ["ana", "bruno"])
+    table = RecommendationTable(tmp_path, check_interval=3600)
+    assert table.version == first.name
+    assert table.lookup("ana")[0]["score"] == np.float32(0.9).item()
+
+    # O relógio dos arquivos pode ser grosseiro: garante outro mtime para o ponteiro
+    time.sleep(0.05)
+    second = publish(tmp_path, ["ana", "bruno"], offset=1.0)
+    assert not (tmp_path / (POINTER_FILE + ".tmp")).exists()
+    # Dentro do intervalo de verificação o leitor continua na versão mapeada, que ainda existe
+    assert table.version == first.name and table.lookup("ana")[0]["score"] == np.float32(0.9).item()
+
+    table._checked_at = 0.0
+    assert table.version == second.name
+    assert table.lookup("ana")[0]["score"] == np.float32(1.9).item()
+
+def test_versoes_alem_de_keep_versions_sao_removidas(tmp_path):
+    published = []
+    for _ in range(4):
+        published.append(publish(tmp_path, ["ana"], keep_versions=2).name)
+    assert sorted(p.name for p in tmp_path.iterdir() if p.is_dir()) == published[-2:]
+    assert RecommendationTable(tmp_path).version == published[-1]
+
+    # keep_versions=0 mantém todas
+    published.append(publish(tmp_path, ["ana"], keep_versions=0).name)
+    assert len([p for p in tmp_path.iterdir() if p.is_dir()]) == 3
@@ -0,0 +1,143 @@
+from typing import Dict, Any, List, Optional, Tuple, Callable
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+def content_key(kind: str, data: Any) -> str:
+    """Chave estável do artefato: tipo e hash do conteúdo serializado."""
+    payload = json.dumps([kind, data], sort_keys=True, ensure_ascii=False, default=str)
+    return f"{kind}_{hashlib.sha1(payload.encode('utf-8')).hexdigest()[:20]}"
+
+def _produce(func: Callable, path: str, *args) -> str:
+    """Gera o arquivo em um temporário e o move para o destino. Executada nos processos do pool."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        func(tmp_path, *args)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+class ArtifactCache:
+    """Arquivos de relatório (gráficos, planilhas) gerados em um pool de processos e reaproveitados.
+
+    Cada arquivo é identificado pelo nome, derivado do conteúdo
+    (`content_key`), e gerado uma única vez: os demais destinatários, nesta
+    ou em execuções seguintes, recebem o mesmo arquivo. Pedidos simultâneos
+    do mesmo nome compartilham o mesmo job do pool. Arquivos não usados há
+    mais de `max_age_hours` são removidos e, se o cache passar de
+    `max_size_mb`, os menos usados recentemente saem primeiro.
+    Com `max_workers=0`, os arquivos são gerados na própria thread.
+    """
+
+    def __init__(self, cache_dir: Path, max_workers: Optional[int] = None, max_age_hours: float = 24,
+                 max_size_mb: float = 200, prune_interval: float = 300):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_workers = max_workers
+        self.max_age = max_age_hours * 3600
+        self.max_size = max_size_mb * 1024 * 1024
+        self.prune_interval = prune_interval
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._last_prune = 0.0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # 'spawn' evita herdar as threads do agendador em um fork
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers or None,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def submit(self, name: str, func: Callable, *args) -> Future:
+        """Future com o caminho do arquivo; `func(caminho, *args)` só roda se ele não estiver no cache."""
+        path = str(self.cache_dir / name)
+        with self._lock:
+            future = self._inflight.get(name)
+            if future is not None:
+                return future
+            if os.path.exists(path):
+                # O horário de modificação marca o último uso para a remoção por idade e tamanho
+                os.utime(path)
+                future = Future()
+                future.set_result(path)
+                return future
+            if self.max_workers == 0:
+                future = Future()
+            else:
+                try:
+                    future = self._pool().submit(_produce, func, path, *args)
+                except BrokenProcessPool:
+                    logger.error("Pool de artefatos quebrado, recriando")
+                    self._executor.shutdown(wait=False)
+                    self._executor = None
+                    future = self._pool().submit(_produce, func, path, *args)
+            self._inflight[name] = future
+        if self.max_workers == 0:
+            try:
+                future.set_result(_produce(func, path, *args))
+            except Exception as e:
+                future.set_exception(e)
+        future.add_done_callback(lambda _: self._done(name))
+        return future
+
+    def _done(self, name: str) -> None:
+        with self._lock:
+            self._inflight.pop(name, None)
+
+    def get_many(self, requests: List[Tuple[str, Callable, tuple]]) -> List[Optional[str]]:
+        """Caminhos dos arquivos (nome, função, argumentos), na ordem dos pedidos; None para os que falharam."""
+        futures = [self.submit(name, func, *args) for name, func, args in requests]
+        paths = []
+        for (name, _, _), future in zip(requests, futures):
+            try:
+                paths.append(future.result())
+            except Exception as e:
+                logger.error(f"Erro ao gerar {name}: {str(e)}")
+                paths.append(None)
+        if time.time() - self._last_prune > self.prune_interval:
+            self.prune()
+        return paths
+
+    def prune(self) -> int:
+        """Remove arquivos vencidos e, acima do limite de tamanho, os menos usados; retorna quantos."""
+        self._last_prune = time.time()
+        cutoff = self._last_prune - self.max_age
+        files = []
+        for path in self.cache_dir.iterdir():
+            if path.suffix == ".tmp":
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for mtime, size, path in files:
+            if mtime >= cutoff and total <= self.max_size:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
@@ -0,0 +1,257 @@
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+from pathlib import Path
+import json
+import logging
+import re
+import threading
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_FIELDS = ('product_name', 'category', 'brand', 'price', 'stock')
+STORE_FIELDS = ('name', 'region', 'city', 'manager')
+
+def numeric_id(value: Any) -> Optional[int]:
+    """Parte numérica de um id do catálogo ('P001' -> 1), como usada nas tabelas de vendas."""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    match = re.search(r'(\d+)$', str(value))
+    return int(match.group(1)) if match else None
+
+class ProductRecord:
+    """Produto do catálogo."""
+
+    __slots__ = ('product_id', 'product_name', 'category', 'brand', 'description',
+                 'specifications', 'price', 'stock', 'launch_date')
+
+    def __init__(self, data: Dict[str, Any]):
+        for name in self.__slots__:
+            setattr(self, name, data.get(name))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+class StoreRecord:
+    """Loja do cadastro de lojas."""
+
+    __slots__ = ('store_id', 'name', 'region', 'city', 'address', 'manager',
+                 'opening_date', 'size', 'features', 'performance')
+
+    def __init__(self, data: Dict[str, Any]):
+        for name in self.__slots__:
+            setattr(self, name, data.get(name))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+class _Directory:
+    """Registros de um arquivo com índices por chave e por atributo e colunas em arrays.
+
+    `index`/`lookup` mapeiam cada forma aceita da chave (ex.: 'P001' e 1)
+    para a linha do registro; `columns` guarda um array numpy por atributo, na mesma
+    ordem de `records`, para enriquecer tabelas inteiras com um `take`.
+    """
+
+    def __init__(self, records: List[Any], key: str, fields: Iterable[str], groups: Iterable[str]):
+        self.records = records
+        self.key = key
+        aliases, rows = [], []
+        for row, record in enumerate(records):
+            value = getattr(record, key)
+            aliases.append(value)
+            rows.append(row)
+            number = numeric_id(value)
+            if number is not None and number != value:
+                aliases.append(number)
+                rows.append(row)
+        self.index = pd.Index(aliases, dtype=object)
+        self.rows = np.array(rows, dtype=np.intp)
+        self.lookup = dict(zip(aliases, rows))
+        self.columns = {field: np.array([getattr(r, field) for r in records], dtype=object) for field in fields}
+        self.groups: Dict[str, Dict[Any, List[int]]] = {}
+        for group in groups:
+            index = self.groups[group] = {}
+            for row, record in enumerate(records):
+                index.setdefault(getattr(record, group), []).append(row)
+
+    @staticmethod
+    def _normalize(value: Any) -> Any:
+        # Ids numéricos lidos como texto ('1') também encontram o registro 'P001'
+        return int(value) if isinstance(value, str) and value.isdigit() else value
+
+    def get(self, value: Any) -> Optional[Any]:
+        row = self.lookup.get(self._normalize(value))
+        return self.records[row] if row is not None else None
+
+    def by(self, group: str, value: Any) -> List[Any]:
+        return [self.records[row] for row in self.groups[group].get(value, [])]
+
+    def row_positions(self, values: pd.Series) -> np.ndarray:
+        """Linha do registro para cada valor (-1 quando ausente), resolvendo só os valores distintos."""
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.cat.codes.to_numpy()
+            uniques = values.cat.categories
+        else:
+            codes, uniques = pd.factorize(values)
+        found = self.index.get_indexer(pd.Index([self._normalize(u) for u in uniques], dtype=object))
+        unique_rows = np.full(len(found), -1, dtype=np.intp)
+        unique_rows[found >= 0] = self.rows[found[found >= 0]]
+        return np.where(codes >= 0, unique_rows[codes], -1)
+
+    def _column(self, field: str) -> np.ndarray:
+        if field not in self.columns:
+            # Atributos fora de `fields` (ex.: 'description') viram coluna no primeiro uso
+            column = np.empty(len(self.records), dtype=object)
+            for row, record in enumerate(self.records):
+                column[row] = getattr(record, field)
+            self.columns[field] = column
+        return self.columns[field]
+
+    def take(self, values: pd.Series, fields: Iterable[str]) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Máscara dos valores encontrados e, por atributo, o valor do registro de cada um (None se ausente)."""
+        positions = self.row_positions(values)
+        found = positions >= 0
+        columns = {}
+        for field in fields:
+            # Preenche só as linhas encontradas: com o catálogo vazio não há linha -1 para indexar
+            column = np.full(len(positions), None, dtype=object)
+            column[found] = self._column(field)[positions[found]]
+            columns[field] = column
+        return found, columns
+
+    def enrich(self, df: pd.DataFrame, column: str, fields: Iterable[str], prefix: str = '') -> pd.DataFrame:
+        _, columns = self.take(df[column], fields)
+        return df.assign(**{f"{prefix}{field}": values for field, values in columns.items()})
+
+class CatalogService:
+    """Catálogo de produtos e cadastro de lojas carregados uma vez e indexados em memória.
+
+    Lê `product_catalog.json` e `stores.json` do diretório de dados e monta
+    índices por product_id, category, brand, store_id e region. Consultas
+    por id são O(1); `enrich_products`/`enrich_stores` acrescentam atributos
+    a um DataFrame inteiro sem merge, e `enrich_records` faz o mesmo para
+    listas de dicionários (recomendações, alertas). Os arquivos são relidos
+    quando o mtime muda.
+    """
+
+    def __init__(self, data_dir: Path = Path("data")):
+        self.catalog_path = Path(data_dir) / "product_catalog.json"
+        self.stores_path = Path(data_dir) / "stores.json"
+        self._lock = threading.Lock()
+        self._mtimes = (None, None)
+        self._products: Optional[_Directory] = None
+        self._stores: Optional[_Directory] = None
+
+    @staticmethod
+    def _mtime(path: Path) -> Optional[float]:
+        try:
+            return path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _read(path: Path, section: str) -> List[Dict[str, Any]]:
+        if not path.exists():
+            return []
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f).get(section, [])
+        except Exception as e:
+            logger.error(f"Erro ao carregar {path}: {str(e)}")
+            return []
+
+    def _refresh(self) -> None:
+        """Recarrega os arquivos alterados desde a última leitura."""
+        mtimes = (self._mtime(self.catalog_path), self._mtime(self.stores_path))
+        if mtimes == self._mtimes and self._products is not None:
+            return
+        with self._lock:
+            if mtimes == self._mtimes and self._products is not None:
+                return
+            if self._products is None or mtimes[0] != self._mtimes[0]:
+                products = [ProductRecord(p) for p in self._read(self.catalog_path, 'products')]
+                self._products = _Directory(products, 'product_id', PRODUCT_FIELDS, ('category', 'brand'))
+            if self._stores is None or mtimes[1] != self._mtimes[1]:
+                stores = [StoreRecord(s) for s in self._read(self.stores_path, 'stores')]
+                self._stores = _Directory(stores, 'store_id', STORE_FIELDS, ('region',))
+            self._mtimes = mtimes
+            logger.info(f"Catálogo carregado: {len(self._products.records)} produtos, {len(self._stores.records)} lojas")
+
+    @property
+    def products(self) -> _Directory:
+        self._refresh()
+        return self._products
+
+    @property
+    def stores(self) -> _Directory:
+        self._refresh()
+        return self._stores
+
+    def product_ids(self) -> List[Any]:
+        """Ids do catálogo na ordem do arquivo (dicionário compartilhado da tabela de vendas)."""
+        return [record.product_id for record in self.products.records]
+
+    def product(self, product_id: Any) -> Optional[ProductRecord]:
+        return self.products.get(product_id)
+
+    def store(self, store_id: Any) -> Optional[StoreRecord]:
+        return self.stores.get(store_id)
+
+    def products_by_category(self, category: str) -> List[ProductRecord]:
+        return self.products.by('category', category)
+
+    def products_by_brand(self, brand: str) -> List[ProductRecord]:
+        return self.products.by('brand', brand)
+
+    def stores_by_region(self, region: str) -> List[StoreRecord]:
+        return self.stores.by('region', region)
+
+    def enrich_products(self, df: pd.DataFrame, column: str = 'product_id',
+                        fields: Iterable[str] = PRODUCT_FIELDS, prefix: str = 'catalog_') -> pd.DataFrame:
+        """Acrescenta os atributos do catálogo às linhas de `df` (None quando o produto não existe)."""
+        return self.products.enrich(df, column, fields, prefix)
+
+    def enrich_stores(self, df: pd.DataFrame, column: str = 'store_id',
+                      fields: Iterable[str] = STORE_FIELDS, prefix: str = 'store_') -> pd.DataFrame:
+        """Acrescenta os atributos da loja às linhas de `df` (None quando a loja não existe)."""
+        return self.stores.enrich(df, column, fields, prefix)
+
+    @staticmethod
+    def _fill(directory: _Directory, records: List[Dict[str, Any]], key: str, fields: Dict[str, str]) -> None:
+        """`setdefault` de cada campo (nome no dicionário -> atributo) nos dicionários cujo `key` está no cadastro.
+
+        Os ids são resolvidos de uma vez, como em `enrich_products`.
+        """
+        if not records:
+            return
+        found, columns = directory.take(pd.Series([record.get(key) for record in records], dtype=object), fields.values())
+        for row in np.flatnonzero(found):
+            for name, field in fields.items():
+                records[row].setdefault(name, columns[field][row])
+
+    def enrich_records(self, records: List[Dict[str, Any]], key: str = 'product_id',
+                       fields: Iterable[str] = ('product_name', 'category', 'brand')) -> List[Dict[str, Any]]:
+        """Completa dicionários com os atributos do produto ou da loja indicada em `key`."""
+        directory = self.stores if key == 'store_id' else self.products
+        self._fill(directory, [record for record in records if key in record], key, {field: field for field in fields})
+        return records
+
+    def enrich_alerts(self, alerts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Acrescenta nome e atributos aos alertas dos segmentos 'produto' e 'loja'."""
+        self._fill(self.products, [alert for alert in alerts if alert.get('segmento') == 'produto'], 'valor',
+                   {'nome': 'product_name', 'categoria': 'category', 'marca': 'brand'})
+        self._fill(self.stores, [alert for alert in alerts if alert.get('segmento') == 'loja'], 'valor',
+                   {'nome': 'name', 'regiao': 'region', 'cidade': 'city'})
+        return alerts
+
+_services: Dict[str, CatalogService] = {}
+_services_lock = threading.Lock()
+
+def get_catalog(data_dir: Path = Path("data")) -> CatalogService:
+    """Instância compartilhada do catálogo para o diretório de dados."""
+    key = str(Path(data_dir).resolve())
+    with _services_lock:
+        if key not in _services:
+            _services[key] = CatalogService(data_dir)
+        return _services[key]
@@ -0,0 +1,101 @@
+from typing import Dict, Any, List, Optional, Tuple
+from pathlib import Path
+
+from utils.artifact_cache import ArtifactCache, content_key
+
+# Conteúdo do relatório (tipo_conteudo) -> gráfico que o acompanha
+CONTENT_CHARTS = {
+    "previsoes": "previsao",
+    "top_produtos": "top_produtos"
+}
+
+FORECAST_KEYS = {"prophet": "prophet", "xgb": "xgboost"}
+
+def chart_requests(report_data: Dict[str, Any], user_config: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+    """Gráficos do relatório do usuário como pares (tipo, dados).
+
+    Os dados contêm apenas o que aparece na imagem, arredondado: usuários
+    com as mesmas fontes recebem dados idênticos e, portanto, a mesma chave
+    de cache.
+    """
+    contents = user_config.get("tipo_conteudo", list(CONTENT_CHARTS))
+    requests = []
+    if "previsoes" in contents:
+        persona = user_config.get("preferencias_analise", {}).get("previsao_vendas", {})
+        forecasts = report_data.get("previsoes", {})
+        preferred = FORECAST_KEYS.get(persona.get("metodo"), "prophet")
+        for name in (preferred, *FORECAST_KEYS.values()):
+            records = forecasts.get(name, {}).get("forecast")
+            if records:
+                requests.append(("previsao", {
+                    "modelo": name,
+                    "ds": [str(record["ds"])[:10] for record in records],
+                    "yhat": [round(float(record["yhat"]), 2) for record in records],
+                    "yhat_lower": [round(float(record.get("yhat_lower", record["yhat"])), 2) for record in records],
+                    "yhat_upper": [round(float(record.get("yhat_upper", record["yhat"])), 2) for record in records]
+                }))
+                break
+    if "top_produtos" in contents:
+        products = report_data.get("kpis", {}).get("top_produtos")
+        if products:
+            requests.append(("top_produtos", {
+                "produtos": [str(product.get("product_name") or product["product_id"]) for product in products],
+                "receita": [round(float(product["receita"]), 2) for product in products]
+            }))
+    return requests
+
+def render_chart(path: str, chart_type: str, data: Dict[str, Any]) -> None:
+    """Desenha o gráfico em PNG no caminho indicado. Executada nos processos do pool.
+
+    Usa `Figure` com o canvas Agg diretamente, sem pyplot: não depende de
+    display nem de estado global, e pode rodar em threads.
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import matplotlib.dates as mdates
+    from datetime import date
+
+    figure = Figure(figsize=(8, 4.5), dpi=100)
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    if chart_type == "previsao":
+        dates = [date.fromisoformat(ds) for ds in data["ds"]]
+        ax.fill_between(dates, data["yhat_lower"], data["yhat_upper"], alpha=0.25, label="Intervalo")
+        ax.plot(dates, data["yhat"], linewidth=2, label="Previsão")
+        ax.set_title(f"Previsão de receita - próximos {len(dates)} dias")
+        ax.xaxis.set_major_formatter(mdates.DateFormatter("%d/%m"))
+        ax.legend(loc="upper left")
+    elif chart_type == "top_produtos":
+        names = [name if len(name) <= 30 else name[:29] + "…" for name in data["produtos"]]
+        ax.barh(names[::-1], data["receita"][::-1])
+        ax.set_title("Produtos com maior receita")
+        ax.set_xlabel("Receita")
+    else:
+        raise ValueError(f"Tipo de gráfico desconhecido: {chart_type}")
+    ax.grid(alpha=0.3)
+    figure.tight_layout()
+    figure.savefig(path, format="png")
+
+class ChartRenderer(ArtifactCache):
+    """Gráficos dos relatórios, desenhados uma vez por (tipo, dados) e compartilhados entre usuários."""
+
+    def __init__(self, cache_dir: Path = Path("data") / "state" / "graficos", **options):
+        super().__init__(cache_dir, **options)
+
+    def render_many(self, requests: List[Tuple[str, Dict[str, Any]]]) -> List[Optional[str]]:
+        """Caminhos dos PNGs, na ordem dos pedidos (None para os que falharam)."""
+        return self.get_many([
+            (f"{content_key(chart_type, data)}.png", render_chart, (chart_type, data))
+            for chart_type, data in requests
+        ])
+
+def build_chart_renderer(settings: Dict[str, Any]) -> Optional[ChartRenderer]:
+    """Cria o renderizador a partir da seção 'graficos' do system_config.json (None se desativado)."""
+    if not settings.get("ativo", True):
+        return None
+    return ChartRenderer(
+        Path(settings.get("diretorio_cache", "data/state/graficos")),
+        max_workers=settings.get("processos"),
+        max_age_hours=settings.get("validade_horas", 24),
+        max_size_mb=settings.get("tamanho_maximo_mb", 200)
+    )
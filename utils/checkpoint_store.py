@@ -0,0 +1,120 @@
+from typing import Dict, Any, List, Optional
+from datetime import date, timedelta
+from pathlib import Path
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import threading
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("ingest", "model", "generate", "render", "export", "dispatch")
+
+class CheckpointStore:
+    """Saída de cada etapa do pipeline salva em disco por usuário, dia e entrada.
+
+    Cada execução é identificada por `run_key`: a data do dia e o hash da
+    configuração do usuário junto com a assinatura das fontes de dados
+    (tamanho e data de modificação dos arquivos; número de linhas e maior
+    data das tabelas SQL). Uma nova tentativa com a mesma chave
+    carrega as etapas já concluídas e só executa as que faltam; mudar a
+    configuração ou os arquivos gera outra chave e recalcula tudo.
+    Execuções com mais de `retention_days` dias são removidas.
+    """
+
+    def __init__(self, checkpoint_dir: Path = Path("data") / "state" / "checkpoints", retention_days: int = 7):
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def source_signature(source: Dict[str, Any]) -> Optional[List[Any]]:
+        """Assinatura barata do conteúdo de uma fonte: tamanho e mtime do arquivo, ou marca d'água da tabela.
+
+        Fontes SQL são lidas de `sales` (como em `DataIngestionAgent.load_data`);
+        a assinatura é o número de linhas e a maior `date`. Sem assinatura
+        (arquivo ausente, banco inacessível) retorna None.
+        """
+        if source.get("type") == "sql" and source.get("connection_string"):
+            import pandas as pd
+
+            try:
+                row = pd.read_sql("SELECT COUNT(*) AS linhas, MAX(date) AS ultima FROM sales",
+                                  source["connection_string"]).iloc[0]
+                return ["sql", int(row["linhas"]), str(row["ultima"])]
+            except Exception as e:
+                logger.warning(f"Marca d'água indisponível para a fonte SQL: {str(e)}")
+                return None
+        path = source.get("path")
+        try:
+            stat = os.stat(path) if path else None
+        except OSError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns] if stat else None
+
+    @classmethod
+    def input_hash(cls, user_config: Dict[str, Any]) -> str:
+        """Hash da configuração e do conteúdo das fontes de dados do usuário."""
+        sources = [cls.source_signature(source) for source in user_config.get("data_sources", [])]
+        payload = json.dumps([user_config, sources], sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+    def run_key(self, user_config: Dict[str, Any], run_date: Optional[date] = None) -> str:
+        return f"{(run_date or date.today()).isoformat()}_{self.input_hash(user_config)}"
+
+    def _dir(self, user_id: str, run_key: str) -> Path:
+        return self.checkpoint_dir / user_id / run_key
+
+    def load(self, user_id: str, run_key: str, stage: str) -> Optional[Any]:
+        """Saída salva da etapa ou None se ela ainda não foi concluída."""
+        path = self._dir(user_id, run_key) / f"{stage}.pkl"
+        if not path.exists():
+            return None
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            logger.error(f"Erro ao ler checkpoint {stage} de {user_id}: {str(e)}")
+            return None
+
+    def save(self, user_id: str, run_key: str, stage: str, output: Any) -> None:
+        """Grava a saída da etapa de forma atômica."""
+        run_dir = self._dir(user_id, run_key)
+        path = run_dir / f"{stage}.pkl"
+        # Nome temporário único por processo e thread: trabalhadores que retomam a mesma execução não se misturam
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            run_dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                pickle.dump(output, f, protocol=pickle.HIGHEST_PROTOCOL)
+            tmp_path.replace(path)
+        except Exception as e:
+            logger.error(f"Erro ao gravar checkpoint {stage} de {user_id}: {str(e)}")
+            tmp_path.unlink(missing_ok=True)
+
+    def completed(self, user_id: str, run_key: str) -> List[str]:
+        """Etapas concluídas da execução, na ordem do pipeline."""
+        run_dir = self._dir(user_id, run_key)
+        return [stage for stage in STAGES if (run_dir / f"{stage}.pkl").exists()]
+
+    def clear(self, user_id: str, run_key: str) -> None:
+        shutil.rmtree(self._dir(user_id, run_key), ignore_errors=True)
+
+    def prune(self, user_id: Optional[str] = None) -> int:
+        """Remove execuções mais antigas que o período de retenção e retorna quantas."""
+        cutoff = (date.today() - timedelta(days=self.retention_days)).isoformat()
+        users = [self.checkpoint_dir / user_id] if user_id else [p for p in self.checkpoint_dir.iterdir() if p.is_dir()]
+        removed = 0
+        with self._lock:
+            for user_dir in users:
+                if not user_dir.is_dir():
+                    continue
+                for run_dir in user_dir.iterdir():
+                    if run_dir.name[:10] < cutoff:
+                        shutil.rmtree(run_dir, ignore_errors=True)
+                        removed += 1
+        return removed
@@ -0,0 +1,210 @@
+from typing import Dict, Any, List, Optional, Callable, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Seções de default_config.json que valem como padrão para a análise de todos os usuários
+DEFAULT_SECTIONS = ("preferencias_analise", "alertas")
+
+def deep_merge(base: Dict[str, Any], overrides: Dict[str, Any]) -> Dict[str, Any]:
+    """Cópia de `base` com `overrides` aplicado: dicionários são mesclados por chave, o resto é substituído."""
+    merged = dict(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+def load_persona_defaults(config_dir: Path = Path("config")) -> Dict[str, Any]:
+    """Conteúdo de `user_configs/default_config.json` ({} se ausente ou inválido)."""
+    path = Path(config_dir) / "user_configs" / "default_config.json"
+    if not path.exists():
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"Erro ao carregar padrões de persona de {path}: {str(e)}")
+        return {}
+
+def effective_config(user_config: Dict[str, Any], defaults: Dict[str, Any]) -> Dict[str, Any]:
+    """Configuração usada pelo pipeline: padrões gerais, depois os da persona, depois a do usuário.
+
+    As seções `DEFAULT_SECTIONS` de `defaults` (o default_config.json) são a
+    base; `configuracoes_persona[persona]` (sem `insights_disponiveis`)
+    sobrepõe `preferencias_analise`; por fim, tudo o que o usuário definiu
+    prevalece. Assim uma configuração só com os campos obrigatórios tem
+    previsão, recomendação e alertas completos.
+    """
+    base = {section: defaults[section] for section in DEFAULT_SECTIONS if section in defaults}
+    persona = defaults.get("configuracoes_persona", {}).get(user_config.get("persona"), {})
+    preferences = {key: value for key, value in persona.items() if key != "insights_disponiveis"}
+    if preferences:
+        base = deep_merge(base, {"preferencias_analise": preferences})
+    return deep_merge(base, user_config)
+
+@dataclass
+class ConfigChanges:
+    """Usuários afetados por uma releitura do diretório de configurações."""
+    added: List[Dict[str, Any]] = field(default_factory=list)
+    updated: List[Dict[str, Any]] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.updated or self.removed)
+
+class ConfigRegistry:
+    """Configurações de usuário validadas e mantidas em memória por `usuario_id`.
+
+    O validador de `rules_schema.json` é compilado uma vez (e de novo apenas
+    se o schema mudar). Na carga inicial os arquivos `user_*.json` são lidos
+    e validados em paralelo; depois, `refresh` relê só os arquivos cujo mtime
+    mudou e informa quais usuários foram adicionados, alterados ou removidos.
+    Um arquivo inválido é ignorado e mantém a última versão válida.
+    """
+
+    def __init__(self, config_dir: Path = Path("config"), max_workers: int = 8):
+        self.config_dir = Path(config_dir)
+        self.schema_path = self.config_dir / "rules_schema.json"
+        self.user_configs_dir = self.config_dir / "user_configs"
+        self.max_workers = max_workers
+        self._lock = threading.RLock()
+        self._validator = None
+        self._schema_mtime = None
+        self._configs: Dict[str, Dict[str, Any]] = {}
+        # arquivo -> (mtime, usuario_id) da última versão válida
+        self._files: Dict[Path, Tuple[float, Optional[str]]] = {}
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _compile_validator(self) -> bool:
+        """Compila o validador se o schema mudou; retorna True quando recompilado."""
+        mtime = self.schema_path.stat().st_mtime
+        if self._validator is not None and mtime == self._schema_mtime:
+            return False
+        from jsonschema.validators import validator_for
+
+        with open(self.schema_path, 'r', encoding='utf-8') as f:
+            schema = json.load(f)
+        validator_class = validator_for(schema)
+        validator_class.check_schema(schema)
+        self._validator = validator_class(schema)
+        self._schema_mtime = mtime
+        return True
+
+    def _read(self, path: Path) -> Tuple[Path, float, Optional[Dict[str, Any]]]:
+        """Lê e valida um arquivo; retorna a configuração ou None se inválida."""
+        mtime = path.stat().st_mtime
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            errors = sorted(self._validator.iter_errors(config), key=lambda e: list(e.path))
+            if errors:
+                location = "/".join(str(p) for p in errors[0].path) or "raiz"
+                raise ValueError(f"{location}: {errors[0].message}")
+            if 'usuario_id' not in config:
+                raise ValueError("usuario_id ausente")
+            return path, mtime, config
+        except Exception as e:
+            logger.error(f"Configuração inválida em {path.name}: {str(e)}")
+            return path, mtime, None
+
+    def _read_all(self, paths: List[Path]) -> List[Tuple[Path, float, Optional[Dict[str, Any]]]]:
+        if len(paths) <= 1:
+            return [self._read(path) for path in paths]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(paths))) as executor:
+            return list(executor.map(self._read, paths))
+
+    def load_all(self) -> List[Dict[str, Any]]:
+        """Carga completa: compila o validador e lê todas as configurações."""
+        with self._lock:
+            self._compile_validator()
+            self._configs.clear()
+            self._files.clear()
+            for path, mtime, config in self._read_all(sorted(self.user_configs_dir.glob("user_*.json"))):
+                self._store(path, mtime, config)
+            logger.info(f"{len(self._configs)} configurações de usuário carregadas")
+            return self.all()
+
+    def _store(self, path: Path, mtime: float, config: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Registra a versão lida de um arquivo; inválida mantém a anterior."""
+        previous_id = self._files.get(path, (None, None))[1]
+        if config is None:
+            self._files[path] = (mtime, previous_id)
+            return None
+        user_id = config['usuario_id']
+        if previous_id is not None and previous_id != user_id:
+            self._configs.pop(previous_id, None)
+        self._configs[user_id] = config
+        self._files[path] = (mtime, user_id)
+        return user_id
+
+    def refresh(self) -> ConfigChanges:
+        """Relê apenas os arquivos novos, alterados ou removidos desde a última leitura."""
+        changes = ConfigChanges()
+        with self._lock:
+            if self._compile_validator():
+                # Schema novo: todas as configurações precisam ser revalidadas
+                stale = dict(self._files)
+                self._files = {path: (None, user_id) for path, (_, user_id) in stale.items()}
+
+            current = {path: path.stat().st_mtime for path in self.user_configs_dir.glob("user_*.json")}
+            changed = [path for path, mtime in current.items() if self._files.get(path, (None,))[0] != mtime]
+
+            for path in set(self._files) - set(current):
+                _, user_id = self._files.pop(path)
+                if user_id is not None and self._configs.pop(user_id, None) is not None:
+                    changes.removed.append(user_id)
+
+            for path, mtime, config in self._read_all(sorted(changed)):
+                previous = self._configs.get(config['usuario_id']) if config else None
+                previous_id = self._files.get(path, (None, None))[1]
+                user_id = self._store(path, mtime, config)
+                if user_id is not None and previous_id not in (None, user_id):
+                    changes.removed.append(previous_id)
+                if user_id is None or previous == config:
+                    continue
+                (changes.updated if previous is not None else changes.added).append(config)
+
+        if changes:
+            logger.info(
+                f"Configurações atualizadas: {len(changes.added)} novas, "
+                f"{len(changes.updated)} alteradas, {len(changes.removed)} removidas"
+            )
+        return changes
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return self._configs.get(str(user_id))
+
+    def all(self) -> List[Dict[str, Any]]:
+        return list(self._configs.values())
+
+    def __len__(self) -> int:
+        return len(self._configs)
+
+    def _watch(self, interval: float, on_change: Callable[[ConfigChanges], None]) -> None:
+        while not self._stop_event.wait(interval):
+            try:
+                changes = self.refresh()
+                if changes:
+                    on_change(changes)
+            except Exception as e:
+                logger.error(f"Erro ao monitorar configurações: {str(e)}")
+
+    def watch(self, on_change: Callable[[ConfigChanges], None], interval: float = 10.0) -> None:
+        """Verifica o diretório periodicamente em uma thread e chama `on_change` com as alterações."""
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._watch, args=(interval, on_change), name="config-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Interrompe o monitoramento do diretório."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
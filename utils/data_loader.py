@@ -2,36 +2,31 @@ from typing import Dict, List, Any
 import json
 from pathlib import Path
 import pandas as pd
-import jsonschema
 from dotenv import load_dotenv
 import os
 
 def load_user_configs(config_dir: Path) -> List[Dict[str, Any]]:
     """Load all user configurations from the config directory."""
     try:
-        # Load schema
-        schema_path = config_dir / "rules_schema.json"
-        with open(schema_path, 'r', encoding='utf-8') as f:
-            schema = json.load(f)
-            
-        # Load user configs
-        user_configs = []
-        user_configs_dir = config_dir / "user_configs"
-        
-        for config_file in user_configs_dir.glob("user_*.json"):
-            with open(config_file, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                
-                # Validate against schema
-                jsonschema.validate(instance=config, schema=schema)
-                user_configs.append(config)
-                
-        return user_configs
+        # The registry compiles the schema validator once and validates the files in parallel
+        from utils.config_registry import ConfigRegistry
+        return ConfigRegistry(config_dir).load_all()
         
     except Exception as e:
         print(f"Error loading user configurations: {str(e)}")
         return []
         
+def load_system_config(config_dir: Path) -> Dict[str, Any]:
+    """Load system-wide settings from config/system_config.json."""
+    try:
+        with open(config_dir / "system_config.json", 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Error loading system configuration: {str(e)}")
+        return {}
+        
 def load_data_file(file_path: str) -> pd.DataFrame:
     """Load data from a file based on its extension."""
     try:
@@ -0,0 +1,130 @@
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, time as dtime, timedelta
+from pathlib import Path
+import heapq
+import json
+import logging
+import threading
+
+import numpy as np
+import pytz
+
+logger = logging.getLogger(__name__)
+
+# Etapas calculadas antes do horário preferido; o envio fica para o horário exato
+PREPARATION_STAGES = ("ingest", "model", "generate", "render", "export")
+
+DEFAULT_TIMEZONE = "America/Sao_Paulo"
+
+class RunTimingHistory:
+    """Durações recentes de cada etapa do pipeline, por usuário.
+
+    O `PipelineRunner` registra as etapas que de fato executou (as retomadas
+    de checkpoint não contam). Cada usuário tem seu próprio arquivo, gravado
+    de forma atômica, para que processos trabalhadores diferentes possam
+    registrar ao mesmo tempo. Apenas as `max_samples` execuções mais
+    recentes são mantidas.
+    """
+
+    def __init__(self, history_dir: Path = Path("data") / "state" / "duracoes", max_samples: int = 20):
+        self.history_dir = Path(history_dir)
+        self.history_dir.mkdir(parents=True, exist_ok=True)
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+
+    def _path(self, user_id: str) -> Path:
+        return self.history_dir / f"{user_id}.json"
+
+    def load(self, user_id: str) -> Dict[str, List[float]]:
+        path = self._path(user_id)
+        if not path.exists():
+            return {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Erro ao ler histórico de durações de {user_id}: {str(e)}")
+            return {}
+
+    def record(self, user_id: str, timings: Dict[str, float]) -> None:
+        """Acrescenta as durações (em segundos) de uma execução."""
+        if not timings:
+            return
+        path = self._path(user_id)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with self._lock:
+            history = self.load(user_id)
+            for stage, seconds in timings.items():
+                samples = history.setdefault(stage, [])
+                samples.append(round(float(seconds), 3))
+                del samples[:-self.max_samples]
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(history, f)
+                tmp_path.replace(path)
+            except Exception as e:
+                logger.error(f"Erro ao gravar histórico de durações de {user_id}: {str(e)}")
+
+    def estimate(self, user_id: str, stages: Tuple[str, ...] = PREPARATION_STAGES,
+                 quantile: float = 0.9, default: float = 300.0) -> float:
+        """Duração esperada das etapas: soma do quantil de cada uma.
+
+        Etapas sem histórico contam com a sua parte de `default`; sem nenhum
+        histórico, retorna `default`.
+        """
+        history = self.load(user_id)
+        total = 0.0
+        for stage in stages:
+            samples = history.get(stage)
+            total += float(np.quantile(samples, quantile)) if samples else default / len(stages)
+        return total
+
+def user_timezone(user_config: Dict[str, Any], default: str = DEFAULT_TIMEZONE):
+    """Fuso horário do usuário (preferences.timezone) ou o padrão do sistema."""
+    name = user_config.get("preferences", {}).get("timezone") or default
+    try:
+        return pytz.timezone(name)
+    except pytz.UnknownTimeZoneError:
+        logger.warning(f"Fuso horário desconhecido para {user_config.get('usuario_id')}: {name}")
+        return pytz.timezone(default)
+
+def next_deadline(user_config: Dict[str, Any], now: datetime, default_timezone: str = DEFAULT_TIMEZONE) -> Optional[datetime]:
+    """Próximo `horario_preferido` do usuário após `now`, no fuso do usuário."""
+    frequency = user_config.get("frequencia_envio")
+    if frequency not in ("diario", "semanal"):
+        return None
+    tz = user_timezone(user_config, default_timezone)
+    hour, minute = map(int, user_config["horario_preferido"].split(":"))
+    today = now.astimezone(tz).date()
+    for offset in range(8):
+        day = today + timedelta(days=offset)
+        if frequency == "semanal" and day.weekday() != 0:
+            continue
+        deadline = tz.localize(datetime.combine(day, dtime(hour, minute)))
+        if deadline > now:
+            return deadline
+    return None
+
+def plan_starts(jobs: List[Tuple[str, datetime, float]], slots: int,
+                max_lead: Optional[float] = None) -> Dict[str, datetime]:
+    """Horário de início de cada job para terminar até o seu prazo sem exceder `slots` simultâneos.
+
+    `jobs` são tuplas (chave, prazo, duração em segundos). Os jobs são
+    encaixados de trás para frente, do prazo mais tardio para o mais cedo,
+    sempre na vaga que fica livre mais tarde: quem tem o mesmo horário
+    preferido é espalhado pela janela anterior em vez de começar junto.
+    Com `max_lead`, nenhum job começa mais de `max_lead` segundos antes do
+    prazo (os dados ficariam velhos); nesse caso aceita-se a sobreposição.
+    """
+    # Heap de máximo (valores negados) com o instante em que cada vaga passa a estar ocupada
+    busy_from = [-float("inf")] * max(1, slots)
+    starts = {}
+    for key, deadline, duration in sorted(jobs, key=lambda job: job[1], reverse=True):
+        deadline_ts = deadline.timestamp()
+        end = min(deadline_ts, -heapq.heappop(busy_from))
+        start = end - duration
+        if max_lead is not None:
+            start = max(start, deadline_ts - max_lead)
+        heapq.heappush(busy_from, -start)
+        starts[key] = datetime.fromtimestamp(start, tz=pytz.utc)
+    return starts
@@ -0,0 +1,128 @@
+from typing import Dict, Any, List, Optional
+import logging
+import numpy as np
+import pandas as pd
+
+from utils.catalog import numeric_id
+
+logger = logging.getLogger(__name__)
+
+# Colunas de texto com poucos valores distintos, armazenadas como categóricas
+CATEGORICAL_COLUMNS = ['product_name', 'category', 'brand', 'region', 'store_id', 'payment_method']
+# Identificadores inteiros, reduzidos ao menor tipo que comporta os valores
+ID_COLUMNS = ['user_id', 'transaction_id']
+# Contagens e notas entram em contas (quantity * 2, somas por grupo): ficam com sinal e
+# pelo menos 32 bits, para que o resultado não dê a volta no tipo reduzido
+COUNT_COLUMNS = ['quantity', 'rating']
+# Valores monetários convertidos para float32 quando o arredondamento em centavos é preservado
+FLOAT32_COLUMNS = ['price']
+# Proporção máxima de valores distintos para uma coluna de texto virar categórica
+MAX_CATEGORY_RATIO = 0.5
+
+def product_id_dtype(values: pd.Series, catalog_ids: List[Any]) -> pd.CategoricalDtype:
+    """Dicionário de product_id compartilhado com o catálogo.
+
+    As categorias começam pelos produtos do catálogo, na ordem do arquivo, e
+    recebem ao final os ids vendidos que não estão nele. Assim o mesmo produto
+    tem o mesmo código em todas as tabelas carregadas com o mesmo catálogo.
+    """
+    if pd.api.types.is_integer_dtype(values):
+        catalog_ids = [number for number in map(numeric_id, catalog_ids) if number is not None]
+    known = pd.Index(catalog_ids).drop_duplicates()
+    extra = pd.Index(values.dropna().unique()).difference(known).sort_values()
+    categories = known.append(extra) if len(known) else extra
+    return pd.CategoricalDtype(categories)
+
+def _downcast_integer(values: pd.Series) -> pd.Series:
+    if not pd.api.types.is_integer_dtype(values):
+        return values
+    if len(values) and values.min() >= 0:
+        return pd.to_numeric(values, downcast='unsigned')
+    return pd.to_numeric(values, downcast='integer')
+
+def _to_int32(values: pd.Series) -> pd.Series:
+    if not pd.api.types.is_integer_dtype(values) or not len(values):
+        return values
+    limits = np.iinfo(np.int32)
+    if values.min() < limits.min or values.max() > limits.max:
+        return values
+    return values.astype('Int32' if pd.api.types.is_extension_array_dtype(values) else np.int32)
+
+def _to_float32(values: pd.Series, decimals: int = 2) -> pd.Series:
+    if not pd.api.types.is_float_dtype(values) or values.dtype == np.float32:
+        return values
+    compact = values.astype(np.float32)
+    # Só converte se todos os valores voltam iguais quando arredondados nas casas decimais
+    error = np.abs(compact.to_numpy(dtype=np.float64) - values.to_numpy())
+    if np.nanmax(error, initial=0.0) < 0.5 * 10 ** -decimals:
+        return compact
+    return values
+
+def _to_category(values: pd.Series) -> pd.Series:
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values
+    if not (pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values)):
+        return values
+    # Uma única passada de hash decide a conversão e já fornece os códigos
+    codes, uniques = pd.factorize(values)
+    if len(values) and len(uniques) / len(values) > MAX_CATEGORY_RATIO:
+        return values
+    return pd.Series(pd.Categorical.from_codes(codes, uniques), index=values.index, name=values.name)
+
+def compact_sales_frame(df: pd.DataFrame, catalog_ids: Optional[List[Any]] = None) -> pd.DataFrame:
+    """Converte a tabela de vendas para uma representação compacta em memória.
+
+    - textos de baixa cardinalidade viram categóricos;
+    - product_id vira categórico com o dicionário do catálogo, se informado;
+    - ids são reduzidos ao menor inteiro que comporta os valores;
+    - quantity e rating passam a int32, que mantém o sinal nas contas;
+    - price passa a float32 quando isso não altera os centavos.
+
+    Os valores continuam os mesmos, apenas os tipos mudam. Colunas que não se
+    encaixam nas regras ficam como estão.
+    """
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        if column == 'product_id':
+            if catalog_ids:
+                values = values.astype(product_id_dtype(values, catalog_ids))
+            elif pd.api.types.is_integer_dtype(values):
+                values = _downcast_integer(values)
+            else:
+                values = _to_category(values)
+        elif column in CATEGORICAL_COLUMNS:
+            values = _to_category(values)
+        elif column in ID_COLUMNS:
+            values = _downcast_integer(values) if pd.api.types.is_integer_dtype(values) else _to_category(values)
+        elif column in COUNT_COLUMNS:
+            values = _to_int32(values)
+        elif column in FLOAT32_COLUMNS:
+            values = _to_float32(values)
+        columns[column] = values
+    return pd.DataFrame(columns, index=df.index)
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> Dict[str, Any]:
+    """Bytes por linha de cada coluna antes e depois da compactação (contando as strings)."""
+    rows = max(len(before), 1)
+    before_usage = before.memory_usage(index=False, deep=True)
+    after_usage = after.memory_usage(index=False, deep=True)
+    columns = {
+        column: {
+            "tipo_antes": str(before[column].dtype),
+            "tipo_depois": str(after[column].dtype),
+            "bytes_por_linha_antes": round(before_usage[column] / rows, 2),
+            "bytes_por_linha_depois": round(after_usage[column] / rows, 2)
+        }
+        for column in before.columns
+    }
+    total_before, total_after = int(before_usage.sum()), int(after_usage.sum())
+    return {
+        "linhas": len(before),
+        "bytes_antes": total_before,
+        "bytes_depois": total_after,
+        "bytes_por_linha_antes": round(total_before / rows, 2),
+        "bytes_por_linha_depois": round(total_after / rows, 2),
+        "reducao": round(1 - total_after / max(total_before, 1), 4),
+        "colunas": columns
+    }
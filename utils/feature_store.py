@@ -0,0 +1,228 @@
+from typing import Dict, Any, Optional, Tuple
+from pathlib import Path
+import hashlib
+import json
+import logging
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+LAGS = (1, 7, 14, 30)
+WINDOWS = (7, 30)
+# Dias anteriores necessários para calcular as features de um dia novo
+TRAILING = max(max(LAGS), max(WINDOWS))
+
+Features = Dict[str, np.ndarray]
+
+def calendar_features(dates: np.ndarray) -> Features:
+    """Ano, mês, dia, dia da semana e trimestre de cada data."""
+    index = pd.DatetimeIndex(dates)
+    return {
+        'year': index.year.to_numpy(),
+        'month': index.month.to_numpy(),
+        'day': index.day.to_numpy(),
+        'dayofweek': index.dayofweek.to_numpy(),
+        'quarter': index.quarter.to_numpy()
+    }
+
+def window_features(values: np.ndarray, start: int = 0) -> Features:
+    """Defasagens e médias/desvios móveis de `values[start:]`.
+
+    `values[:start]` é só contexto: permite calcular as features dos dias
+    novos a partir da janela final do histórico.
+    """
+    series = pd.Series(values)
+    features = {f'lag_{lag}': series.shift(lag).to_numpy()[start:] for lag in LAGS}
+    for window in WINDOWS:
+        rolling = series.rolling(window=window)
+        features[f'rolling_mean_{window}'] = rolling.mean().to_numpy()[start:]
+        features[f'rolling_std_{window}'] = rolling.std().to_numpy()[start:]
+    return features
+
+def compute_features(dates: np.ndarray, values: np.ndarray) -> Features:
+    """Todas as features de uma série, sem usar o armazenamento."""
+    features = {'ds': dates, 'y': values}
+    features.update(calendar_features(dates))
+    features.update(window_features(values))
+    return features
+
+def future_features(features: Features, horizon: int) -> pd.DataFrame:
+    """Features dos próximos `horizon` dias a partir do que já é conhecido.
+
+    Cada defasagem é preenchida enquanto aponta para o histórico (lag_7 nos
+    7 primeiros dias, lag_30 nos 30 primeiros) e fica NaN depois; as médias
+    móveis repetem o último valor observado.
+    """
+    n = len(features['y'])
+    dates = pd.date_range(pd.Timestamp(features['ds'][-1]) + pd.Timedelta(days=1), periods=horizon, freq='D')
+    future = {'ds': dates.to_numpy()}
+    future.update(calendar_features(dates))
+    steps = np.arange(horizon)
+    for lag in LAGS:
+        positions = n + steps - lag
+        future[f'lag_{lag}'] = np.where(positions < n, features['y'][np.clip(positions, 0, n - 1)], np.nan)
+    for window in WINDOWS:
+        for stat in ('mean', 'std'):
+            name = f'rolling_{stat}_{window}'
+            future[name] = np.full(horizon, features[name][-1] if n else np.nan)
+    return pd.DataFrame(future)
+
+def _append(columns: Features, rows: int, new: Features) -> Features:
+    """Escreve `new` depois das `rows` primeiras linhas de `columns`.
+
+    As colunas têm capacidade extra, dobrada quando falta espaço, então
+    acrescentar dias custa o tamanho dos dias novos (amortizado) e as
+    linhas já gravadas nunca mudam: visões `coluna[:rows]` entregues antes
+    continuam válidas.
+    """
+    added = len(new['y'])
+    if rows + added > len(columns['y']):
+        capacity = max(2 * len(columns['y']), rows + added)
+        grown = {}
+        for name, column in columns.items():
+            grown[name] = np.empty(capacity, dtype=column.dtype)
+            grown[name][:rows] = column[:rows]
+        columns = grown
+    for name, column in columns.items():
+        column[rows:rows + added] = new[name]
+    return columns
+
+class FeatureStore:
+    """Features de calendário, defasagens e janelas móveis por série, em partes .npz.
+
+    Cada série (identificada por uma chave, por exemplo 'usuario/geral:receita')
+    tem um diretório com as features já calculadas, gravadas só por
+    acréscimo: cada atualização grava uma parte com os dias novos e o índice
+    `partes.json` (número de linhas e lista de partes), que é o que a torna
+    visível. Quando a série recebida só acrescenta dias ao que está salvo,
+    apenas os dias novos são calculados, usando os últimos `TRAILING` dias
+    como contexto; se o histórico mudou, a série é recalculada e regravada
+    numa parte só. Acima de `max_parts` partes, elas são compactadas em uma.
+    """
+
+    def __init__(self, store_dir: Path = Path("data") / "state" / "features", max_parts: int = 32):
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.max_parts = max_parts
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        # Por chave: colunas com capacidade extra, linhas válidas e índice das partes em disco
+        self._features: Dict[str, Tuple[Features, int, Dict[str, Any]]] = {}
+
+    def _dir(self, key: str) -> Path:
+        return self.store_dir / hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    @staticmethod
+    def _tmp(path: Path) -> Path:
+        return path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+    def _load(self, key: str) -> Optional[Tuple[Features, int, Dict[str, Any]]]:
+        with self._lock:
+            if key in self._features:
+                return self._features[key]
+        directory = self._dir(key)
+        index_path = directory / "partes.json"
+        if not index_path.exists():
+            return None
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            parts = []
+            for name in index['partes']:
+                with np.load(directory / name) as data:
+                    parts.append({column: data[column] for column in data.files})
+            columns = {column: np.concatenate([part[column] for part in parts]) for column in parts[0]}
+            if len(columns['y']) != index['linhas']:
+                raise ValueError(f"{len(columns['y'])} linhas nas partes, {index['linhas']} no índice")
+            return columns, index['linhas'], index
+        except (OSError, ValueError, KeyError, IndexError) as e:
+            logger.error(f"Erro ao ler features de {key}: {str(e)}")
+            return None
+
+    def _write_part(self, directory: Path, index: Dict[str, Any], features: Features) -> str:
+        name = f"{index['proxima']:06d}.npz"
+        path = directory / name
+        tmp_path = self._tmp(path)
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **features)
+        tmp_path.replace(path)
+        index['proxima'] += 1
+        return name
+
+    def _save(self, key: str, columns: Features, rows: int, index: Dict[str, Any],
+              new: Features, rewrite: bool) -> Dict[str, Any]:
+        """Grava `new` como parte nova (ou todas as linhas, com `rewrite`) e publica o índice."""
+        directory = self._dir(key)
+        index = dict(index, partes=list(index['partes']))
+        old_parts = index['partes'] if rewrite else []
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            if rewrite:
+                index['partes'] = [self._write_part(directory, index, {name: column[:rows] for name, column in columns.items()})]
+            else:
+                index['partes'].append(self._write_part(directory, index, new))
+            index['linhas'] = rows
+            index_path = directory / "partes.json"
+            tmp_path = self._tmp(index_path)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(index, f)
+            tmp_path.replace(index_path)
+            for name in old_parts:
+                (directory / name).unlink(missing_ok=True)
+        except OSError as e:
+            logger.error(f"Erro ao gravar features de {key}: {str(e)}")
+        return index
+
+    @staticmethod
+    def _extends(stored: Features, dates: np.ndarray, values: np.ndarray) -> bool:
+        """A série nova é a salva com dias acrescentados no fim?
+
+        Compara o primeiro dia, o último dia salvo e os últimos `TRAILING`
+        valores, que são o contexto das features dos dias novos; o custo
+        não depende do tamanho do histórico.
+        """
+        n = len(stored['y'])
+        if n == 0 or len(values) < n or dates[0] != stored['ds'][0] or dates[n - 1] != stored['ds'][-1]:
+            return False
+        tail = slice(max(0, n - TRAILING), n)
+        return np.array_equal(values[tail], stored['y'][tail], equal_nan=True)
+
+    def update(self, key: str, dates, values) -> Features:
+        """Features da série completa, calculando e gravando só os dias que ainda não estão salvos."""
+        dates = pd.to_datetime(pd.Series(dates)).dt.normalize().to_numpy()
+        values = np.asarray(values, dtype=np.float64)
+        with self._key_lock(key):
+            loaded = self._load(key)
+            stored = {name: column[:loaded[1]] for name, column in loaded[0].items()} if loaded else None
+            if stored is None or not self._extends(stored, dates, values):
+                columns = compute_features(dates, values)
+                rows = len(values)
+                index = loaded[2] if loaded else {'proxima': 0, 'partes': []}
+                index = self._save(key, columns, rows, index, columns, rewrite=True)
+            else:
+                columns, start, index = loaded
+                if start < len(values):
+                    context = max(0, start - TRAILING)
+                    new = {'ds': dates[start:], 'y': values[start:]}
+                    new.update(calendar_features(dates[start:]))
+                    new.update(window_features(values[context:], start - context))
+                    columns = _append(columns, start, new)
+                    rows = len(values)
+                    index = self._save(key, columns, rows, index, new,
+                                       rewrite=len(index['partes']) >= self.max_parts)
+                else:
+                    rows = start
+            with self._lock:
+                self._features[key] = (columns, rows, index)
+            return {name: column[:rows] for name, column in columns.items()}
+
+    def frame(self, key: str, dates, values) -> pd.DataFrame:
+        """Mesmo que `update`, como DataFrame."""
+        return pd.DataFrame(self.update(key, dates, values))
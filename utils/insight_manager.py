@@ -1,14 +1,18 @@
 import json
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import logging
 
+from utils.selection_store import SelectionStore
+
 logger = logging.getLogger(__name__)
 
 class InsightManager:
-    def __init__(self, config_path: str = "config/user_configs/default_config.json"):
+    def __init__(self, config_path: str = "config/user_configs/default_config.json", store: Optional[SelectionStore] = None):
         self.config_path = Path(config_path)
+        # O arquivo de configuração é compartilhado e apenas lido; as seleções ficam no SelectionStore
         self.config = self._load_config()
+        self.store = store or SelectionStore()
     
     def _load_config(self) -> Dict[str, Any]:
         """Carrega a configuração do arquivo JSON."""
@@ -27,7 +31,7 @@ class InsightManager:
             logger.error(f"Persona '{persona}' não encontrada")
             return []
     
-    def select_insights(self, persona: str, selected_insights: List[str]) -> bool:
+    def select_insights(self, persona: str, selected_insights: List[str], user_id: Optional[str] = None) -> bool:
         """Permite ao usuário selecionar os insights que deseja receber."""
         try:
             available_insights = self.get_available_insights(persona)
@@ -41,13 +45,8 @@ class InsightManager:
                     logger.error(f"Insight '{insight_name}' não disponível para a persona '{persona}'")
                     return False
             
-            # Atualiza a configuração
-            self.config["persona"] = persona
-            self.config["tipo_conteudo"] = selected_insights
-            
-            # Salva a configuração atualizada
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, indent=4, ensure_ascii=False)
+            # Registra a seleção do usuário (gravada em lote, sem reescrever a configuração compartilhada)
+            self.store.set(user_id or self.config["usuario_id"], persona, selected_insights)
             
             logger.info(f"Insights selecionados para {persona}: {selected_insights}")
             return True
@@ -56,13 +55,20 @@ class InsightManager:
             logger.error(f"Erro ao selecionar insights: {str(e)}")
             return False
     
-    def get_current_selection(self) -> Dict[str, Any]:
-        """Retorna a seleção atual de insights."""
+    def get_current_selection(self, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Retorna a seleção atual de insights (ou a padrão da configuração, se o usuário não escolheu)."""
+        selection = self.store.get(user_id or self.config["usuario_id"])
+        if selection:
+            return selection
         return {
             "persona": self.config["persona"],
             "selected_insights": self.config["tipo_conteudo"]
         }
     
+    def close(self) -> None:
+        """Grava as seleções pendentes."""
+        self.store.close()
+    
     def list_insights_by_persona(self, persona: str) -> None:
         """Lista todos os insights disponíveis para uma persona."""
         insights = self.get_available_insights(persona)
@@ -126,6 +132,8 @@ def main():
         except Exception as e:
             print(f"\nErro: {str(e)}")
             continue
+    
+    manager.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
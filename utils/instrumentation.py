@@ -0,0 +1,329 @@
+from typing import Dict, Any, List, Optional, Iterator
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import contextvars
+import cProfile
+import json
+import logging
+import threading
+import time
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+metrics_logger = logging.getLogger("instrumentacao")
+
+_current_run: contextvars.ContextVar = contextvars.ContextVar("instrumentacao_execucao", default=None)
+_current_span: contextvars.ContextVar = contextvars.ContextVar("instrumentacao_span", default=None)
+
+# tracemalloc é global ao processo: execuções simultâneas o compartilham por contagem de uso
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_owned = False
+
+# Spans abertos por thread. O pico do tracemalloc também é global: um span só
+# tem pico próprio se nenhuma outra thread tiver spans abertos durante ele
+_open_lock = threading.Lock()
+_open_spans: Dict[int, List["Span"]] = {}
+
+def _process_peak_rss_bytes() -> Optional[int]:
+    """Pico de memória residente do processo desde o início (não é uma medida por etapa)."""
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss é em KB no Linux e em bytes no macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return None
+
+def frame_bytes(df) -> int:
+    """Tamanho raso de um DataFrame (sem percorrer as strings de colunas object)."""
+    return int(df.memory_usage(index=True, deep=False).sum())
+
+class Span:
+    """Medição de uma etapa; atributos extras (rows, bytes, ...) podem ser definidos com `set`."""
+
+    __slots__ = ("name", "path", "start", "duration", "attributes", "peak_memory", "thread", "shared", "peak_seen")
+
+    def __init__(self, name: str, path: str, attributes: Dict[str, Any]):
+        self.name = name
+        self.path = path
+        self.start = time.time()
+        self.duration = 0.0
+        self.attributes = attributes
+        # Só preenchido com tracemalloc ativo e quando o span não rodou em paralelo com outros
+        self.peak_memory = None
+        self.thread = threading.get_ident()
+        self.shared = False
+        self.peak_seen = 0
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "span": self.name,
+            "caminho": self.path,
+            "inicio": self.start,
+            "duracao_s": round(self.duration, 6),
+            "pico_memoria_bytes": self.peak_memory,
+            **self.attributes
+        }
+
+class RunProfile:
+    """Coleta os spans de uma execução do pipeline."""
+
+    def __init__(self, run_id: str, user_id: str):
+        self.run_id = run_id
+        self.user_id = user_id
+        self.status = "success"
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+def _open_span(record: Span, parent: Optional[Span]) -> None:
+    with _open_lock:
+        others = [s for thread, stack in _open_spans.items() if thread != record.thread for s in stack]
+        if others:
+            # Em paralelo com spans de outras threads, nenhum deles tem um pico próprio
+            record.shared = True
+            for other in others:
+                other.shared = True
+        _open_spans.setdefault(record.thread, []).append(record)
+        if not record.shared:
+            # O pai na mesma thread guarda o pico visto até aqui antes do reinício
+            if parent is not None and parent.thread == record.thread:
+                parent.peak_seen = max(parent.peak_seen, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+
+def _close_span(record: Span, parent: Optional[Span]) -> None:
+    with _open_lock:
+        stack = _open_spans.get(record.thread, [])
+        if record in stack:
+            stack.remove(record)
+        if not stack:
+            _open_spans.pop(record.thread, None)
+        if record.shared or not tracemalloc.is_tracing():
+            return
+        record.peak_memory = max(record.peak_seen, tracemalloc.get_traced_memory()[1])
+        if parent is not None and parent.thread == record.thread:
+            parent.peak_seen = max(parent.peak_seen, record.peak_memory)
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """Mede um trecho do pipeline e o registra na execução corrente, se houver.
+
+    Com tracemalloc ativo, registra o pico de memória do trecho, exceto
+    quando ele roda em paralelo com spans de outras threads (o pico do
+    tracemalloc é do processo inteiro e não separaria as etapas).
+    """
+    parent = _current_span.get()
+    path = f"{parent.path}/{name}" if parent else name
+    record = Span(name, path, attributes)
+    token = _current_span.set(record)
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        _open_span(record, parent)
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record.duration = time.perf_counter() - start
+        if tracing:
+            _close_span(record, parent)
+        _current_span.reset(token)
+        run = _current_run.get()
+        if run is not None:
+            run.add(record)
+
+def annotate(**attributes) -> None:
+    """Acrescenta atributos (rows, bytes, ...) ao span corrente, se houver."""
+    record = _current_span.get()
+    if record is not None:
+        record.set(**attributes)
+
+def submit_in_context(executor, func, *args):
+    """Envia `func` a um executor de threads preservando a execução e o span correntes."""
+    context = contextvars.copy_context()
+    return executor.submit(context.run, func, *args)
+
+class MetricsRegistry:
+    """Agrega durações por etapa no formato texto do Prometheus."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, float]] = {}
+        self._runs: Dict[str, int] = {}
+
+    def observe(self, profile: RunProfile, status: str) -> None:
+        with self._lock:
+            self._runs[status] = self._runs.get(status, 0) + 1
+            for record in profile.spans:
+                stats = self._stages.setdefault(record.path, {"soma": 0.0, "contagem": 0, "ultima": 0.0, "linhas": 0})
+                stats["soma"] += record.duration
+                stats["contagem"] += 1
+                stats["ultima"] = record.duration
+                stats["linhas"] += record.attributes.get("rows", 0) or 0
+
+    def render(self) -> str:
+        lines = [
+            "# HELP salespulse_pipeline_runs_total Execuções do pipeline por status.",
+            "# TYPE salespulse_pipeline_runs_total counter"
+        ]
+        with self._lock:
+            for status, count in sorted(self._runs.items()):
+                lines.append(f'salespulse_pipeline_runs_total{{status="{status}"}} {count}')
+            lines += [
+                "# HELP salespulse_stage_seconds Duração das etapas do pipeline.",
+                "# TYPE salespulse_stage_seconds summary"
+            ]
+            for path, stats in sorted(self._stages.items()):
+                lines.append(f'salespulse_stage_seconds_sum{{stage="{path}"}} {stats["soma"]:.6f}')
+                lines.append(f'salespulse_stage_seconds_count{{stage="{path}"}} {stats["contagem"]}')
+            lines += [
+                "# HELP salespulse_stage_last_seconds Duração da última execução de cada etapa.",
+                "# TYPE salespulse_stage_last_seconds gauge"
+            ]
+            for path, stats in sorted(self._stages.items()):
+                lines.append(f'salespulse_stage_last_seconds{{stage="{path}"}} {stats["ultima"]:.6f}')
+            lines += [
+                "# HELP salespulse_stage_rows_total Linhas processadas por etapa.",
+                "# TYPE salespulse_stage_rows_total counter"
+            ]
+            for path, stats in sorted(self._stages.items()):
+                if stats["linhas"]:
+                    lines.append(f'salespulse_stage_rows_total{{stage="{path}"}} {stats["linhas"]}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Path) -> None:
+        """Grava o arquivo de métricas de forma atômica (para o textfile collector)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(self.render(), encoding="utf-8")
+        tmp_path.replace(path)
+
+registry = MetricsRegistry()
+
+def start_metrics_server(port: int) -> ThreadingHTTPServer:
+    """Expõe as métricas em http://0.0.0.0:<port>/metrics em uma thread de segundo plano."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Métricas disponíveis na porta {port}")
+    return server
+
+def configure_json_log(path: Path) -> None:
+    """Direciona os eventos de instrumentação para um arquivo JSON Lines."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if any(getattr(h, "baseFilename", None) == str(path.resolve()) for h in metrics_logger.handlers):
+        return
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    metrics_logger.addHandler(handler)
+    metrics_logger.setLevel(logging.INFO)
+    metrics_logger.propagate = False
+
+@contextmanager
+def instrumented_run(user_id: str, settings: Optional[Dict[str, Any]] = None) -> Iterator[RunProfile]:
+    """Ativa a coleta de spans para uma execução e publica os resultados ao final.
+
+    Configurações (seção `instrumentacao` de system_config.json):
+    - arquivo_log_json: arquivo JSON Lines com um evento por span e um resumo por execução;
+    - arquivo_prometheus: arquivo texto com as métricas agregadas;
+    - cprofile / tracemalloc: captura opcional por execução em `diretorio_perfis`.
+
+    O chamador define `profile.status` antes de sair do bloco.
+    """
+    settings = settings or {}
+    run_id = f"{user_id}-{time.strftime('%Y%m%dT%H%M%S')}"
+    profile = RunProfile(run_id, user_id)
+    profiles_dir = Path(settings.get("diretorio_perfis", "logs/perfis"))
+
+    profiler = cProfile.Profile() if settings.get("cprofile") else None
+    traced = bool(settings.get("tracemalloc"))
+    if traced:
+        _acquire_tracing()
+    if profiler:
+        profiler.enable()
+
+    token = _current_run.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_run.reset(token)
+        if profiler:
+            profiler.disable()
+            profiles_dir.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(str(profiles_dir / f"{run_id}.prof"))
+        if traced:
+            # O snapshot inclui as alocações vivas de execuções simultâneas
+            snapshot = tracemalloc.take_snapshot()
+            _release_tracing()
+            profiles_dir.mkdir(parents=True, exist_ok=True)
+            top = snapshot.statistics("lineno")[:25]
+            with open(profiles_dir / f"{run_id}.tracemalloc.txt", "w", encoding="utf-8") as f:
+                f.write("\n".join(str(stat) for stat in top))
+        _publish(profile, settings)
+
+def _acquire_tracing() -> None:
+    """Liga o tracemalloc na primeira execução que o pede (se já não estiver ligado por fora)."""
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_owned = True
+        _tracing_users += 1
+
+def _release_tracing() -> None:
+    """Desliga o tracemalloc quando a última execução que o usa termina."""
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_owned:
+            tracemalloc.stop()
+            _tracing_owned = False
+
+def _publish(profile: RunProfile, settings: Dict[str, Any]) -> None:
+    """Emite os eventos JSON e atualiza as métricas agregadas."""
+    if settings.get("arquivo_log_json"):
+        configure_json_log(settings["arquivo_log_json"])
+    for record in profile.spans:
+        metrics_logger.info(json.dumps(
+            {"evento": "span", "execucao": profile.run_id, "usuario": profile.user_id, **record.to_dict()},
+            default=str,
+            ensure_ascii=False
+        ))
+    metrics_logger.info(json.dumps({
+        "evento": "execucao",
+        "execucao": profile.run_id,
+        "usuario": profile.user_id,
+        "status": profile.status,
+        "etapas": {record.path: round(record.duration, 6) for record in profile.spans},
+        # Marca máxima do processo desde o início, não desta execução
+        "pico_rss_processo_bytes": _process_peak_rss_bytes()
+    }, ensure_ascii=False))
+
+    registry.observe(profile, profile.status)
+    if settings.get("arquivo_prometheus"):
+        try:
+            registry.write(settings["arquivo_prometheus"])
+        except OSError as e:
+            logger.error(f"Erro ao gravar métricas: {str(e)}")
@@ -0,0 +1,163 @@
+from typing import Dict, Any, List, Optional
+from dataclasses import dataclass
+from pathlib import Path
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Job:
+    """Item de trabalho retirado da fila por um trabalhador."""
+    id: int
+    kind: str
+    payload: Dict[str, Any]
+    attempts: int
+    job_key: Optional[str] = None
+
+class SQLiteJobQueue:
+    """Fila de jobs durável em SQLite, com leases, heartbeats e novas tentativas.
+
+    Um trabalhador que retira um job recebe um lease de `lease_seconds`
+    segundos e precisa renová-lo com `heartbeat` enquanto executa. Se o
+    processo morrer, o lease expira e o job volta a ficar disponível para
+    qualquer outro trabalhador. Falhas são repetidas com espera crescente até
+    `max_attempts` tentativas. Jobs com a mesma `job_key` não são duplicados
+    enquanto um deles estiver pendente ou em execução.
+
+    O banco pode ser compartilhado por processos da mesma máquina ou, em um
+    sistema de arquivos compartilhado com suporte a locks, por várias
+    máquinas; a interface (enqueue/claim/heartbeat/complete/fail) é a mesma
+    que uma fila em Postgres ou Redis precisaria oferecer.
+    """
+
+    def __init__(self, db_path: Path = Path("data") / "state" / "fila.db", lease_seconds: float = 300,
+                 max_attempts: int = 3, retry_delay: float = 30):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30,
+                                           isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_key TEXT,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pendente',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL,
+                lease_owner TEXT,
+                lease_expires REAL,
+                last_error TEXT,
+                result TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_disponiveis ON jobs (status, available_at);
+            CREATE UNIQUE INDEX IF NOT EXISTS jobs_ativos ON jobs (job_key)
+                WHERE status IN ('pendente', 'executando');
+        """)
+
+    def _write(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._connection.execute(sql, params)
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], job_key: Optional[str] = None,
+                delay: float = 0) -> Optional[int]:
+        """Adiciona um job; retorna seu id ou None se já existe um ativo com a mesma chave."""
+        now = time.time()
+        cursor = self._write(
+            "INSERT OR IGNORE INTO jobs (job_key, kind, payload, available_at, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (job_key, kind, json.dumps(payload, ensure_ascii=False, default=str), now + delay, now, now)
+        )
+        return cursor.lastrowid if cursor.rowcount else None
+
+    def claim(self, worker_id: str, limit: int = 1) -> List[Job]:
+        """Retira até `limit` jobs disponíveis (ou com lease vencido) para o trabalhador."""
+        now = time.time()
+        with self._lock:
+            # BEGIN IMMEDIATE trava a escrita: dois trabalhadores nunca pegam o mesmo job
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                # Leases vencidos que já esgotaram as tentativas não voltam para a fila
+                self._connection.execute(
+                    "UPDATE jobs SET status = 'falhou', last_error = 'lease expirado', updated_at = ? "
+                    "WHERE status = 'executando' AND lease_expires < ? AND attempts >= ?",
+                    (now, now, self.max_attempts)
+                )
+                rows = self._connection.execute(
+                    "SELECT id, kind, payload, attempts, job_key FROM jobs "
+                    "WHERE (status = 'pendente' AND available_at <= ?) OR (status = 'executando' AND lease_expires < ?) "
+                    "ORDER BY available_at, id LIMIT ?",
+                    (now, now, limit)
+                ).fetchall()
+                self._connection.executemany(
+                    "UPDATE jobs SET status = 'executando', lease_owner = ?, lease_expires = ?, "
+                    "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    [(worker_id, now + self.lease_seconds, now, row[0]) for row in rows]
+                )
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+        return [Job(id=row[0], kind=row[1], payload=json.loads(row[2]), attempts=row[3] + 1, job_key=row[4])
+                for row in rows]
+
+    def heartbeat(self, job_id: int, worker_id: str) -> bool:
+        """Renova o lease; False se o job não pertence mais ao trabalhador."""
+        now = time.time()
+        cursor = self._write(
+            "UPDATE jobs SET lease_expires = ?, updated_at = ? "
+            "WHERE id = ? AND lease_owner = ? AND status = 'executando'",
+            (now + self.lease_seconds, now, job_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: int, worker_id: str, result: Optional[Dict[str, Any]] = None) -> bool:
+        cursor = self._write(
+            "UPDATE jobs SET status = 'concluido', result = ?, lease_expires = NULL, updated_at = ? "
+            "WHERE id = ? AND lease_owner = ? AND status = 'executando'",
+            (json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+             time.time(), job_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, job_id: int, worker_id: str, error: str) -> bool:
+        """Registra a falha; o job volta para a fila com espera crescente até esgotar as tentativas."""
+        now = time.time()
+        cursor = self._write(
+            "UPDATE jobs SET "
+            "status = CASE WHEN attempts >= ? THEN 'falhou' ELSE 'pendente' END, "
+            "available_at = ? + ? * attempts, last_error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE id = ? AND lease_owner = ? AND status = 'executando'",
+            (self.max_attempts, now, self.retry_delay, error, now, job_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def stats(self) -> Dict[str, int]:
+        """Quantidade de jobs por situação."""
+        with self._lock:
+            rows = self._connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def purge(self, older_than_seconds: float = 7 * 24 * 3600) -> int:
+        """Remove jobs concluídos ou falhos antigos."""
+        cursor = self._write(
+            "DELETE FROM jobs WHERE status IN ('concluido', 'falhou') AND updated_at < ?",
+            (time.time() - older_than_seconds,)
+        )
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,394 @@
+from typing import Dict, Any, List, Optional, Callable, Tuple
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import os
+import time
+import pandas as pd
+
+from utils.instrumentation import span, annotate, instrumented_run, submit_in_context, frame_bytes
+from utils.result_cache import ResultCache
+from utils.checkpoint_store import CheckpointStore, STAGES
+from utils.chart_renderer import chart_requests
+from utils.config_registry import effective_config, load_persona_defaults
+
+logger = logging.getLogger(__name__)
+
+# Etapas que dependem só da modelagem e rodam juntas, com o atributo de PipelineResult de cada uma
+REPORT_STAGES = {"generate": "generation", "render": "charts", "export": "export"}
+
+CHART_CAPTIONS = {
+    "previsao": "Previsão de receita",
+    "top_produtos": "Produtos com maior receita"
+}
+
+class PipelineStageError(Exception):
+    """Erro em uma etapa do pipeline, com o nome da etapa que falhou."""
+
+    def __init__(self, stage: str, message: str):
+        super().__init__(f"{stage}: {message}")
+        self.stage = stage
+
+@dataclass
+class IngestionOutput:
+    """Saída da etapa de ingestão."""
+    data: pd.DataFrame
+
+    @property
+    def rows(self) -> int:
+        return len(self.data)
+
+@dataclass
+class ModelingOutput:
+    """Saída da etapa de modelagem."""
+    forecasts: Dict[str, Any]
+    recommendations: List[Dict[str, Any]]
+    anomalies: List[Dict[str, Any]]
+    kpis: Dict[str, Any] = field(default_factory=dict)
+
+    def report_data(self) -> Dict[str, Any]:
+        """Converte os resultados em um dicionário serializável em JSON para o prompt."""
+        data = {
+            "kpis": self.kpis,
+            "previsoes": self.forecasts,
+            "recomendacoes": self.recommendations,
+            "anomalias": self.anomalies
+        }
+        return json.loads(json.dumps(data, default=str))
+
+@dataclass
+class GenerationOutput:
+    """Saída da etapa de geração de texto."""
+    insights: str
+
+@dataclass
+class ChartOutput:
+    """Saída da etapa de gráficos: PNGs do cache compartilhado, com a legenda de cada um."""
+    charts: List[Dict[str, str]] = field(default_factory=list)
+
+    @property
+    def attachments(self) -> List[Dict[str, str]]:
+        return self.charts
+
+@dataclass
+class ExportOutput:
+    """Saída da etapa de exportação: planilhas do cache compartilhado, com o nome exibido ao usuário."""
+    files: List[Dict[str, str]] = field(default_factory=list)
+
+    @property
+    def attachments(self) -> List[Dict[str, str]]:
+        return self.files
+
+@dataclass
+class DispatchOutput:
+    """Saída da etapa de envio."""
+    message: str
+
+@dataclass
+class PipelineResult:
+    """Resultado completo de uma execução para um usuário."""
+    user_id: str
+    status: str = "success"
+    error: Optional[str] = None
+    failed_stage: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    resumed: List[str] = field(default_factory=list)
+    attempts: int = 1
+    ingestion: Optional[IngestionOutput] = None
+    modeling: Optional[ModelingOutput] = None
+    generation: Optional[GenerationOutput] = None
+    charts: Optional[ChartOutput] = None
+    export: Optional[ExportOutput] = None
+    dispatch: Optional[DispatchOutput] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Resumo serializável do resultado, sem os DataFrames intermediários."""
+        return {
+            "user_id": self.user_id,
+            "status": self.status,
+            "error": self.error,
+            "failed_stage": self.failed_stage,
+            "timings": dict(self.timings),
+            "resumed": list(self.resumed),
+            "attempts": self.attempts,
+            "rows": self.ingestion.rows if self.ingestion else 0,
+            "insights": self.generation.insights if self.generation else None,
+            "charts": [chart["arquivo"] for chart in self.charts.charts] if self.charts else [],
+            "exports": [file["arquivo"] for file in self.export.files] if self.export else [],
+            "message": self.dispatch.message if self.dispatch else None
+        }
+
+class PipelineRunner:
+    """Executa o pipeline de insights como chamadas diretas, sem orquestração do CrewAI.
+
+    As etapas são determinísticas e encadeadas por objetos tipados. Dentro de
+    cada etapa, o trabalho sem dependência entre si roda em paralelo: as
+    fontes de dados são carregadas simultaneamente, previsões,
+    recomendações e anomalias são calculadas ao mesmo tempo, e texto,
+    gráficos e planilha também rodam juntos antes do envio.
+    """
+
+    def __init__(
+        self,
+        data_ingestion_agent,
+        modeling_agent,
+        nlp_generation_agent,
+        telegram_dispatch_agent,
+        max_workers: int = 4,
+        instrumentation: Optional[Dict[str, Any]] = None,
+        result_cache: Optional[ResultCache] = None,
+        checkpoint_store: Optional[CheckpointStore] = None,
+        max_attempts: int = 1,
+        retry_delay: float = 30.0,
+        timing_history=None,
+        chart_renderer=None,
+        report_exporter=None,
+        persona_defaults: Optional[Dict[str, Any]] = None
+    ):
+        self.data_ingestion_agent = data_ingestion_agent
+        self.modeling_agent = modeling_agent
+        self.nlp_generation_agent = nlp_generation_agent
+        self.telegram_dispatch_agent = telegram_dispatch_agent
+        self.max_workers = max_workers
+        self.instrumentation = instrumentation or {}
+        self.result_cache = result_cache
+        self.checkpoint_store = checkpoint_store
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = retry_delay
+        self.timing_history = timing_history
+        self.chart_renderer = chart_renderer
+        self.report_exporter = report_exporter
+        # Padrões de default_config.json completam as configurações que trazem só os campos obrigatórios
+        self.persona_defaults = load_persona_defaults() if persona_defaults is None else persona_defaults
+
+    def _timed(self, result: PipelineResult, stage: str, func: Callable, *args):
+        """Executa uma etapa dentro de um span, registrando sua duração em `result.timings`."""
+        start = time.perf_counter()
+        with span(stage):
+            try:
+                return func(*args)
+            except PipelineStageError:
+                raise
+            except Exception as e:
+                raise PipelineStageError(stage, str(e)) from e
+            finally:
+                result.timings[stage] = time.perf_counter() - start
+
+    def ingest(self, user_config: Dict[str, Any]) -> IngestionOutput:
+        """Carrega e processa todas as fontes de dados do usuário em paralelo."""
+        data_sources = user_config.get("data_sources", [])
+        if not data_sources:
+            raise ValueError("No data sources configured")
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(data_sources))) as executor:
+            futures = [
+                submit_in_context(executor, self.data_ingestion_agent.load_source, source_config)
+                for source_config in data_sources
+            ]
+            dfs = [future.result() for future in futures]
+        output = IngestionOutput(data=self.data_ingestion_agent.combine(dfs))
+        annotate(rows=output.rows, bytes=frame_bytes(output.data))
+        return output
+
+    def model(self, ingestion: IngestionOutput, user_config: Dict[str, Any]) -> ModelingOutput:
+        """Calcula previsões, recomendações e anomalias simultaneamente."""
+        data = ingestion.data
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            forecasts = submit_in_context(executor, self.modeling_agent.run_forecasts, data, user_config)
+            recommendations = submit_in_context(executor, self.modeling_agent.run_recommendations, data, user_config)
+            anomalies = submit_in_context(executor, self.modeling_agent.detect_anomalies, data, user_config)
+            kpis = submit_in_context(executor, self.modeling_agent.compute_kpis, data)
+            return ModelingOutput(
+                forecasts=forecasts.result(),
+                recommendations=recommendations.result(),
+                anomalies=anomalies.result(),
+                kpis=kpis.result()
+            )
+
+    def generate(self, modeling: ModelingOutput, user_config: Dict[str, Any]) -> GenerationOutput:
+        """Gera o texto do relatório com o agente de NLP."""
+        response = self.nlp_generation_agent.execute({
+            "data": modeling.report_data(),
+            "persona": user_config["persona"]
+        })
+        if response["status"] != "success":
+            raise PipelineStageError("generate", response["message"])
+        annotate(chars=len(response["insights"]))
+        return GenerationOutput(insights=response["insights"])
+
+    def render(self, modeling: ModelingOutput, user_config: Dict[str, Any]) -> ChartOutput:
+        """Renderiza os gráficos do relatório; os já desenhados para outro usuário vêm do cache."""
+        if self.chart_renderer is None:
+            return ChartOutput()
+        requests = chart_requests(modeling.report_data(), user_config)
+        paths = self.chart_renderer.render_many(requests)
+        annotate(charts=len(requests))
+        return ChartOutput(charts=[
+            {"tipo": chart_type, "arquivo": path, "legenda": CHART_CAPTIONS.get(chart_type, chart_type)}
+            for (chart_type, _), path in zip(requests, paths) if path
+        ])
+
+    def export(self, modeling: ModelingOutput, user_config: Dict[str, Any]) -> ExportOutput:
+        """Exporta as tabelas detalhadas; usuários com os mesmos dados recebem a mesma planilha."""
+        if self.report_exporter is None:
+            return ExportOutput()
+        path = self.report_exporter.export(modeling.report_data(), user_config)
+        if path is None:
+            return ExportOutput()
+        annotate(bytes=os.path.getsize(path))
+        extension = Path(path).name.split(".", 1)[1]
+        return ExportOutput(files=[{
+            "tipo": "exportacao",
+            "arquivo": path,
+            "nome": f"relatorio_vendas_{modeling.kpis.get('ultima_data', 'detalhado')}.{extension}",
+            "legenda": "Tabelas detalhadas do relatório"
+        }])
+
+    def dispatch(self, generation: GenerationOutput, charts: ChartOutput, export: ExportOutput,
+                 user_config: Dict[str, Any]) -> DispatchOutput:
+        """Envia o relatório e os anexos (gráficos e planilhas, como documentos) pelo agente do Telegram."""
+        response = self.telegram_dispatch_agent.execute({
+            "user_id": user_config["usuario_id"],
+            "insights": generation.insights,
+            "attachments": charts.charts + export.files,
+            "user_config": user_config
+        })
+        if response["status"] != "success":
+            raise PipelineStageError("dispatch", response["message"])
+        return DispatchOutput(message=response["message"])
+
+    def cache_result(self, result: PipelineResult) -> None:
+        """Publica os resultados da modelagem (e o texto, se gerado) para consultas sob demanda."""
+        entry = result.modeling.report_data()
+        entry["insights"] = result.generation.insights if result.generation else None
+        self.result_cache.put(result.user_id, entry)
+
+    def _checkpointed(self, result: PipelineResult, run_key: Optional[str], resume: bool,
+                      stage: str, func: Callable, *args):
+        """Executa a etapa ou, se ela já foi concluída nesta execução, carrega a saída salva.
+
+        Saídas com anexos (gráficos, planilhas) só são retomadas se todos os
+        arquivos ainda existem: a limpeza por tamanho do cache de artefatos
+        pode removê-los entre o pré-cálculo e o envio, e aí a etapa é refeita.
+        """
+        if run_key is None:
+            return self._timed(result, stage, func, *args)
+        output = self._resumed(result, run_key, resume, stage)
+        if output is not None:
+            return output
+        output = self._timed(result, stage, func, *args)
+        self.checkpoint_store.save(result.user_id, run_key, stage, output)
+        return output
+
+    def _resumed(self, result: PipelineResult, run_key: Optional[str], resume: bool, stage: str):
+        """Saída salva da etapa, se pode ser retomada; None quando a etapa precisa rodar."""
+        if run_key is None or not resume:
+            return None
+        output = self.checkpoint_store.load(result.user_id, run_key, stage)
+        if output is None:
+            return None
+        missing = [item["arquivo"] for item in getattr(output, "attachments", [])
+                   if not os.path.exists(item["arquivo"])]
+        if missing:
+            logger.warning(f"Etapa {stage} de {result.user_id} refeita: {len(missing)} anexo(s) removido(s) do cache")
+            return None
+        result.resumed.append(stage)
+        return output
+
+    def _report_stages(self, result: PipelineResult, run_key: Optional[str], resume: bool,
+                       stages: Tuple[str, ...], user_config: Dict[str, Any]) -> None:
+        """Executa texto, gráficos e planilha ao mesmo tempo: os três dependem só da modelagem.
+
+        A chamada ao LLM não segura mais a renderização e a exportação (que
+        usam seus próprios pools de processos). Todas terminam antes do
+        envio; se mais de uma falhar, o erro reportado é o da primeira na
+        ordem do pipeline, e as que concluíram ficam salvas para a retomada.
+        """
+        report_stages = [stage for stage in REPORT_STAGES if stage in stages]
+        if not report_stages:
+            return
+        with ThreadPoolExecutor(max_workers=len(report_stages)) as executor:
+            futures = {
+                stage: submit_in_context(executor, self._checkpointed, result, run_key, resume, stage,
+                                         getattr(self, stage), result.modeling, user_config)
+                for stage in report_stages
+            }
+        errors = []
+        for stage, future in futures.items():
+            try:
+                setattr(result, REPORT_STAGES[stage], future.result())
+            except PipelineStageError as e:
+                errors.append(e)
+        # As etapas retomadas entram na ordem do pipeline, não na ordem em que terminaram
+        result.resumed.sort(key=STAGES.index)
+        if errors:
+            raise errors[0]
+
+    def effective_config(self, user_config: Dict[str, Any]) -> Dict[str, Any]:
+        """Configuração do usuário mesclada sobre os padrões gerais e da persona."""
+        return effective_config(user_config, self.persona_defaults)
+
+    def run(self, user_config: Dict[str, Any], resume: bool = True, until: Optional[str] = None,
+            run_date: Optional[date] = None) -> PipelineResult:
+        """Executa todas as etapas para um usuário.
+
+        Com um `CheckpointStore`, cada etapa concluída é salva e uma nova
+        tentativa (automática, até `max_attempts`, ou manual) retoma da
+        primeira etapa que falta. `resume=False` ignora o que já foi salvo.
+        `until` para depois da etapa indicada: o pré-cálculo roda até
+        "export" e a execução no horário preferido, com o mesmo `run_date`,
+        só faz o envio.
+        A configuração do usuário é completada com os padrões da persona
+        (`effective_config`) antes da primeira etapa.
+        """
+        user_config = self.effective_config(user_config)
+        stages = STAGES[:STAGES.index(until) + 1] if until else STAGES
+        result = PipelineResult(user_id=user_config["usuario_id"])
+        start = time.perf_counter()
+        run_key = None
+        if self.checkpoint_store is not None:
+            run_key = self.checkpoint_store.run_key(user_config, run_date)
+            self.checkpoint_store.prune(result.user_id)
+
+        for attempt in range(1, self.max_attempts + 1):
+            result.attempts = attempt
+            with instrumented_run(result.user_id, self.instrumentation) as profile:
+                try:
+                    # A ingestão (o DataFrame inteiro) só é carregada ou refeita se a modelagem precisa rodar
+                    modeling = self._resumed(result, run_key, resume, "model") if "model" in stages else None
+                    if modeling is None:
+                        result.ingestion = self._checkpointed(result, run_key, resume, "ingest", self.ingest, user_config)
+                        if "model" in stages:
+                            modeling = self._checkpointed(result, run_key, False, "model", self.model, result.ingestion, user_config)
+                    result.modeling = modeling
+                    self._report_stages(result, run_key, resume, stages, user_config)
+                    if "dispatch" in stages:
+                        result.dispatch = self._checkpointed(result, run_key, resume, "dispatch", self.dispatch, result.generation, result.charts, result.export, user_config)
+                    result.status, result.error, result.failed_stage = "success", None, None
+                except PipelineStageError as e:
+                    result.status = "error"
+                    result.failed_stage = e.stage
+                    result.error = str(e)
+                profile.status = result.status
+            if result.status == "success" or attempt == self.max_attempts:
+                break
+            # As etapas concluídas ficam salvas: a próxima tentativa refaz só a que falhou
+            logger.warning(f"Tentativa {attempt} falhou para {result.user_id} ({result.error}), repetindo em {self.retry_delay * attempt:.0f}s")
+            time.sleep(self.retry_delay * attempt)
+            resume = True
+        if self.timing_history is not None:
+            # Só etapas executadas por completo alimentam a estimativa de duração
+            self.timing_history.record(result.user_id, {
+                stage: seconds for stage, seconds in result.timings.items()
+                if stage not in result.resumed and stage != result.failed_stage
+            })
+        result.timings["total"] = time.perf_counter() - start
+        if self.result_cache is not None and result.modeling is not None:
+            self.cache_result(result)
+
+        timings = ", ".join(f"{stage}={seconds:.2f}s" for stage, seconds in result.timings.items())
+        resumed = f" (retomado: {', '.join(result.resumed)})" if result.resumed else ""
+        logger.info(f"Pipeline {result.status} para usuário {result.user_id}: {timings}{resumed}")
+        return result
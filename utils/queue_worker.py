@@ -0,0 +1,124 @@
+from typing import Dict, Any, Callable, Optional
+from datetime import date
+from pathlib import Path
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+from utils.job_queue import SQLiteJobQueue, Job
+
+logger = logging.getLogger(__name__)
+
+JOB_PIPELINE = "pipeline"
+
+class QueueWorker:
+    """Trabalhador que retira jobs da fila e executa o pipeline.
+
+    Enquanto um job roda, uma thread renova o lease a cada
+    `heartbeat_interval` segundos. Um job que termina com erro volta para a
+    fila; como as etapas concluídas ficam no `CheckpointStore`, a nova
+    tentativa (neste ou em outro trabalhador com o mesmo diretório de
+    checkpoints) só refaz a etapa que falhou.
+    """
+
+    def __init__(self, queue: SQLiteJobQueue, runner, worker_id: Optional[str] = None,
+                 poll_interval: float = 2.0, heartbeat_interval: Optional[float] = None):
+        self.queue = queue
+        self.runner = runner
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval or max(queue.lease_seconds / 3, 1)
+        self.handlers: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+            JOB_PIPELINE: self.run_pipeline
+        }
+
+    def run_pipeline(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        run_date = payload.get("data_execucao")
+        result = self.runner.run(
+            payload["user_config"],
+            until=payload.get("ate_etapa"),
+            run_date=date.fromisoformat(run_date) if run_date else None
+        ).to_dict()
+        if result["status"] != "success":
+            raise RuntimeError(result["error"])
+        return result
+
+    def _heartbeat(self, job: Job, done: threading.Event) -> None:
+        while not done.wait(self.heartbeat_interval):
+            if not self.queue.heartbeat(job.id, self.worker_id):
+                logger.warning(f"Lease do job {job.id} perdido por {self.worker_id}")
+                return
+
+    def process(self, job: Job) -> bool:
+        """Executa um job e registra o resultado na fila."""
+        handler = self.handlers.get(job.kind)
+        if handler is None:
+            self.queue.fail(job.id, self.worker_id, f"Tipo de job desconhecido: {job.kind}")
+            return False
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job, done), daemon=True)
+        heartbeat.start()
+        try:
+            result = handler(job.payload)
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.job_key}) falhou na tentativa {job.attempts}: {str(e)}")
+            self.queue.fail(job.id, self.worker_id, str(e))
+            return False
+        finally:
+            done.set()
+            heartbeat.join()
+        if not self.queue.complete(job.id, self.worker_id, result):
+            logger.warning(f"Job {job.id} concluído após perder o lease; resultado descartado")
+        return True
+
+    def run_once(self) -> int:
+        """Processa o próximo job disponível; retorna 0 se a fila estava vazia."""
+        jobs = self.queue.claim(self.worker_id)
+        for job in jobs:
+            self.process(job)
+        return len(jobs)
+
+    def run(self, stop_event) -> None:
+        """Processa jobs até `stop_event` ser sinalizado (verificado entre jobs)."""
+        logger.info(f"Trabalhador {self.worker_id} aguardando jobs")
+        while not stop_event.is_set():
+            if not self.run_once():
+                stop_event.wait(self.poll_interval)
+
+def build_queue(settings: Dict[str, Any]) -> SQLiteJobQueue:
+    """Cria a fila a partir da seção 'fila' do system_config.json."""
+    return SQLiteJobQueue(
+        Path(settings.get("arquivo", "data/state/fila.db")),
+        lease_seconds=settings.get("lease_segundos", 300),
+        max_attempts=settings.get("max_tentativas", 3),
+        retry_delay=settings.get("intervalo_tentativas_segundos", 30)
+    )
+
+def _worker_main(settings: Dict[str, Any], runner_factory: Callable, stop_event) -> None:
+    # O processo principal trata os sinais e encerra os trabalhadores pelo stop_event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    queue = build_queue(settings)
+    runner = runner_factory()
+    # A fila controla as novas tentativas; o runner faz uma tentativa por job
+    runner.max_attempts = 1
+    try:
+        QueueWorker(queue, runner, poll_interval=settings.get("intervalo_busca_segundos", 2)).run(stop_event)
+    finally:
+        queue.close()
+
+def start_workers(settings: Dict[str, Any], processes: int, runner_factory: Callable):
+    """Inicia `processes` trabalhadores e retorna (processos, evento de parada)."""
+    context = multiprocessing.get_context("spawn")
+    stop_event = context.Event()
+    workers = [
+        context.Process(target=_worker_main, args=(settings, runner_factory, stop_event),
+                        name=f"queue-worker-{i}", daemon=False)
+        for i in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    return workers, stop_event
@@ -0,0 +1,431 @@
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import date, datetime, timedelta
+from pathlib import Path
+import json
+import logging
+import re
+import shutil
+import threading
+import pandas as pd
+import numpy as np
+import pytz
+
+from models.anomaly_detection import AnomalyDetector, segment_totals
+from utils.deadline_planner import DEFAULT_TIMEZONE, user_timezone
+from utils.data_loader import load_data_file
+from utils.catalog import get_catalog
+
+logger = logging.getLogger(__name__)
+
+# Nomes de tabela (opcionalmente com esquema) e coluna aceitos na consulta da marca d'água
+_SQL_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)?")
+
+class DropDirectorySource:
+    """Lê arquivos de vendas depositados em um diretório de entrada.
+
+    Os arquivos devem ser gravados com outro sufixo (ex.: .part) e renomeados
+    ao final, para que nunca sejam lidos pela metade. Após a leitura são
+    movidos para o subdiretório 'processados'; os que não puderem ser lidos
+    vão para 'rejeitados', para que os dados não se percam.
+    """
+
+    SUFFIXES = ('.csv', '.json', '.xlsx')
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.processed_dir = self.directory / "processados"
+        self.processed_dir.mkdir(parents=True, exist_ok=True)
+        self.rejected_dir = self.directory / "rejeitados"
+        self.rejected_dir.mkdir(parents=True, exist_ok=True)
+
+    def poll(self) -> pd.DataFrame:
+        """Retorna as linhas dos arquivos novos desde a última leitura."""
+        files = sorted(
+            (p for p in self.directory.iterdir() if p.is_file() and p.suffix in self.SUFFIXES),
+            key=lambda p: p.stat().st_mtime
+        )
+        frames = []
+        for path in files:
+            try:
+                frames.append(load_data_file(str(path)))
+            except Exception as e:
+                logger.error(f"Erro ao ler arquivo de vendas {path}, movido para {self.rejected_dir}: {str(e)}")
+                shutil.move(str(path), str(self.rejected_dir / path.name))
+                continue
+            shutil.move(str(path), str(self.processed_dir / path.name))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+class SQLWatermarkSource:
+    """Lê apenas as linhas novas de uma tabela SQL a partir de uma marca d'água.
+
+    Tabela e coluna vêm da configuração e entram no texto da consulta (não
+    podem ser parâmetros), por isso só são aceitos identificadores simples.
+    """
+
+    def __init__(self, connection_string: str, table: str, column: str, state_path: Path):
+        for name in (table, column):
+            if not isinstance(name, str) or not _SQL_IDENTIFIER.fullmatch(name):
+                raise ValueError(f"Identificador SQL inválido na fonte de alertas: {name!r}")
+        self.connection_string = connection_string
+        self.table = table
+        self.column = column
+        self.state_path = Path(state_path)
+        self.watermark = self._load_watermark()
+
+    def _load_watermark(self) -> Any:
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)["marca"]
+        except FileNotFoundError:
+            return None
+
+    def _save_watermark(self) -> None:
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_name(self.state_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"marca": self.watermark}, f, default=str)
+        tmp_path.replace(self.state_path)
+
+    def poll(self) -> pd.DataFrame:
+        """Retorna as linhas com marca maior que a última processada."""
+        from sqlalchemy import text
+
+        if self.watermark is None:
+            query = text(f"SELECT * FROM {self.table} ORDER BY {self.column}")
+            params = {}
+        else:
+            query = text(f"SELECT * FROM {self.table} WHERE {self.column} > :marca ORDER BY {self.column}")
+            params = {"marca": self.watermark}
+
+        df = pd.read_sql(query, self.connection_string, params=params)
+        if not df.empty:
+            self.watermark = df[self.column].max()
+            if isinstance(self.watermark, np.generic):
+                self.watermark = self.watermark.item()
+            self._save_watermark()
+        return df
+
+class RealtimeAlertEngine:
+    """Avalia as regras de `alertas` a cada lote de linhas novas.
+
+    Usuários com os mesmos segmentos e métrica compartilham um único
+    AnomalyDetector. Os totais do dia corrente são acumulados apenas para as
+    chaves tocadas pelo lote, de modo que cada evento custa O(linhas novas):
+
+    - anomalias: altas são sinalizadas durante o dia, assim que o total
+      parcial ultrapassa a linha de base; quedas, no fechamento do dia;
+    - tendencias: média rápida contra média lenta, no fechamento do dia;
+    - metas: `meta_diaria` atingida durante o dia ou não atingida no fechamento.
+
+    Os totais parciais do dia corrente ficam apenas em memória. O dia de um
+    grupo fecha quando chega a primeira linha do dia seguinte ou em
+    `close_day`, agendado para a meia-noite do fuso dos usuários; por isso
+    os grupos também são separados por fuso horário. Usuários com `z_anomalia`
+    ou `periodos_minimos` diferentes ficam em grupos separados, que avançam
+    o mesmo estado salvo.
+
+    Com `previous`, o motor substitui outro (recarga das configurações) e
+    herda dele os totais parciais do dia e os alertas já enviados.
+    """
+
+    def __init__(self, user_configs: List[Dict[str, Any]], state_dir: Path,
+                 default_timezone: str = DEFAULT_TIMEZONE, previous: Optional["RealtimeAlertEngine"] = None):
+        self.state_dir = Path(state_dir)
+        self.default_timezone = default_timezone
+        self.groups: Dict[Tuple[str, float, int], Dict[str, Any]] = {}
+        # process (thread do monitoramento) e close_day (agendador) alteram os mesmos grupos
+        self._lock = threading.Lock()
+        # Alertas já enviados por (usuário, dia); as entradas saem quando o dia fecha
+        self.sent: Dict[Tuple[str, str], set] = {}
+        self.catalog = get_catalog(Path("data"))
+
+        for config in user_configs:
+            if not config.get('alertas'):
+                continue
+            timezone = user_timezone(config, default_timezone).zone
+            # O fuso padrão mantém o nome de estado de antes da separação por fuso
+            scope = None if timezone == default_timezone else f"fuso:{timezone}"
+            detector = AnomalyDetector(config, self.state_dir, scope=scope)
+            group = self.groups.setdefault((detector.state_key(), detector.z_threshold, detector.min_periods), {
+                'detector': detector,
+                'users': [],
+                'partial': {},
+                'day': None,
+                'timezone': timezone
+            })
+            group['users'].append(config)
+
+        for group in self.groups.values():
+            # O detector compartilhado sinaliza com o menor limiar; cada usuário filtra pelo seu
+            detector = group['detector']
+            alertas = [user['alertas'] for user in group['users']]
+            detector.threshold = min(
+                min(a.get('threshold_anomalia', 0.2), a.get('threshold_tendencia', a.get('threshold_anomalia', 0.2)))
+                for a in alertas
+            )
+            detector.max_alerts = max(a.get('max_alertas', 10) for a in alertas)
+
+        if previous is not None:
+            self._take_over(previous)
+
+    def _take_over(self, previous: "RealtimeAlertEngine") -> None:
+        """Herda o dia aberto do motor anterior, que fica sem grupos.
+
+        As linhas do dia corrente já saíram da fonte e só existem nos totais
+        parciais do motor anterior. O estado salvo é relido sob o lock dele,
+        para incluir um fechamento de dia que tenha ocorrido depois que os
+        detectores deste motor foram criados; e um fechamento agendado que
+        ainda chegue ao motor anterior não encontra grupos para fechar.
+        """
+        with previous._lock:
+            open_days = {group['detector'].state_key(): group for group in previous.groups.values()}
+            for group in self.groups.values():
+                detector = group['detector']
+                if detector.state_path and detector.state_path.exists():
+                    detector.load(detector.state_path)
+                old = open_days.get(detector.state_key())
+                if old is not None:
+                    group['partial'] = dict(old['partial'])
+                    group['day'] = old['day']
+            self.sent = previous.sent
+            previous.groups = {}
+            previous.sent = {}
+
+    def process(self, rows: pd.DataFrame) -> Dict[str, List[Dict[str, Any]]]:
+        """Incorpora um lote de linhas e retorna os alertas novos por usuário."""
+        alerts: Dict[str, List[Dict[str, Any]]] = {}
+        if rows.empty:
+            return alerts
+
+        with self._lock:
+            for group in self.groups.values():
+                for user_id, user_alerts in self._process_group(group, rows):
+                    alerts.setdefault(user_id, []).extend(self.catalog.enrich_alerts(user_alerts))
+        return alerts
+
+    def timezones(self) -> List[str]:
+        """Fusos horários dos grupos, para agendar o fechamento do dia de cada um."""
+        return sorted({group['timezone'] for group in self.groups.values()})
+
+    def close_day(self, timezone: Optional[str] = None, through: Optional[date] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Fecha o dia corrente dos grupos do fuso informado (todos, sem `timezone`).
+
+        Com `through`, só fecha grupos cujo dia corrente é até essa data: um
+        grupo que já recebeu linhas do dia seguinte não é fechado de novo.
+        """
+        alerts: Dict[str, List[Dict[str, Any]]] = {}
+        with self._lock:
+            for group in self.groups.values():
+                if timezone is not None and group['timezone'] != timezone:
+                    continue
+                if through is not None and group['day'] is not None and group['day'].date() > through:
+                    continue
+                for user_id, user_alerts in self._close_day(group):
+                    alerts.setdefault(user_id, []).extend(self.catalog.enrich_alerts(user_alerts))
+        return alerts
+
+    def _process_group(self, group: Dict[str, Any], rows: pd.DataFrame) -> List[Tuple[str, List[Dict]]]:
+        detector = group['detector']
+        events = []
+        totals = segment_totals(rows, detector.segments, detector.metric)
+        for date, day in totals.groupby('date', sort=True):
+            date = pd.Timestamp(date)
+            if detector.last_date is not None and date <= detector.last_date:
+                # Linhas atrasadas de dias já fechados não alteram o estado
+                continue
+            if group['day'] is not None and date < group['day']:
+                # Dia anterior ao aberto que nunca foi fechado: somá-lo ao parcial misturaria os
+                # dois dias, e incorporá-lo agora poria o estado fora de ordem
+                logger.warning(f"{len(day)} totais atrasados de {date.date()} ignorados "
+                               f"(dia aberto: {group['day'].date()})")
+                continue
+            if group['day'] is not None and date > group['day']:
+                events.extend(self._close_day(group))
+            group['day'] = date
+
+            partial = group['partial']
+            for key, value in zip(day['key'].to_numpy(), day['value'].to_numpy()):
+                partial[key] = partial.get(key, 0.0) + value
+            events.extend(self._intraday(group, pd.unique(day['key'].to_numpy())))
+        return events
+
+    def _intraday(self, group: Dict[str, Any], keys: np.ndarray) -> List[Tuple[str, List[Dict]]]:
+        """Avalia altas e metas apenas nas chaves alteradas pelo lote."""
+        detector = group['detector']
+        date = group['day'].strftime('%Y-%m-%d')
+        values = np.array([group['partial'][key] for key in keys])
+        base = detector.baseline(keys)
+        deviation = (values - base['mean']) / np.maximum(np.abs(base['mean']), 1e-9)
+        above = (base['count'] >= detector.min_periods) & \
+            (values - base['mean'] >= detector.z_threshold * np.maximum(base['std'], 1e-9))
+
+        events = []
+        for user in group['users']:
+            alertas = user['alertas']
+            user_alerts = []
+            if alertas.get('anomalias'):
+                threshold = alertas.get('threshold_anomalia', 0.2)
+                flagged = np.flatnonzero(above & (deviation > threshold))
+                flagged = flagged[np.argsort(-deviation[flagged])][:alertas.get('max_alertas', 10)]
+                for i in flagged:
+                    segment, _, value = str(keys[i]).partition('=')
+                    user_alerts.append({
+                        'regra': 'anomalias',
+                        'data': date,
+                        'segmento': segment,
+                        'valor': value or segment,
+                        'observado': round(float(values[i]), 2),
+                        'esperado': round(float(base['mean'][i]), 2),
+                        'desvio': round(float(deviation[i]), 4),
+                        'tipo': 'alta'
+                    })
+            meta = alertas.get('meta_diaria')
+            if alertas.get('metas') and meta and group['partial'].get('geral', 0.0) >= meta:
+                user_alerts.append({
+                    'regra': 'metas',
+                    'data': date,
+                    'observado': round(float(group['partial']['geral']), 2),
+                    'meta': meta,
+                    'tipo': 'atingida'
+                })
+            events.append((user['usuario_id'], self._unsent(user['usuario_id'], user_alerts)))
+        return events
+
+    def _close_day(self, group: Dict[str, Any]) -> List[Tuple[str, List[Dict]]]:
+        """Incorpora o dia corrente ao estado e avalia quedas, tendências e metas."""
+        if group['day'] is None or not group['partial']:
+            return []
+        detector = group['detector']
+        date = group['day']
+        day = pd.DataFrame({
+            'date': date,
+            'key': list(group['partial'].keys()),
+            'value': list(group['partial'].values())
+        })
+        anomalies = detector.update(day)
+        trends = detector.trends()
+        if detector.state_path:
+            detector.save(detector.state_path)
+        total = group['partial'].get('geral', 0.0)
+        group['partial'] = {}
+        group['day'] = None
+
+        events = []
+        for user in group['users']:
+            alertas = user['alertas']
+            threshold = alertas.get('threshold_anomalia', 0.2)
+            max_alerts = alertas.get('max_alertas', 10)
+            user_alerts = []
+            if alertas.get('anomalias'):
+                user_alerts.extend([
+                    dict(alert, regra='anomalias') for alert in anomalies
+                    if abs(alert['desvio']) > threshold
+                ][:max_alerts])
+            if alertas.get('tendencias'):
+                trend_threshold = alertas.get('threshold_tendencia', threshold)
+                user_alerts.extend([
+                    dict(trend, regra='tendencias', data=date.strftime('%Y-%m-%d')) for trend in trends
+                    if abs(trend['variacao']) > trend_threshold
+                ][:max_alerts])
+            meta = alertas.get('meta_diaria')
+            if alertas.get('metas') and meta and total < meta:
+                user_alerts.append({
+                    'regra': 'metas',
+                    'data': date.strftime('%Y-%m-%d'),
+                    'observado': round(float(total), 2),
+                    'meta': meta,
+                    'tipo': 'nao_atingida'
+                })
+            events.append((user['usuario_id'], self._unsent(user['usuario_id'], user_alerts)))
+            # Linhas atrasadas de um dia fechado são ignoradas: o registro do dia não é mais necessário
+            self.sent.pop((user['usuario_id'], date.strftime('%Y-%m-%d')), None)
+        return events
+
+    def _unsent(self, user_id: str, alerts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Descarta alertas já enviados ao usuário no mesmo dia."""
+        fresh = []
+        for alert in alerts:
+            sent = self.sent.setdefault((user_id, alert['data']), set())
+            key = (alert['regra'], alert.get('segmento'), alert.get('valor'), alert['tipo'])
+            if key not in sent:
+                sent.add(key)
+                fresh.append(alert)
+        return fresh
+
+class AlertWatcher:
+    """Consulta uma fonte de vendas em intervalos curtos e envia os alertas pelo Telegram."""
+
+    def __init__(self, source, engine: RealtimeAlertEngine, dispatcher, interval: float = 5.0):
+        self.source = source
+        self.engine = engine
+        self.dispatcher = dispatcher
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def close_day(self, timezone: str) -> int:
+        """Fecha o dia que terminou no fuso informado e envia os alertas de fechamento.
+
+        Agendado para logo após a meia-noite de cada fuso, para que quedas,
+        tendências e metas não atingidas não esperem a primeira venda do dia seguinte.
+        """
+        through = datetime.now(pytz.timezone(timezone)).date() - timedelta(days=1)
+        sent = 0
+        for user_id, alerts in self.engine.close_day(timezone, through).items():
+            if alerts:
+                self.dispatcher.dispatch_alerts(user_id, alerts)
+                sent += len(alerts)
+        return sent
+
+    def run_once(self) -> int:
+        """Processa uma leitura da fonte e retorna o número de linhas novas."""
+        rows = self.source.poll()
+        if rows.empty:
+            return 0
+        for user_id, alerts in self.engine.process(rows).items():
+            if alerts:
+                self.dispatcher.dispatch_alerts(user_id, alerts)
+        return len(rows)
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Erro no monitoramento de alertas: {str(e)}")
+            self._stop_event.wait(self.interval)
+
+    def start(self) -> None:
+        """Inicia o monitoramento em uma thread de segundo plano."""
+        self._thread = threading.Thread(target=self._run, name="alert-watcher", daemon=True)
+        self._thread.start()
+        logger.info("Monitoramento de alertas em tempo real iniciado")
+
+    def stop(self) -> None:
+        """Interrompe o monitoramento e aguarda a thread terminar."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+
+def build_alert_watcher(settings: Dict[str, Any], user_configs: List[Dict[str, Any]], dispatcher,
+                        default_timezone: str = DEFAULT_TIMEZONE,
+                        previous: Optional[AlertWatcher] = None) -> AlertWatcher:
+    """Cria o AlertWatcher a partir da seção `alertas_tempo_real` de system_config.json.
+
+    Com `previous` (já parado), reaproveita a fonte e o dia aberto do monitoramento anterior.
+    """
+    state_dir = Path(settings.get("diretorio_estado", "data/state/tempo_real"))
+    if previous is not None:
+        source = previous.source
+    elif settings.get("fonte", "diretorio") == "sql":
+        source = SQLWatermarkSource(
+            settings["connection_string"],
+            settings.get("tabela", "sales"),
+            settings.get("coluna_marca", "id"),
+            state_dir / "marca_sql.json"
+        )
+    else:
+        source = DropDirectorySource(settings.get("diretorio", "data/incoming"))
+    engine = RealtimeAlertEngine(user_configs, state_dir, default_timezone,
+                                 previous=previous.engine if previous is not None else None)
+    return AlertWatcher(source, engine, dispatcher, settings.get("intervalo_segundos", 5))
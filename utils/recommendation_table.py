@@ -0,0 +1,201 @@
+from typing import Dict, Any, List, Optional
+from pathlib import Path
+import hashlib
+import json
+import logging
+import shutil
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+POINTER_FILE = "atual.json"
+
+def key_hash(user_id: Any) -> int:
+    """Hash estável de 64 bits do id (o mesmo em todos os processos, ao contrário de `hash`)."""
+    return int.from_bytes(hashlib.blake2b(str(user_id).encode("utf-8"), digest_size=8).digest(), "little")
+
+def _build_index(hashes: np.ndarray) -> np.ndarray:
+    """Tabela hash com sondagem linear: posição -> linha (-1 = vazia). Capacidade >= 2x usuários."""
+    capacity = 1 << max(4, int(2 * len(hashes) - 1).bit_length())
+    slots = np.full(capacity, -1, dtype=np.int64)
+    mask = capacity - 1
+    for row, h in enumerate(hashes.tolist()):
+        slot = h & mask
+        while slots[slot] != -1:
+            slot = (slot + 1) & mask
+        slots[slot] = row
+    return slots
+
+def _fixed_width(values) -> np.ndarray:
+    """Array sem objetos Python (números ou texto de largura fixa), que pode ser mapeado em memória."""
+    values = np.asarray(values)
+    return values.astype(str) if values.dtype == object else values
+
+def publish_table(table_dir: Path, users: np.ndarray, products: np.ndarray, indices: np.ndarray,
+                  scores: np.ndarray, product_names: Optional[List[str]] = None,
+                  metadata: Optional[Dict[str, Any]] = None, keep_versions: int = 2) -> Path:
+    """Grava uma nova versão da tabela e a publica trocando o ponteiro de forma atômica.
+
+    Cada versão fica em um diretório próprio com arquivos .npy:
+    - linhas.npy: array estruturado de largura fixa, uma linha por usuário
+      (id, quantidade, índices dos produtos, notas);
+    - hashes.npy / indice.npy: hash de 64 bits de cada id e a tabela de
+      posições (sondagem linear) que leva do hash à linha;
+    - produtos.npy / nomes.npy: ids e nomes dos produtos referenciados
+      pelos índices.
+    Leitores já abertos continuam na versão antiga até verem o novo
+    ponteiro; as versões além de `keep_versions` são removidas.
+    """
+    table_dir = Path(table_dir)
+    version = f"v{time.time_ns()}"
+    version_dir = table_dir / version
+    version_dir.mkdir(parents=True, exist_ok=True)
+
+    user_keys = np.array([str(user).encode("utf-8") for user in users], dtype=bytes)
+    top_n = indices.shape[1]
+    dtype = np.dtype([
+        ("usuario", user_keys.dtype if len(user_keys) else "S1"),
+        ("quantidade", "<u2"),
+        ("produto", "<i4", (top_n,)),
+        ("nota", "<f4", (top_n,))
+    ])
+    rows = np.zeros(len(users), dtype=dtype)
+    rows["usuario"] = user_keys
+    rows["quantidade"] = (indices >= 0).sum(axis=1)
+    rows["produto"] = indices
+    rows["nota"] = scores
+    hashes = np.array([key_hash(user) for user in users], dtype=np.uint64)
+
+    np.save(version_dir / "linhas.npy", rows)
+    np.save(version_dir / "hashes.npy", hashes)
+    np.save(version_dir / "indice.npy", _build_index(hashes))
+    np.save(version_dir / "produtos.npy", _fixed_width(products))
+    np.save(version_dir / "nomes.npy", _fixed_width(product_names if product_names is not None else [""] * len(products)))
+    pointer = dict(metadata or {}, versao=version, usuarios=len(users), top_n=top_n, publicado_em=time.time())
+    pointer_path = table_dir / POINTER_FILE
+    tmp_path = pointer_path.with_name(pointer_path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(pointer, f, ensure_ascii=False, default=str)
+    tmp_path.replace(pointer_path)
+
+    # Processos com a versão antiga mapeada seguem lendo os arquivos já abertos
+    versions = sorted(p for p in table_dir.iterdir() if p.is_dir() and p.name.startswith("v"))
+    for old in versions[:-keep_versions] if keep_versions else []:
+        if old.name != version:
+            shutil.rmtree(old, ignore_errors=True)
+    return version_dir
+
+class RecommendationTable:
+    """Consulta às recomendações pré-calculadas de um usuário em O(1), sem pandas.
+
+    Os arquivos da versão publicada são mapeados em memória (`mmap_mode='r'`):
+    abrir a tabela não lê os dados e uma consulta toca apenas a posição do
+    índice e a linha do usuário. O ponteiro da versão é verificado no máximo
+    a cada `check_interval` segundos; quando muda, a nova versão é mapeada.
+    """
+
+    def __init__(self, table_dir: Path, check_interval: float = 5.0):
+        self.table_dir = Path(table_dir)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._pointer_mtime: Optional[int] = None
+        self._checked_at = 0.0
+        # (linhas, hashes, índice, produtos, nomes) da versão atual, trocados juntos
+        self._state = None
+        self.metadata: Dict[str, Any] = {}
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval and self._state is not None:
+            return
+        with self._lock:
+            self._checked_at = now
+            pointer_path = self.table_dir / POINTER_FILE
+            try:
+                mtime = pointer_path.stat().st_mtime_ns
+            except FileNotFoundError:
+                return
+            if mtime == self._pointer_mtime:
+                return
+            try:
+                with open(pointer_path, "r", encoding="utf-8") as f:
+                    pointer = json.load(f)
+                version_dir = self.table_dir / pointer["versao"]
+                rows = np.load(version_dir / "linhas.npy", mmap_mode="r")
+                hashes = np.load(version_dir / "hashes.npy", mmap_mode="r")
+                index = np.load(version_dir / "indice.npy", mmap_mode="r")
+                products = np.load(version_dir / "produtos.npy", mmap_mode="r")
+                names = np.load(version_dir / "nomes.npy", mmap_mode="r")
+            except Exception as e:
+                logger.error(f"Erro ao abrir tabela de recomendações {self.table_dir}: {str(e)}")
+                return
+            # Views ndarray sobre o mapeamento: indexar np.memmap custa bem mais por acesso
+            self._state = tuple(np.asarray(array) for array in (rows, hashes, index, products, names))
+            self._version, self._pointer_mtime, self.metadata = pointer["versao"], mtime, pointer
+
+    @property
+    def version(self) -> Optional[str]:
+        self._refresh()
+        return self._version
+
+    @staticmethod
+    def _row(state, user_id: Any) -> Optional[int]:
+        rows, hashes, index = state[:3]
+        key = str(user_id).encode("utf-8")
+        h = key_hash(user_id)
+        mask = len(index) - 1
+        slot = h & mask
+        while True:
+            row = int(index[slot])
+            if row == -1:
+                return None
+            if int(hashes[row]) == h and rows[row]["usuario"] == key:
+                return row
+            slot = (slot + 1) & mask
+
+    def lookup(self, user_id: Any, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Recomendações do usuário, da maior nota para a menor ([] se ele não está na tabela)."""
+        self._refresh()
+        state = self._state
+        if state is None:
+            return []
+        row = self._row(state, user_id)
+        if row is None:
+            return []
+        rows, _, _, products, names = state
+        record = rows[row]
+        count = int(record["quantidade"]) if limit is None else min(int(record["quantidade"]), limit)
+        codes = record["produto"][:count]
+        recommendations = []
+        for product_id, name, score in zip(products[codes].tolist(), names[codes].tolist(), record["nota"][:count].tolist()):
+            recommendation = {"product_id": product_id, "score": score}
+            if name:
+                recommendation["product_name"] = name
+            recommendations.append(recommendation)
+        return recommendations
+
+class RecommendationTables:
+    """Tabelas de recomendações por usuário do sistema, em `base_dir/<usuario_id>`."""
+
+    def __init__(self, base_dir: Path = Path("data") / "state" / "recomendacoes", check_interval: float = 5.0):
+        self.base_dir = Path(base_dir)
+        self.check_interval = check_interval
+        self._tables: Dict[str, RecommendationTable] = {}
+        self._lock = threading.Lock()
+
+    def table_dir(self, owner_id: str) -> Path:
+        return self.base_dir / owner_id
+
+    def get(self, owner_id: str) -> RecommendationTable:
+        with self._lock:
+            table = self._tables.get(owner_id)
+            if table is None:
+                table = self._tables[owner_id] = RecommendationTable(self.table_dir(owner_id), self.check_interval)
+            return table
+
+    def lookup(self, owner_id: str, user_id: Any, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self.get(owner_id).lookup(user_id, limit)
@@ -0,0 +1,138 @@
+from typing import Dict, Any, List, Optional, Tuple
+from pathlib import Path
+import csv
+import gzip
+
+from utils.artifact_cache import ArtifactCache, content_key
+
+# Tabela: (cabeçalho, linhas)
+Table = Tuple[List[str], List[list]]
+
+FORECAST_COLUMNS = ["modelo", "data", "previsao", "limite_inferior", "limite_superior"]
+SEGMENT_COLUMNS = ["serie", "data", "previsao", "limite_inferior", "limite_superior"]
+
+def _forecast_row(record: Dict[str, Any]) -> list:
+    yhat = round(float(record["yhat"]), 2)
+    return [
+        str(record["ds"])[:10],
+        yhat,
+        round(float(record.get("yhat_lower", yhat)), 2),
+        round(float(record.get("yhat_upper", yhat)), 2)
+    ]
+
+def _records_table(records: List[Dict[str, Any]]) -> Table:
+    """Tabela com a união das chaves dos registros, na ordem em que aparecem."""
+    columns = list(dict.fromkeys(key for record in records for key in record))
+    rows = [[_cell(record.get(column)) for column in columns] for record in records]
+    return columns, rows
+
+def _cell(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+def export_tables(report_data: Dict[str, Any]) -> Dict[str, Table]:
+    """Tabelas detalhadas do relatório: previsões, segmentos, recomendações e anomalias.
+
+    As tabelas vazias são omitidas. Os valores já vêm arredondados, para que
+    relatórios com os mesmos dados gerem exatamente o mesmo conteúdo.
+    """
+    forecasts = report_data.get("previsoes", {})
+    kpis = report_data.get("kpis", {})
+    tables: Dict[str, Table] = {}
+
+    rows = [
+        [model] + _forecast_row(record)
+        for model in ("prophet", "xgboost")
+        for record in forecasts.get(model, {}).get("forecast") or []
+    ]
+    if rows:
+        tables["Previsao"] = (FORECAST_COLUMNS, rows)
+
+    segments = (forecasts.get("segmentos") or {}).get("previsoes") or {}
+    rows = [[key] + _forecast_row(record) for key, records in segments.items() for record in records]
+    if rows:
+        tables["Previsao por segmento"] = (SEGMENT_COLUMNS, rows)
+
+    rows = [
+        [level, segment, value]
+        for level in ("categoria", "regiao")
+        for segment, value in (kpis.get(f"receita_por_{level}") or {}).items()
+    ]
+    rows += [["produto", product.get("product_name") or product["product_id"], product["receita"]]
+             for product in kpis.get("top_produtos") or []]
+    if rows:
+        tables["Desempenho"] = (["nivel", "segmento", "receita_30d"], rows)
+
+    for name, key in (("Recomendacoes", "recomendacoes"), ("Anomalias", "anomalias")):
+        records = report_data.get(key) or []
+        if records:
+            tables[name] = _records_table(records)
+    return tables
+
+def write_xlsx(path: str, tables: Dict[str, Table]) -> None:
+    """Grava uma aba por tabela em modo write-only: as linhas vão direto para o arquivo."""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    workbook = Workbook(write_only=True)
+    bold = Font(bold=True)
+    for name, (columns, rows) in tables.items():
+        sheet = workbook.create_sheet(title=name[:31])
+        header = []
+        for column in columns:
+            cell = WriteOnlyCell(sheet, value=column)
+            cell.font = bold
+            header.append(cell)
+        sheet.append(header)
+        for row in rows:
+            sheet.append(row)
+    workbook.save(path)
+
+def write_csv_gz(path: str, tables: Dict[str, Table]) -> None:
+    """Caminho rápido: todas as tabelas em um CSV compactado, com a coluna 'tabela' na frente."""
+    with gzip.open(path, "wt", encoding="utf-8", newline="", compresslevel=6) as f:
+        writer = csv.writer(f, delimiter=";")
+        for name, (columns, rows) in tables.items():
+            writer.writerow(["tabela"] + columns)
+            writer.writerows([name] + row for row in rows)
+
+WRITERS = {
+    "xlsx": write_xlsx,
+    "csv.gz": write_csv_gz
+}
+
+class ReportExporter(ArtifactCache):
+    """Planilhas detalhadas dos relatórios, geradas uma vez por conteúdo e compartilhadas entre usuários."""
+
+    def __init__(self, cache_dir: Path = Path("data") / "state" / "exportacoes", file_format: str = "xlsx",
+                 personas: Optional[List[str]] = None, **options):
+        if file_format not in WRITERS:
+            raise ValueError(f"Formato de exportação desconhecido: {file_format}")
+        super().__init__(cache_dir, **options)
+        self.file_format = file_format
+        self.personas = personas
+
+    def export(self, report_data: Dict[str, Any], user_config: Dict[str, Any]) -> Optional[str]:
+        """Caminho da planilha do usuário, ou None se a persona não recebe exportação ou não há dados."""
+        if self.personas is not None and user_config.get("persona") not in self.personas:
+            return None
+        tables = export_tables(report_data)
+        if not tables:
+            return None
+        name = f"{content_key('relatorio', tables)}.{self.file_format}"
+        return self.get_many([(name, WRITERS[self.file_format], (tables,))])[0]
+
+def build_report_exporter(settings: Dict[str, Any]) -> Optional[ReportExporter]:
+    """Cria o exportador a partir da seção 'exportacao' do system_config.json (None se desativado)."""
+    if not settings.get("ativo", True):
+        return None
+    return ReportExporter(
+        Path(settings.get("diretorio_cache", "data/state/exportacoes")),
+        file_format=settings.get("formato", "xlsx"),
+        personas=settings.get("personas"),
+        max_workers=settings.get("processos"),
+        max_age_hours=settings.get("validade_horas", 24),
+        max_size_mb=settings.get("tamanho_maximo_mb", 500)
+    )
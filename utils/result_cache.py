@@ -0,0 +1,73 @@
+from typing import Dict, Any, Optional
+from pathlib import Path
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class ResultCache:
+    """Últimos resultados do pipeline por usuário (KPIs, previsões, recomendações, insights).
+
+    Cada usuário tem um arquivo JSON gravado de forma atômica no diretório
+    do cache, o que permite compartilhar os resultados entre o processo
+    principal, os processos trabalhadores e o bot. As leituras ficam em
+    memória e só voltam ao disco quando o arquivo muda.
+    """
+
+    def __init__(self, cache_dir: Path = Path("data") / "state" / "resultados"):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Any] = {}
+
+    def _path(self, user_id: str) -> Path:
+        return self.cache_dir / f"{user_id}.json"
+
+    def put(self, user_id: str, result: Dict[str, Any]) -> None:
+        """Substitui o resultado do usuário, registrando o horário de geração."""
+        entry = dict(result, gerado_em=time.time())
+        path = self._path(user_id)
+        # Nome temporário único por processo e thread: escritas simultâneas do mesmo usuário não se misturam
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False, default=str)
+            tmp_path.replace(path)
+            mtime = path.stat().st_mtime
+        except OSError as e:
+            logger.error(f"Erro ao gravar resultado em cache para {user_id}: {str(e)}")
+            tmp_path.unlink(missing_ok=True)
+            mtime = None
+        with self._lock:
+            self._entries[user_id] = (mtime, entry)
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Resultado mais recente do usuário ou None."""
+        path = self._path(user_id)
+        try:
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            with self._lock:
+                cached = self._entries.get(user_id)
+            return cached[1] if cached else None
+        with self._lock:
+            cached = self._entries.get(user_id)
+            if cached and cached[0] == mtime:
+                return cached[1]
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Erro ao ler resultado em cache para {user_id}: {str(e)}")
+            return cached[1] if cached else None
+        with self._lock:
+            self._entries[user_id] = (mtime, entry)
+        return entry
+
+    @staticmethod
+    def age(entry: Dict[str, Any]) -> float:
+        """Idade do resultado em segundos."""
+        return time.time() - entry.get("gerado_em", 0)
@@ -0,0 +1,111 @@
+from typing import Dict, Any, List, Optional
+from pathlib import Path
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class SelectionStore:
+    """Seleção de insights por usuário persistida em SQLite.
+
+    As leituras são servidas de um cache em memória. As escritas atualizam
+    o cache na hora e entram em uma fila de pendências (uma por usuário, a
+    mais recente vence), gravada em uma única transação a cada
+    `flush_interval` segundos ou quando a fila atinge `max_pending`. Cada
+    gravação é atômica: ou todas as seleções do lote são salvas, ou nenhuma.
+    """
+
+    def __init__(self, db_path: Path = Path("data") / "state" / "selecoes.db",
+                 flush_interval: float = 2.0, max_pending: int = 500):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._connection = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        # WAL permite leitores concorrentes (inclusive de outros processos) durante a gravação
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS selecoes (
+                usuario_id TEXT PRIMARY KEY,
+                persona TEXT NOT NULL,
+                insights TEXT NOT NULL,
+                atualizado_em REAL NOT NULL
+            )
+        """)
+        self._connection.commit()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="selection-flush", daemon=True)
+        self._thread.start()
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Seleção atual do usuário ({'persona', 'selected_insights'}) ou None."""
+        with self._lock:
+            if user_id in self._cache:
+                return self._cache[user_id]
+        with self._db_lock:
+            row = self._connection.execute(
+                "SELECT persona, insights FROM selecoes WHERE usuario_id = ?", (user_id,)
+            ).fetchone()
+        selection = {"persona": row[0], "selected_insights": json.loads(row[1])} if row else None
+        with self._lock:
+            # Uma escrita concorrente que chegou durante a consulta tem prioridade
+            return self._cache.setdefault(user_id, selection) if selection else self._cache.get(user_id)
+
+    def set(self, user_id: str, persona: str, selected_insights: List[str]) -> None:
+        """Registra a seleção; a gravação em disco acontece no próximo lote."""
+        selection = {"persona": persona, "selected_insights": list(selected_insights)}
+        with self._lock:
+            self._cache[user_id] = selection
+            self._pending[user_id] = dict(selection, atualizado_em=time.time())
+            flush_now = len(self._pending) >= self.max_pending
+        if flush_now:
+            self.flush()
+
+    def flush(self) -> int:
+        """Grava as seleções pendentes em uma transação e retorna quantas foram salvas."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        rows = [
+            (user_id, s["persona"], json.dumps(s["selected_insights"], ensure_ascii=False), s["atualizado_em"])
+            for user_id, s in pending.items()
+        ]
+        try:
+            with self._db_lock, self._connection:
+                self._connection.executemany("""
+                    INSERT INTO selecoes (usuario_id, persona, insights, atualizado_em) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(usuario_id) DO UPDATE SET
+                        persona = excluded.persona,
+                        insights = excluded.insights,
+                        atualizado_em = excluded.atualizado_em
+                    WHERE excluded.atualizado_em >= selecoes.atualizado_em
+                """, rows)
+        except sqlite3.Error as e:
+            # Devolve o lote à fila sem sobrescrever seleções mais novas
+            with self._lock:
+                for user_id, selection in pending.items():
+                    self._pending.setdefault(user_id, selection)
+            logger.error(f"Erro ao gravar seleções: {str(e)}")
+            return 0
+        return len(rows)
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def close(self) -> None:
+        """Grava as pendências e fecha o banco."""
+        self._stop_event.set()
+        self._thread.join()
+        self.flush()
+        with self._db_lock:
+            self._connection.close()
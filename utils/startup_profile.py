@@ -0,0 +1,57 @@
+from typing import Dict, Any, List
+import re
+import subprocess
+import sys
+
+# Módulos medidos por padrão: o ponto de entrada e as dependências pesadas usadas na primeira execução
+DEFAULT_TARGETS = [
+    "main",
+    "agents.data_ingestion_agent",
+    "agents.modeling_agent",
+    "agents.nlp_generation_agent",
+    "agents.telegram_dispatch_agent",
+    "prophet",
+    "xgboost",
+    "sklearn",
+    "google.generativeai",
+    "telegram",
+    "crewai",
+]
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+def profile_imports(module: str) -> List[Dict[str, Any]]:
+    """Importa `module` em um processo limpo com -X importtime e retorna os tempos por módulo."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True
+    )
+    entries = []
+    for line in completed.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            entries.append({
+                "module": match.group(4),
+                "self_ms": int(match.group(1)) / 1000,
+                "cumulative_ms": int(match.group(2)) / 1000,
+                "depth": (len(match.group(3)) - 1) // 2
+            })
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "erro desconhecido"
+        entries.append({"module": module, "error": error})
+    return entries
+
+def print_import_profile(targets: List[str] = None, top: int = 15) -> None:
+    """Mostra o tempo de importação de cada alvo e os módulos mais lentos de cada um."""
+    for target in targets or DEFAULT_TARGETS:
+        entries = profile_imports(target)
+        failed = [e for e in entries if "error" in e]
+        if failed:
+            print(f"\n{target}: falha na importação ({failed[0]['error']})")
+            continue
+        root = next((e for e in entries if e["module"] == target), None)
+        total = root["cumulative_ms"] if root else sum(e["self_ms"] for e in entries)
+        print(f"\n{target}: {total:.0f} ms ({len(entries)} módulos)")
+        for entry in sorted(entries, key=lambda e: e["self_ms"], reverse=True)[:top]:
+            print(f"  {entry['self_ms']:>9.1f} ms  {entry['cumulative_ms']:>9.1f} ms  {entry['module']}")
@@ -1,20 +1,30 @@
-from typing import Dict, Any
+from typing import Dict, Any, List
 import asyncio
-from telegram import Bot
-from telegram.error import TelegramError
 from dotenv import load_dotenv
 import os
 
+# python-telegram-bot é importado apenas quando o bot é usado pela primeira vez
+
 class TelegramAPI:
     def __init__(self):
         load_dotenv()
         self.bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
         if not self.bot_token:
             raise ValueError("TELEGRAM_BOT_TOKEN not found in environment variables")
-        self.bot = Bot(token=self.bot_token)
+        self._bot = None
+        
+    @property
+    def bot(self):
+        """Create the Telegram Bot client on first use."""
+        if self._bot is None:
+            from telegram import Bot
+            self._bot = Bot(token=self.bot_token)
+        return self._bot
         
     async def send_message(self, chat_id: str, text: str, parse_mode: str = None) -> bool:
         """Send a message via Telegram."""
+        from telegram.error import TelegramError
+        
         try:
             await self.bot.send_message(
                 chat_id=chat_id,
@@ -26,30 +36,54 @@ class TelegramAPI:
             print(f"Error sending Telegram message: {str(e)}")
             return False
             
-    async def send_document(self, chat_id: str, document_path: str, caption: str = None) -> bool:
-        """Send a document via Telegram."""
+    async def send_document(self, chat_id: str, document_path: str, caption: str = None, filename: str = None) -> bool:
+        """Send a document via Telegram, optionally under a different file name."""
+        from telegram.error import TelegramError
+        
         try:
             with open(document_path, 'rb') as doc:
                 await self.bot.send_document(
                     chat_id=chat_id,
                     document=doc,
-                    caption=caption
+                    caption=caption,
+                    filename=filename
                 )
             return True
         except TelegramError as e:
             print(f"Error sending Telegram document: {str(e)}")
             return False
             
+    async def get_updates(self, offset: int = None, timeout: int = 10) -> List[Dict[str, Any]]:
+        """Fetch pending text messages (long polling) as plain dicts."""
+        from telegram.error import TelegramError
+        
+        try:
+            updates = await self.bot.get_updates(offset=offset, timeout=timeout, allowed_updates=["message"])
+        except TelegramError as e:
+            print(f"Error getting Telegram updates: {str(e)}")
+            return []
+        return [
+            {
+                "update_id": update.update_id,
+                "chat_id": str(update.effective_chat.id),
+                "text": update.message.text or ""
+            }
+            for update in updates
+            if update.message is not None and update.effective_chat is not None
+        ]
+        
     def send_message_sync(self, chat_id: str, text: str, parse_mode: str = None) -> bool:
         """Synchronous wrapper for send_message."""
         return asyncio.run(self.send_message(chat_id, text, parse_mode))
         
-    def send_document_sync(self, chat_id: str, document_path: str, caption: str = None) -> bool:
+    def send_document_sync(self, chat_id: str, document_path: str, caption: str = None, filename: str = None) -> bool:
         """Synchronous wrapper for send_document."""
-        return asyncio.run(self.send_document(chat_id, document_path, caption))
+        return asyncio.run(self.send_document(chat_id, document_path, caption, filename))
         
     async def get_chat_info(self, chat_id: str) -> Dict[str, Any]:
         """Get information about a chat."""
+        from telegram.error import TelegramError
+        
         try:
             chat = await self.bot.get_chat(chat_id)
             return {
@@ -0,0 +1,265 @@
+from typing import Dict, Any, List, Optional, Callable, Tuple
+import asyncio
+import logging
+import threading
+import time
+
+from utils.result_cache import ResultCache
+
+logger = logging.getLogger(__name__)
+
+HELP_TEXT = """*Comandos disponíveis*
+/relatorio - último relatório de insights
+/previsao [segmento] - previsão de receita (ex.: /previsao Eletrônicos)
+/top [n] - produtos com maior receita nos últimos 30 dias
+/cliente <id> - produtos recomendados para um cliente
+/ajuda - esta mensagem"""
+
+def _money(value: float) -> str:
+    """Formata valores no padrão brasileiro (R$ 1.234,56)."""
+    return "R$ " + f"{value:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+class TelegramUpdateSource:
+    """Busca mensagens novas no Telegram por long polling."""
+
+    def __init__(self, telegram_api, timeout: int = 10):
+        self.telegram_api = telegram_api
+        self.timeout = timeout
+        self.offset = None
+
+    async def fetch(self) -> List[Dict[str, Any]]:
+        updates = await self.telegram_api.get_updates(offset=self.offset, timeout=self.timeout)
+        if updates:
+            self.offset = max(u["update_id"] for u in updates) + 1
+        return updates
+
+class FakeUpdateSource:
+    """Fonte local de mensagens para testar o bot sem o Telegram."""
+
+    def __init__(self, messages: Optional[List[Tuple[str, str]]] = None):
+        self._pending: List[Dict[str, Any]] = []
+        self._next_id = 1
+        for chat_id, text in messages or []:
+            self.push(chat_id, text)
+
+    def push(self, chat_id: str, text: str) -> None:
+        self._pending.append({"update_id": self._next_id, "chat_id": str(chat_id), "text": text})
+        self._next_id += 1
+
+    async def fetch(self) -> List[Dict[str, Any]]:
+        updates, self._pending = self._pending, []
+        return updates
+
+class FakeTelegramAPI:
+    """Substitui o TelegramAPI nos testes, guardando as mensagens enviadas."""
+
+    def __init__(self):
+        self.sent: List[Dict[str, Any]] = []
+
+    async def send_message(self, chat_id: str, text: str, parse_mode: str = None) -> bool:
+        self.sent.append({"chat_id": chat_id, "text": text, "parse_mode": parse_mode})
+        return True
+
+class InsightBot:
+    """Responde a comandos do Telegram com os últimos resultados do pipeline.
+
+    As respostas vêm do `ResultCache`, sem recalcular nada, e por isso
+    levam milissegundos. Quando o resultado do usuário não existe ou é mais
+    antigo que `max_age` segundos, o bot responde com o que tiver e pede um
+    novo cálculo em segundo plano por `request_refresh(user_config)` (no
+    máximo uma vez a cada `refresh_cooldown` segundos por usuário).
+    """
+
+    def __init__(
+        self,
+        telegram_api,
+        result_cache: ResultCache,
+        config_registry,
+        request_refresh: Optional[Callable[[Dict[str, Any]], None]] = None,
+        max_age: float = 24 * 3600,
+        refresh_cooldown: float = 300,
+        recommendation_tables=None
+    ):
+        self.telegram_api = telegram_api
+        self.result_cache = result_cache
+        self.config_registry = config_registry
+        self.request_refresh = request_refresh
+        self.max_age = max_age
+        self.refresh_cooldown = refresh_cooldown
+        self.recommendation_tables = recommendation_tables
+        self.commands = {
+            "start": self.cmd_help,
+            "ajuda": self.cmd_help,
+            "relatorio": self.cmd_report,
+            "previsao": self.cmd_forecast,
+            "top": self.cmd_top,
+        }
+        # Comandos que consultam a tabela de recomendações, sem depender do último resultado
+        self.user_commands = {
+            "cliente": self.cmd_customer,
+        }
+        self._refresh_requested: Dict[str, float] = {}
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def parse_command(text: str) -> Tuple[Optional[str], List[str]]:
+        """'/previsao@SalesBot Eletrônicos' -> ('previsao', ['Eletrônicos'])."""
+        parts = text.strip().split()
+        if not parts or not parts[0].startswith("/"):
+            return None, []
+        return parts[0][1:].split("@")[0].lower(), parts[1:]
+
+    def _refresh(self, user_config: Dict[str, Any]) -> bool:
+        """Pede um novo cálculo, respeitando o intervalo mínimo entre pedidos."""
+        if self.request_refresh is None:
+            return False
+        user_id = user_config["usuario_id"]
+        now = time.time()
+        if now - self._refresh_requested.get(user_id, 0) < self.refresh_cooldown:
+            return True
+        self._refresh_requested[user_id] = now
+        try:
+            self.request_refresh(user_config)
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao agendar atualização para {user_id}: {str(e)}")
+            return False
+
+    def answer(self, chat_id: str, text: str) -> Optional[str]:
+        """Monta a resposta para uma mensagem (None se não for um comando)."""
+        command, args = self.parse_command(text)
+        if command is None:
+            return None
+        handler = self.commands.get(command) or self.user_commands.get(command)
+        if handler is None:
+            return f"Comando desconhecido: /{command}\n\n{HELP_TEXT}"
+        if handler == self.cmd_help:
+            return handler(None, args)
+
+        user_config = self.config_registry.get(chat_id)
+        if not user_config:
+            return "Usuário não cadastrado. Peça ao administrador para criar sua configuração."
+        if command in self.user_commands:
+            return handler(user_config, args)
+
+        entry = self.result_cache.get(user_config["usuario_id"])
+        stale = entry is None or ResultCache.age(entry) > self.max_age
+        refreshing = self._refresh(user_config) if stale else False
+        if entry is None:
+            if refreshing:
+                return "Ainda não há resultados para você. O cálculo foi iniciado; o relatório chega assim que ficar pronto."
+            return "Ainda não há resultados para você."
+
+        reply = handler(entry, args)
+        if stale:
+            generated = time.strftime("%d/%m %H:%M", time.localtime(entry.get("gerado_em", 0)))
+            note = "atualização em andamento" if refreshing else "dados desatualizados"
+            reply += f"\n\n_Dados de {generated} ({note})._"
+        return reply
+
+    async def handle(self, update: Dict[str, Any]) -> Optional[str]:
+        """Responde uma mensagem recebida."""
+        reply = self.answer(update["chat_id"], update.get("text", ""))
+        if reply:
+            await self.telegram_api.send_message(update["chat_id"], reply, parse_mode="Markdown")
+        return reply
+
+    def cmd_help(self, entry: Optional[Dict[str, Any]], args: List[str]) -> str:
+        return HELP_TEXT
+
+    def cmd_report(self, entry: Dict[str, Any], args: List[str]) -> str:
+        if entry.get("insights"):
+            return entry["insights"]
+        kpis = entry.get("kpis", {})
+        if not kpis:
+            return "O último relatório ainda não tem KPIs disponíveis."
+        lines = [f"📊 *Resumo até {kpis['ultima_data']}*"]
+        lines.append(f"Receita no último dia: {_money(kpis['receita_ultimo_dia'])}")
+        lines.append(f"Receita em 7 dias: {_money(kpis['receita_7d'])}")
+        if kpis.get("variacao_7d") is not None:
+            lines.append(f"Variação vs. semana anterior: {kpis['variacao_7d']:+.1%}")
+        return "\n".join(lines)
+
+    def cmd_forecast(self, entry: Dict[str, Any], args: List[str]) -> str:
+        forecast = entry.get("previsoes", {}).get("prophet", {}).get("forecast") or []
+        if not forecast:
+            return "Não há previsão disponível no último processamento."
+        total = sum(point.get("yhat", 0) for point in forecast)
+        horizon = len(forecast)
+        if not args:
+            return f"📈 *Previsão de receita* para os próximos {horizon} dias: {_money(total)}"
+
+        segment = " ".join(args)
+        segment_forecasts = entry.get("previsoes", {}).get("segmentos", {}).get("previsoes", {})
+        for key, points in segment_forecasts.items():
+            if key.split("=", 1)[-1].lower() == segment.lower():
+                value = sum(point.get("yhat", 0) for point in points)
+                return f"📈 *Previsão para {segment}* nos próximos {len(points)} dias: {_money(value)}"
+
+        # Sem previsão própria do segmento: rateia a previsão geral pela participação recente
+        kpis = entry.get("kpis", {})
+        for level in ("receita_por_categoria", "receita_por_regiao"):
+            shares = kpis.get(level, {})
+            match = next((k for k in shares if k.lower() == segment.lower()), None)
+            if match:
+                share = shares[match] / max(sum(shares.values()), 1e-9)
+                return (f"📈 *Previsão para {match}* nos próximos {horizon} dias: {_money(total * share)}\n"
+                        f"_Estimativa pela participação de {share:.1%} na receita dos últimos 30 dias._")
+        return f"Segmento '{segment}' não encontrado nos últimos resultados."
+
+    def cmd_top(self, entry: Dict[str, Any], args: List[str]) -> str:
+        products = entry.get("kpis", {}).get("top_produtos") or []
+        if not products:
+            return "Não há ranking de produtos no último processamento."
+        n = int(args[0]) if args and args[0].isdigit() else 5
+        lines = [f"🏆 *Top {min(n, len(products))} produtos (30 dias)*"]
+        for i, product in enumerate(products[:n], 1):
+            name = product.get("product_name") or product["product_id"]
+            lines.append(f"{i}. {name}: {_money(product['receita'])} ({product['volume']} un.)")
+        return "\n".join(lines)
+
+    def cmd_customer(self, user_config: Dict[str, Any], args: List[str]) -> str:
+        if not args:
+            return "Informe o cliente: /cliente <id>"
+        if self.recommendation_tables is None:
+            return "Recomendações por cliente não estão disponíveis."
+        customer = args[0]
+        recommendations = self.recommendation_tables.lookup(user_config["usuario_id"], customer, limit=5)
+        if not recommendations:
+            return f"Não há recomendações para o cliente {customer}."
+        lines = [f"🎯 *Recomendações para o cliente {customer}*"]
+        for i, recommendation in enumerate(recommendations, 1):
+            name = recommendation.get("product_name") or recommendation["product_id"]
+            lines.append(f"{i}. {name} (nota {recommendation['score']:.2f})")
+        return "\n".join(lines)
+
+    async def run(self, source, interval: float = 1.0) -> None:
+        """Processa mensagens da fonte até `stop` ser chamado."""
+        while not self._stop_event.is_set():
+            try:
+                updates = await source.fetch()
+            except Exception as e:
+                logger.error(f"Erro ao buscar mensagens: {str(e)}")
+                updates = []
+            if updates:
+                results = await asyncio.gather(*(self.handle(u) for u in updates), return_exceptions=True)
+                for error in (r for r in results if isinstance(r, Exception)):
+                    logger.error(f"Erro ao responder comando: {str(error)}")
+            else:
+                await asyncio.sleep(interval)
+
+    def start(self, source, interval: float = 1.0) -> None:
+        """Roda o bot em uma thread própria, com seu loop asyncio."""
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=lambda: asyncio.run(self.run(source, interval)), name="telegram-bot", daemon=True
+        )
+        self._thread.start()
+        logger.info("Bot de comandos do Telegram iniciado")
+
+    def stop(self) -> None:
+        """Interrompe o bot após a busca de mensagens em andamento."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
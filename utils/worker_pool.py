@@ -0,0 +1,177 @@
+from typing import Dict, Any, List, Optional, Callable
+from concurrent.futures import ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+import importlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRELOAD = ["pandas", "numpy", "sklearn", "prophet", "xgboost"]
+
+_worker_runner = None
+
+def build_default_runner():
+    """Constrói o PipelineRunner com os agentes reais dentro do processo trabalhador."""
+    from agents.data_ingestion_agent import DataIngestionAgent
+    from agents.modeling_agent import ModelingAgent
+    from agents.nlp_generation_agent import NLPGenerationAgent
+    from agents.telegram_dispatch_agent import TelegramDispatchAgent
+    from utils.telegram_api import TelegramAPI
+    from utils.pipeline_runner import PipelineRunner
+    from utils.data_loader import load_system_config
+    from utils.result_cache import ResultCache
+    from utils.checkpoint_store import CheckpointStore
+    from utils.deadline_planner import RunTimingHistory
+    from utils.chart_renderer import build_chart_renderer
+    from utils.report_export import build_report_exporter
+
+    system_config = load_system_config(Path("config"))
+    pipeline = system_config.get("pipeline", {})
+    return PipelineRunner(
+        DataIngestionAgent(),
+        ModelingAgent(),
+        NLPGenerationAgent(),
+        TelegramDispatchAgent(TelegramAPI()),
+        max_workers=pipeline.get("max_workers", 4),
+        instrumentation=system_config.get("instrumentacao", {}),
+        result_cache=ResultCache(Path(system_config.get("bot", {}).get("diretorio_cache", "data/state/resultados"))),
+        checkpoint_store=CheckpointStore(
+            Path(pipeline.get("diretorio_checkpoints", "data/state/checkpoints")),
+            retention_days=pipeline.get("retencao_checkpoints_dias", 7)
+        ),
+        max_attempts=pipeline.get("max_tentativas", 1),
+        retry_delay=pipeline.get("intervalo_tentativas_segundos", 30),
+        timing_history=RunTimingHistory(Path(
+            system_config.get("agendador", {}).get("pre_calculo", {}).get("diretorio_duracoes", "data/state/duracoes")
+        )),
+        # Cada processo já é um trabalhador: gráficos e planilhas são gerados nele, com o cache compartilhado
+        chart_renderer=build_chart_renderer(dict(system_config.get("graficos", {}), processos=0)),
+        report_exporter=build_report_exporter(dict(system_config.get("exportacao", {}), processos=0))
+    )
+
+def _limit_memory(memory_limit_mb: Optional[int]) -> None:
+    """Limita o espaço de endereçamento do processo (apenas em sistemas POSIX)."""
+    if not memory_limit_mb:
+        return
+    try:
+        import resource
+    except ImportError:
+        logger.warning("Limite de memória por job não suportado nesta plataforma")
+        return
+    limit = memory_limit_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def _init_worker(memory_limit_mb: Optional[int], preload_modules: List[str], runner_factory: Callable) -> None:
+    """Inicializa o processo trabalhador: limite de memória, importações pesadas e agentes."""
+    global _worker_runner
+    _limit_memory(memory_limit_mb)
+    for module in preload_modules:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            logger.warning(f"Módulo {module} não pôde ser pré-carregado: {str(e)}")
+    _worker_runner = runner_factory()
+
+def _warm_up(delay: float) -> int:
+    """Tarefa vazia usada para forçar a criação de todos os processos."""
+    time.sleep(delay)
+    return os.getpid()
+
+def _run_job(user_config: Dict[str, Any], options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Executa o pipeline de um usuário no processo trabalhador."""
+    try:
+        return _worker_runner.run(user_config, **(options or {})).to_dict()
+    except MemoryError:
+        return {
+            "user_id": user_config.get("usuario_id"),
+            "status": "error",
+            "error": "Limite de memória do job excedido",
+            "failed_stage": None,
+            "timings": {}
+        }
+
+class PipelineWorkerPool:
+    """Pool de processos com os agentes já carregados para rodar pipelines em paralelo.
+
+    Cada processo importa prophet/xgboost e constrói os agentes uma única vez,
+    no inicializador. Os jobs recebem a configuração do usuário e devolvem o
+    resumo serializado de `PipelineResult`. Se um processo morrer (ex.: por
+    falta de memória), o pool é recriado no próximo envio.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        memory_limit_mb: Optional[int] = None,
+        preload_modules: Optional[List[str]] = None,
+        runner_factory: Callable = build_default_runner
+    ):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.memory_limit_mb = memory_limit_mb
+        self.preload_modules = DEFAULT_PRELOAD if preload_modules is None else preload_modules
+        self.runner_factory = runner_factory
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # 'spawn' evita herdar as threads do agendador em um fork
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.memory_limit_mb, self.preload_modules, self.runner_factory)
+        )
+
+    def start(self) -> None:
+        """Cria os processos e aguarda que todos terminem de inicializar."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._create_executor()
+            executor = self._executor
+        start = time.perf_counter()
+        futures = [executor.submit(_warm_up, 0.05) for _ in range(self.max_workers)]
+        pids = {future.result() for future in futures}
+        logger.info(f"{len(pids)} processos trabalhadores prontos em {time.perf_counter() - start:.1f}s")
+
+    def submit(self, user_config: Dict[str, Any], **options) -> Future:
+        """Envia o pipeline de um usuário para o pool (`options` vão para `PipelineRunner.run`)."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._create_executor()
+            try:
+                return self._executor.submit(_run_job, user_config, options)
+            except BrokenProcessPool:
+                logger.error("Pool de processos quebrado, recriando")
+                self._executor.shutdown(wait=False)
+                self._executor = self._create_executor()
+                return self._executor.submit(_run_job, user_config, options)
+
+    def run(self, user_config: Dict[str, Any], **options) -> Dict[str, Any]:
+        """Executa o pipeline de um usuário e aguarda o resultado."""
+        try:
+            return self.submit(user_config, **options).result()
+        except BrokenProcessPool as e:
+            return {
+                "user_id": user_config.get("usuario_id"),
+                "status": "error",
+                "error": f"Processo trabalhador encerrado: {str(e)}",
+                "failed_stage": None,
+                "timings": {}
+            }
+
+    def map(self, user_configs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Executa vários pipelines em paralelo, preservando a ordem."""
+        futures = [self.submit(user_config) for user_config in user_configs]
+        return [future.result() for future in futures]
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Encerra os processos trabalhadores."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
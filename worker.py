@@ -0,0 +1,46 @@
+"""Trabalhador da fila distribuída de pipelines.
+
+Uso:
+    python worker.py --processos 4
+
+Rode em quantas máquinas forem necessárias, apontando para a mesma fila
+(seção "fila" do config/system_config.json) e para o mesmo diretório de
+checkpoints. O SalesInsightsSystem, com "pipeline.modo" = "distribuido",
+apenas enfileira os jobs nos horários agendados.
+"""
+import argparse
+import logging
+import os
+import signal
+import threading
+from pathlib import Path
+
+from utils.data_loader import load_system_config
+from utils.queue_worker import start_workers
+from utils.worker_pool import build_default_runner
+
+def main():
+    settings = load_system_config(Path("config")).get("fila", {})
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processos", type=int, default=settings.get("processos") or os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    workers, stop_event = start_workers(settings, args.processos, build_default_runner)
+    print(f"{len(workers)} trabalhadores iniciados")
+
+    shutdown = threading.Event()
+    def handle_signal(signum, frame):
+        print(f"Sinal {signal.Signals(signum).name} recebido, aguardando os jobs em andamento...")
+        shutdown.set()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, handle_signal)
+
+    shutdown.wait()
+    stop_event.set()
+    for worker in workers:
+        worker.join()
+    print("Trabalhadores encerrados.")
+
+if __name__ == "__main__":
+    main()